@@ -12,25 +12,135 @@ from geometry_msgs.msg import Twist, Point, Quaternion
 from nav_msgs.msg import Odometry
 from roboteq_msgs.msg import Command as MotorCommand
 from roboteq_msgs.msg import Feedback as MotorFeedback
+from base_control.msg import WheelCommand
 import PyKDL as kdl
 import tf
 
+from base_kinematics import HALF_WHEELBASE_X_m, HALF_WHEELBASE_Y_m, \
+    WHEEL_RADIUS_m, forward_matrix, inverse_matrix
 import roboclaw as rc
 
-WHEEL_RADIUS_m = 0.1016 # 4" radius wheels, in meters
-HALF_WHEELBASE_X_m = 0.2032 # 16" / 2, in meters
-HALF_WHEELBASE_Y_m = 0.2667 # 21" / 2, in meters
 MOTOR_CONTROLLER_CMD_RATE_Hz = 50
+# an unchanged wheel command is sent again after this long, so that the
+# motor drivers' own timeouts don't stop the wheels
+KEEPALIVE_PERIOD_s = 0.5
+# if no cmd_vel arrives for this long, the base ramps down to a stop...
+CMD_VEL_TIMEOUT_s = 0.5
+# ...over this long
+CMD_VEL_RAMP_s = 0.5
+# wheel speed changes smaller than this (rad/s) aren't worth sending
+WHEEL_CMD_TOLERANCE = 1e-3
+# control loop timing is logged every this many cycles
+STATS_LOG_CYCLES = 500
+
+
+class DeadlineScheduler(object):
+    """Runs a loop at a fixed rate on absolute deadlines, so that the time
+    spent in each cycle doesn't push the later ones back. Measures how late
+    each cycle starts; a cycle that starts a whole period late is an
+    overrun, and the deadlines it missed are skipped."""
+    def __init__(self, rate_hz, clock=time.time, sleep=time.sleep):
+        self.period = 1.0 / rate_hz
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = None
+        self.cycles = 0
+        self.overruns = 0
+        self.jitter = 0.0       # lateness of the last cycle, s
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+
+    def wait(self):
+        """Sleep until the next deadline. Returns the time it woke up."""
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            self.deadline += self.period
+            if now < self.deadline:
+                self.sleep(self.deadline - now)
+                now = self.clock()
+            elif now - self.deadline >= self.period:
+                self.overruns += 1
+                missed = int((now - self.deadline) / self.period)
+                self.deadline += missed * self.period
+        self.jitter = now - self.deadline
+        self.max_jitter = max(self.max_jitter, self.jitter)
+        self.total_jitter += self.jitter
+        self.cycles += 1
+        return now
+
+    def mean_jitter(self):
+        if 0 == self.cycles:
+            return 0.0
+        return self.total_jitter / self.cycles
+
+
+class WheelCommandGate(object):
+    """Picks the wheel commands worth sending: those that changed, and
+    those that haven't been sent for a keep-alive period."""
+    def __init__(self, keepalive_s, tolerance=WHEEL_CMD_TOLERANCE, wheels=4):
+        self.keepalive_s = keepalive_s
+        self.tolerance = tolerance
+        self.sent = np.zeros(wheels)
+        self.sent_at = np.empty(wheels)
+        self.sent_at.fill(-np.inf)
+
+    def select(self, now, w):
+        """Indices of the wheels whose commands in w should go out now; they
+        are taken to have been sent."""
+        w = np.asarray(w)
+        due = ((np.abs(w - self.sent) > self.tolerance) |
+               (now - self.sent_at >= self.keepalive_s))
+        self.sent[due] = w[due]
+        self.sent_at[due] = now
+        return np.flatnonzero(due)
+
+
+class CmdVelWatchdog(object):
+    """Scales cmd_vel down to zero once it goes stale: full speed until
+    timeout_s after the last message, then a linear ramp to a stop over
+    ramp_s. Nothing heard yet counts as stale."""
+    def __init__(self, timeout_s, ramp_s):
+        self.timeout_s = timeout_s
+        self.ramp_s = ramp_s
+        self.last = None
+
+    def feed(self, stamp):
+        self.last = stamp
+
+    def scale(self, now):
+        if self.last is None:
+            return 0.0
+        late = now - self.last - self.timeout_s
+        if late <= 0.0:
+            return 1.0
+        if late >= self.ramp_s:
+            return 0.0
+        return 1.0 - late / self.ramp_s
 
 
 class BaseController(threading.Thread):
     
-    def __init__(self):
-        self.sleeper = rospy.Rate(MOTOR_CONTROLLER_CMD_RATE_Hz)
-        self.motor_1_cmd_publisher = rospy.Publisher("/motor_1/cmd", MotorCommand, queue_size=5)
-        self.motor_2_cmd_publisher = rospy.Publisher("/motor_2/cmd", MotorCommand, queue_size=5)
-        self.motor_3_cmd_publisher = rospy.Publisher("/motor_3/cmd", MotorCommand, queue_size=5)
-        self.motor_4_cmd_publisher = rospy.Publisher("/motor_4/cmd", MotorCommand, queue_size=5)
+    def __init__(self, legacy_motor_topics=True):
+        """
+        :param legacy_motor_topics: besides the four wheels' commands in
+            one WheelCommand on /wheel_cmd, also publish each changed one
+            on its own /motor_N/cmd, for the per-motor Roboteq drivers.
+        """
+        self.scheduler = DeadlineScheduler(MOTOR_CONTROLLER_CMD_RATE_Hz,
+                                           rospy.get_time, rospy.sleep)
+        self.gate = WheelCommandGate(KEEPALIVE_PERIOD_s)
+        self.watchdog = CmdVelWatchdog(CMD_VEL_TIMEOUT_s, CMD_VEL_RAMP_s)
+        self.wheel_cmd_publisher = rospy.Publisher("/wheel_cmd", WheelCommand,
+                                                   queue_size=5)
+        self.legacy_motor_topics = legacy_motor_topics
+        self.motor_cmd_publishers = []
+        if legacy_motor_topics:
+            self.motor_cmd_publishers = [
+                rospy.Publisher("/motor_%d/cmd" % (i + 1), MotorCommand,
+                                queue_size=5)
+                for i in range(4)]
 
         self.bth = BaseTransformHandler(WHEEL_RADIUS_m, HALF_WHEELBASE_X_m,
                                   HALF_WHEELBASE_Y_m)
@@ -41,15 +151,13 @@ class BaseController(threading.Thread):
         threading.Thread.__init__(self)
 
     def run(self):
-        """Pull a cmd_vel (Twist) message from the incoming queue, covert it
-          to a tuple of motor speeds, and put them into the motor manager's
-          work queue, ad infinitum"""
-        twist = Twist()
+        """Convert the latest cmd_vel (Twist) message to wheel speeds and
+          send the ones that changed to the motor drivers, ad infinitum"""
         while not rospy.is_shutdown():
             
             # we send command to the controllers at a steady rate
             # that doesn't depend on the rate of incoming cmd_vel messaes
-            self.sleeper.sleep()
+            now = self.scheduler.wait()
             
             # get the current command
             with self.lock:
@@ -57,41 +165,50 @@ class BaseController(threading.Thread):
                 
             # convert the incoming velocity vector into wheel speeds,
             # (rad/s) and publish them 
-            rospy.logdebug("current cmd_vel: " + str(twist))
-            w = self.bth.twist_to_wheel_velocities(twist)
-            c = MotorCommand()
-            self.motor_1_cmd_publisher.publish(MotorCommand(w[0]))
-            self.motor_2_cmd_publisher.publish(MotorCommand(w[1]))
-            self.motor_3_cmd_publisher.publish(MotorCommand(w[2]))
-            self.motor_4_cmd_publisher.publish(MotorCommand(w[3]))
+            w = np.multiply(self.bth.twist_to_wheel_velocities(twist),
+                            self.watchdog.scale(now))
+            due = self.gate.select(now, w)
+            if 0 != len(due):
+                msg = WheelCommand()
+                msg.header.stamp = rospy.Time.from_sec(now)
+                msg.commanded_velocity = tuple(w)
+                self.wheel_cmd_publisher.publish(msg)
+                if self.legacy_motor_topics:
+                    for i in due:
+                        self.motor_cmd_publishers[i].publish(
+                            MotorCommand(w[i]))
+
+            if 0 == self.scheduler.cycles % STATS_LOG_CYCLES:
+                rospy.logdebug("BaseController.run(): jitter mean %.4f s, "
+                               "max %.4f s, %d overruns in %d cycles" %
+                               (self.scheduler.mean_jitter(),
+                                self.scheduler.max_jitter,
+                                self.scheduler.overruns,
+                                self.scheduler.cycles))
 
         rospy.loginfo("BaseController.run(): exiting.")
         
     def cmd_vel_callback(self, twist_msg):
         with self.lock:
             self.cmd_vel_incoming = twist_msg
+            self.watchdog.feed(rospy.get_time())
 
 
 class BaseTransformHandler(object):
+    """Mecanum kinematics of the base: wheel angular velocities (rad/s), in
+    the order lf, lr, rr, rf, to and from the body twist (x, y, theta), in
+    m/s and rad/s. The scaled matrices are computed once, so converting a
+    sample, or a whole array of them, is a single matrix multiply."""
     def __init__(self, R, l1, l2):
-        L = l1 + l2
         assert l1 > 0.0
         assert l2 > 0.0
         assert R > 0.0
         self.R = R
-        self.w4_to_v3 =  np.array([
-            [1.0, 1.0, 1.0, 1.0],
-            [-1.0, 1.0, -1.0, 1.0],
-            [-1.0/L, -1.0/L, 1.0/L, 1.0/L]])
-        self.v3_to_w4 = np.array([
-            [1.0, -1.0, -L],
-            [1.0, 1.0, -L],
-            [1.0, -1.0, L],
-            [1.0, 1.0, L]])
+        self.forward = forward_matrix(R, l1, l2)
+        self.inverse = inverse_matrix(R, l1, l2)
 
     def wheel_velocities_to_twist(self, w):
-        w = np.array([w[0], w[1], w[2], w[3]])
-        v = np.dot((self.R / 4.0) * self.w4_to_v3, w)
+        v = np.dot(self.forward, w[:4])
         twist = Twist()
         twist.linear.x = v[0]
         twist.linear.y = v[1]
@@ -99,14 +216,31 @@ class BaseTransformHandler(object):
         return twist
 
     def twist_to_wheel_velocities(self, twist):
-        t = np.array([twist.linear.x, twist.linear.y, twist.angular.z])
-        w = np.dot((1.0 / self.R) * self.v3_to_w4, t)
+        t = (twist.linear.x, twist.linear.y, twist.angular.z)
+        w = np.dot(self.inverse, t)
         return tuple(w)
-    
+
+    def wheel_velocities_to_twists(self, w):
+        """Batch form of wheel_velocities_to_twist.
+
+        :param w: (N, 4) array of wheel angular velocities.
+        :return: (N, 3) array of twists as (x, y, theta) rows.
+        """
+        return np.dot(w, self.forward.T)
+
+    def twists_to_wheel_velocities(self, v):
+        """Batch form of twist_to_wheel_velocities.
+
+        :param v: (N, 3) array of twists as (x, y, theta) rows.
+        :return: (N, 4) array of wheel angular velocities.
+        """
+        return np.dot(v, self.inverse.T)
+
 
 def main(args):
     rospy.init_node('base_controller_node', anonymous=True)
-    controller = BaseController()
+    controller = BaseController(
+        rospy.get_param('~legacy_motor_topics', True))
     controller.start()
     rospy.spin()
     
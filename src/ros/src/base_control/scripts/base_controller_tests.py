@@ -5,6 +5,8 @@
 import logging
 import unittest
 
+import numpy as np
+
 from geometry_msgs.msg import Twist
 
 import base_control_node as bc
@@ -68,6 +70,105 @@ class BaseControllerTransformHandlerTest(unittest.TestCase):
         w = th.twist_to_wheel_velocities(twist)
         self.assertEqual(w, should_be)
 
+    def test_batch_matches_single(self):
+        th = bc.BaseTransformHandler(bc.WHEEL_RADIUS_m, bc.HALF_WHEELBASE_X_m,
+                                     bc.HALF_WHEELBASE_Y_m)
+        rng = np.random.RandomState(0)
+        w = rng.uniform(-5.0, 5.0, (100, 4))
+        v = th.wheel_velocities_to_twists(w)
+        self.assertEqual(v.shape, (100, 3))
+        for i in (0, 42, 99):
+            twist = th.wheel_velocities_to_twist(w[i])
+            np.testing.assert_allclose(
+                v[i], (twist.linear.x, twist.linear.y, twist.angular.z))
+            np.testing.assert_allclose(th.twists_to_wheel_velocities(v)[i],
+                                       th.twist_to_wheel_velocities(twist))
+
+    def test_batch_round_trip(self):
+        th = bc.BaseTransformHandler(bc.WHEEL_RADIUS_m, bc.HALF_WHEELBASE_X_m,
+                                     bc.HALF_WHEELBASE_Y_m)
+        v = np.random.RandomState(1).uniform(-1.0, 1.0, (1000, 3))
+        w = th.twists_to_wheel_velocities(v)
+        self.assertEqual(w.shape, (1000, 4))
+        np.testing.assert_allclose(th.wheel_velocities_to_twists(w), v)
+
+
+class FakeClock(object):
+    """Clock whose sleep() just moves time forward, plus any extra work
+    time the test adds."""
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, t):
+        self.sleeps.append(t)
+        self.now += t
+
+
+class DeadlineSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = bc.DeadlineScheduler(50, self.clock.time,
+                                              self.clock.sleep)
+
+    def test_no_drift(self):
+        # 5 ms of work per cycle doesn't push the deadlines back
+        for i in range(100):
+            self.assertAlmostEqual(self.scheduler.wait(), 100.0 + 0.02 * i)
+            self.clock.now += 0.005
+        self.assertEqual(self.scheduler.overruns, 0)
+        self.assertAlmostEqual(self.scheduler.max_jitter, 0.0)
+        for t in self.clock.sleeps:
+            self.assertAlmostEqual(t, 0.015)
+
+    def test_overrun_skips_missed_deadlines(self):
+        self.scheduler.wait()
+        self.clock.now += 0.065
+        self.assertAlmostEqual(self.scheduler.wait(), 100.065)
+        self.assertEqual(self.scheduler.overruns, 1)
+        self.assertAlmostEqual(self.scheduler.jitter, 0.005)
+        # back on the original grid
+        self.assertAlmostEqual(self.scheduler.wait(), 100.08)
+
+    def test_late_cycle(self):
+        self.scheduler.wait()
+        self.clock.now += 0.025
+        self.scheduler.wait()
+        self.assertEqual(self.scheduler.overruns, 0)
+        self.assertAlmostEqual(self.scheduler.jitter, 0.005)
+        self.assertAlmostEqual(self.scheduler.mean_jitter(), 0.0025)
+
+
+class WheelCommandGateTest(unittest.TestCase):
+    def test_changes_and_keepalive(self):
+        gate = bc.WheelCommandGate(0.5)
+        self.assertEqual(list(gate.select(0.0, (0.0, 0.0, 0.0, 0.0))),
+                         [0, 1, 2, 3])
+        self.assertEqual(list(gate.select(0.02, (0.0, 0.0, 0.0, 0.0))), [])
+        self.assertEqual(list(gate.select(0.04, (1.0, 0.0, 0.0, 1.0))),
+                         [0, 3])
+        self.assertEqual(list(gate.select(0.06, (1.0, 0.0, 0.0, 1.0001))), [])
+        # wheels 1 and 2 were last sent at 0.0, wheels 0 and 3 at 0.04
+        self.assertEqual(list(gate.select(0.5, (1.0, 0.0, 0.0, 1.0))),
+                         [1, 2])
+        self.assertEqual(list(gate.select(0.54, (1.0, 0.0, 0.0, 1.0))),
+                         [0, 3])
+
+
+class CmdVelWatchdogTest(unittest.TestCase):
+    def test_ramp_to_stop(self):
+        watchdog = bc.CmdVelWatchdog(0.5, 0.5)
+        self.assertEqual(watchdog.scale(10.0), 0.0)
+        watchdog.feed(10.0)
+        self.assertEqual(watchdog.scale(10.5), 1.0)
+        self.assertAlmostEqual(watchdog.scale(10.75), 0.5)
+        self.assertEqual(watchdog.scale(11.0), 0.0)
+        watchdog.feed(11.0)
+        self.assertEqual(watchdog.scale(11.1), 1.0)
+
 
 def main():
     """Run all tests."""
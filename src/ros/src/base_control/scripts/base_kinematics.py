@@ -0,0 +1,30 @@
+"""Dimensions and mecanum kinematics of the base, without ROS, for the nodes
+and for the tools that model them. Wheels are in the order lf, lr, rr, rf.
+"""
+import numpy as np
+
+WHEEL_RADIUS_m = 0.1016 # 4" radius wheels, in meters
+HALF_WHEELBASE_X_m = 0.2032 # 16" / 2, in meters
+HALF_WHEELBASE_Y_m = 0.2667 # 21" / 2, in meters
+
+
+def forward_matrix(R, l1, l2):
+    """Matrix taking wheel angular velocities (rad/s), or angles turned
+    (rad), to the body twist (x, y, theta) in m/s and rad/s, or the body
+    displacement in m and rad."""
+    L = l1 + l2
+    return (R / 4.0) * np.array([
+        [1.0, 1.0, 1.0, 1.0],
+        [-1.0, 1.0, -1.0, 1.0],
+        [-1.0/L, -1.0/L, 1.0/L, 1.0/L]])
+
+
+def inverse_matrix(R, l1, l2):
+    """Matrix taking the body twist (x, y, theta) to wheel angular
+    velocities; the inverse of forward_matrix."""
+    L = l1 + l2
+    return (1.0 / R) * np.array([
+        [1.0, -1.0, -L],
+        [1.0, 1.0, -L],
+        [1.0, -1.0, L],
+        [1.0, 1.0, L]])
@@ -0,0 +1,107 @@
+"""Dead reckoning for the mecanum base from wheel encoder positions.
+
+Instead of multiplying recent wheel speeds by the nominal loop period, this
+integrates how far each wheel actually turned between two measured times.
+Encoder positions don't lose motion when the loop runs late, and need no
+filtering, so the pose stays right however irregular the updates are.
+"""
+import numpy as np
+
+from base_kinematics import forward_matrix
+
+# ways of turning a body-frame displacement into a world-frame one
+METHOD_EULER = 'euler'          # heading at the start of the step
+METHOD_MIDPOINT = 'midpoint'    # heading halfway through the step
+METHOD_ARC = 'arc'              # exact for a constant twist over the step
+
+# below this heading change (rad), the arc formula's series is used
+SMALL_ANGLE = 1e-6
+
+# OdometryPublisher's loop rate; in velocity mode, each update integrates
+# the wheel speeds over one nominal period of it
+ODOMETRY_UPDATE_RATE_Hz = 10
+
+
+def body_to_world(theta, d, method=METHOD_ARC):
+    """Rotate body-frame displacements into the world frame.
+
+    :param theta: heading at the start of each step, rad; scalar or (N,).
+    :param d: displacement (x, y, theta) over each step in the body frame
+        at its start; shape (3,) or (N, 3).
+    :return: world-frame (x, y) displacements, shape (2,) or (N, 2).
+    """
+    d = np.asarray(d, dtype=float)
+    (dx, dy, dtheta) = (d[..., 0], d[..., 1], d[..., 2])
+    if METHOD_EULER == method:
+        heading = theta
+        (a, b) = (dx, dy)
+    elif METHOD_MIDPOINT == method:
+        heading = theta + 0.5 * dtheta
+        (a, b) = (dx, dy)
+    elif METHOD_ARC == method:
+        # integrate the rotating body frame over the step:
+        # sin(dtheta)/dtheta and (1 - cos(dtheta))/dtheta
+        heading = theta
+        small = np.abs(dtheta) < SMALL_ANGLE
+        safe = np.where(small, 1.0, dtheta)
+        s = np.where(small, 1.0 - dtheta**2 / 6.0, np.sin(safe) / safe)
+        c = np.where(small, 0.5 * dtheta, (1.0 - np.cos(safe)) / safe)
+        (a, b) = (s * dx - c * dy, c * dx + s * dy)
+    else:
+        raise ValueError("unknown integration method: " + str(method))
+    (cos_h, sin_h) = (np.cos(heading), np.sin(heading))
+    return np.array([cos_h * a - sin_h * b, sin_h * a + cos_h * b]).T
+
+
+class EncoderOdometry(object):
+    """Pose of the base, updated from successive wheel encoder positions."""
+
+    def __init__(self, R, l1, l2, method=METHOD_ARC):
+        """
+        :param R: wheel radius, m.
+        :param l1, l2: half the wheelbase along x and along y, m.
+        :param method: METHOD_ARC, METHOD_MIDPOINT or METHOD_EULER.
+        """
+        self.forward = forward_matrix(R, l1, l2)
+        self.method = method
+        self.pose = np.zeros(3)     # x, y (m), theta (rad) in the odom frame
+        self.twist = np.zeros(3)    # body-frame x, y (m/s), theta (rad/s)
+        self.stamp = None
+        self.phi = None
+
+    def update(self, stamp, phi):
+        """Advance the pose to a new reading.
+
+        :param stamp: time the wheel angles were measured, s.
+        :param phi: cumulative wheel angles (lf, lr, rr, rf), rad.
+        :return: (pose, twist). The first reading only sets the starting
+            point; twist is the mean over the step.
+        """
+        phi = np.array(phi, dtype=float)
+        if self.phi is not None:
+            d = np.dot(self.forward, phi - self.phi)
+            self.pose[:2] += body_to_world(self.pose[2], d, self.method)
+            self.pose[2] += d[2]
+            dt = stamp - self.stamp
+            if dt > 0.0:
+                self.twist = d / dt
+        self.stamp = stamp
+        self.phi = phi
+        return (self.pose, self.twist)
+
+
+def integrate(phi, forward, method=METHOD_ARC, pose=(0.0, 0.0, 0.0)):
+    """Integrate a whole trace of wheel angles at once.
+
+    :param phi: (N, 4) cumulative wheel angles, rad, in time order.
+    :param forward: matrix from forward_matrix.
+    :return: (N, 3) poses, the first one being the starting pose.
+    """
+    d = np.dot(np.diff(np.asarray(phi, dtype=float), axis=0), forward.T)
+    theta = pose[2] + np.concatenate([[0.0], np.cumsum(d[:, 2])])
+    xy = body_to_world(theta[:-1], d, method)
+    poses = np.empty((len(theta), 3))
+    poses[0, :2] = pose[:2]
+    poses[1:, :2] = pose[:2] + np.cumsum(xy, axis=0)
+    poses[:, 2] = theta
+    return poses
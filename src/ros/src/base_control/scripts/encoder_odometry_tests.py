@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+""" Unit tests for encoder-position odometry.
+"""
+import logging
+import unittest
+
+import numpy as np
+
+import base_kinematics as bk
+import encoder_odometry as eo
+
+R = 0.1
+L1 = 0.2
+L2 = 0.3
+
+class EncoderOdometryTests(unittest.TestCase):
+    def setUp(self):
+        self.forward = bk.forward_matrix(R, L1, L2)
+        self.inverse = bk.inverse_matrix(R, L1, L2)
+
+    def test_matrices_are_inverses(self):
+        np.testing.assert_allclose(np.dot(self.forward, self.inverse),
+                                   np.eye(3), atol=1e-12)
+
+    def wheel_angles(self, d):
+        """Wheel angles that move the base by body displacement d."""
+        return np.dot(self.inverse, d)
+
+    def test_straight_line(self):
+        odometry = eo.EncoderOdometry(R, L1, L2)
+        odometry.update(0.0, (0.0, 0.0, 0.0, 0.0))
+        (pose, twist) = odometry.update(2.0, [2.0 * np.pi] * 4)
+        np.testing.assert_allclose(pose, (2.0 * np.pi * R, 0.0, 0.0),
+                                   atol=1e-12)
+        np.testing.assert_allclose(twist, (np.pi * R, 0.0, 0.0), atol=1e-12)
+
+    def test_turn_in_place(self):
+        odometry = eo.EncoderOdometry(R, L1, L2)
+        odometry.update(0.0, (0.0, 0.0, 0.0, 0.0))
+        (pose, twist) = odometry.update(1.0, self.wheel_angles((0.0, 0.0, 1.5)))
+        np.testing.assert_allclose(pose, (0.0, 0.0, 1.5), atol=1e-12)
+
+    def test_arc_is_exact_for_constant_twist(self):
+        # a quarter circle of radius 1 m in one step
+        d = (0.5 * np.pi, 0.0, 0.5 * np.pi)
+        phi = [np.zeros(4), self.wheel_angles(d)]
+        arc = eo.integrate(phi, self.forward, eo.METHOD_ARC)
+        np.testing.assert_allclose(arc[-1], (1.0, 1.0, 0.5 * np.pi),
+                                   atol=1e-12)
+
+        # the lower-order methods converge to it as the steps shrink
+        phi = [self.wheel_angles(np.multiply(d, s))
+               for s in np.linspace(0.0, 1.0, 11)]
+        midpoint = eo.integrate(phi, self.forward, eo.METHOD_MIDPOINT)
+        euler = eo.integrate(phi, self.forward, eo.METHOD_EULER)
+        midpoint_error = np.hypot(*(midpoint[-1, :2] - (1.0, 1.0)))
+        euler_error = np.hypot(*(euler[-1, :2] - (1.0, 1.0)))
+        self.assertTrue(midpoint_error < 0.005)
+        self.assertTrue(midpoint_error < euler_error / 10.0)
+
+    def test_update_matches_integrate(self):
+        rng = np.random.RandomState(0)
+        phi = np.cumsum(rng.normal(0.0, 0.3, (50, 4)), axis=0)
+        poses = eo.integrate(phi, self.forward, pose=(1.0, -2.0, 0.5))
+        odometry = eo.EncoderOdometry(R, L1, L2)
+        odometry.pose[:] = (1.0, -2.0, 0.5)
+        for (i, p) in enumerate(phi):
+            (pose, twist) = odometry.update(0.1 * i, p)
+            np.testing.assert_allclose(pose, poses[i], atol=1e-12)
+
+    def test_twist_uses_measured_stamps(self):
+        odometry = eo.EncoderOdometry(R, L1, L2)
+        odometry.update(10.0, (0.0, 0.0, 0.0, 0.0))
+        (pose, twist) = odometry.update(10.25, self.wheel_angles((0.1, 0.0, 0.0)))
+        np.testing.assert_allclose(twist, (0.4, 0.0, 0.0), atol=1e-12)
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, eo.body_to_world, 0.0, (1.0, 0.0, 0.0),
+                          'rk4')
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
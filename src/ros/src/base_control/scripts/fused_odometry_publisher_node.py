@@ -19,16 +19,15 @@ import tf
 
 from base_control_node import BaseTransformHandler, WHEEL_RADIUS_m, \
     HALF_WHEELBASE_X_m, HALF_WHEELBASE_Y_m
+from odometry_publisher_node import feedback_stamp
+from wheel_telemetry import MEDIAN_WINDOW, WheelTelemetry
 
 ODOMETRY_UPDATE_RATE_Hz = 50
 
 class OdometryPublisher(threading.Thread):
     def __init__(self, transformer, odometry_update_rate_hz):
-        # last few wheel angular velocities, rads/s
-        self.w_1 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_2 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_3 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_4 = deque([0.0, 0.0, 0.0, 0.0])
+        # recent wheel angular velocities, rads/s
+        self.telemetry = WheelTelemetry()
 
         self.transformer = transformer
         self.sleeper = rospy.Rate(odometry_update_rate_hz)
@@ -44,10 +43,6 @@ class OdometryPublisher(threading.Thread):
         self.theta_prev = (0.0, -1.0)   # theta, timestamp 
         self.lsm_theta = 0.0
         self.theta_lock = Lock()
-        self.w_1_lock = Lock()
-        self.w_2_lock = Lock()
-        self.w_3_lock = Lock()
-        self.w_4_lock = Lock()
         threading.Thread.__init__(self)
 
         # Init subscribers
@@ -84,19 +79,7 @@ class OdometryPublisher(threading.Thread):
             self.sleeper.sleep()
             
             # get the incoming wheel velocities and filter
-            w_1 = []
-            w_2 = []
-            w_3 = []
-            w_4 = []
-            with self.w_1_lock:
-                w_1 = self.w_1
-            with self.w_2_lock:
-                w_2 = self.w_2
-            with self.w_3_lock:
-                w_3 = self.w_3
-            with self.w_4_lock:
-                w_4 = self.w_4
-            w = [np.median(w_1), np.median(w_2), np.median(w_3), np.median(w_4)]
+            w = list(self.telemetry.median(MEDIAN_WINDOW))
 
             # we don't trust the angular part of our odometry measurements, so we
             # overwrite it with orientation from laser_scan_matcher's pose estimate
@@ -148,24 +131,20 @@ class OdometryPublisher(threading.Thread):
                                                   msg.header.frame_id)
 
     def motor_1_feedback_callback(self, feedback_msg):
-        with self.w_1_lock:
-            self.w_1.append(feedback_msg.measured_velocity)
-            self.w_1.popleft()
+        self.telemetry.append(0, feedback_stamp(feedback_msg),
+                              feedback_msg.measured_velocity)
 
     def motor_2_feedback_callback(self, feedback_msg):
-        with self.w_2_lock:
-            self.w_2.append(feedback_msg.measured_velocity)
-            self.w_2.popleft()
+        self.telemetry.append(1, feedback_stamp(feedback_msg),
+                              feedback_msg.measured_velocity)
 
     def motor_3_feedback_callback(self, feedback_msg):
-        with self.w_3_lock:
-            self.w_3.append(feedback_msg.measured_velocity)
-            self.w_3.popleft()
+        self.telemetry.append(2, feedback_stamp(feedback_msg),
+                              feedback_msg.measured_velocity)
 
     def motor_4_feedback_callback(self, feedback_msg):
-        with self.w_4_lock:
-            self.w_4.append(feedback_msg.measured_velocity)
-            self.w_4.popleft()
+        self.telemetry.append(3, feedback_stamp(feedback_msg),
+                              feedback_msg.measured_velocity)
 
     def lsm_pose2D_callback(self, pose_msg):
         with self.theta_lock:
@@ -12,11 +12,10 @@ import rospy
 from geometry_msgs.msg import Point, PointStamped, Pose, PoseStamped, Quaternion, Twist
 from nav_msgs.msg import Odometry
 from std_msgs.msg import Header
-import tf
 from roboteq_msgs.msg import Command as MotorCommand
 from roboteq_msgs.msg import Feedback as MotorFeedback
 import PyKDL as kdl
-import tf
+from pose_provider.provider import PoseProvider
 
 
 class MovementTester(threading.Thread):
@@ -30,16 +29,16 @@ class MovementTester(threading.Thread):
         self.subscriber = rospy.Subscriber("/move_base_simple/goal",
                                            PoseStamped, self.nav_goal_callback)
         self.cmd_publisher = rospy.Publisher("/cmd_vel", Twist)
-        self.tf_listener = tf.TransformListener()
+        self.poses = PoseProvider(base_frame='base_footprint')
         threading.Thread.__init__(self)
 
     def get_position_odom_frame(self):
-        now = rospy.Time.now()
-        self.tf_listener.waitForTransform("/odom", "/base_footprint",
-                                          now, rospy.Duration(4.0))
-        (trans, rot) = self.tf_listener.lookupTransform(
-            "/odom", "/base_footprint", now)
-        return (trans, rot)
+        """Return the latest (x, y, theta) of base_footprint in the odom
+        frame, or None if there is none recent."""
+        pose = self.poses.odom_pose()
+        if pose is None:
+            return None
+        return pose[1]
 
     def distance_to_current_waypoint(self, position):
         xdiff = position[0] - self.current_waypoint.pose.position.x
@@ -49,22 +48,31 @@ class MovementTester(threading.Thread):
 
     def heading_to_current_waypoint(self):
         """Return a PointStamped, in the base_footprint frame, of unit length,
-        pointing toward the current waypoint."""
-        wp = PointStamped()
-        wp.header = self.current_waypoint.header
-        wp.point = self.current_waypoint.pose.position
-        self.tf_listener.waitForTransform("/odom", "/base_footprint",
-                                          rospy.Time.now(), rospy.Duration(4.0))
-        v = self.tf_listener.transformPoint('/base_footprint', wp)
-        (pos, rot) = self.get_position_odom_frame()
-        d = self.distance_to_current_waypoint(pos)
-        v.point.x = v.point.x / d
-        v.point.y = v.point.y / d
+        pointing toward the current waypoint, which is in the odom frame
+        or the map frame; or None if the robot's pose isn't known."""
+        if self.current_waypoint.header.frame_id.lstrip('/') == 'map':
+            pose = self.poses.map_pose()
+        else:
+            pose = self.poses.odom_pose()
+        if pose is None:
+            return None
+        (x, y, theta) = pose[1]
+        xdiff = self.current_waypoint.pose.position.x - x
+        ydiff = self.current_waypoint.pose.position.y - y
+        d = np.hypot(xdiff, ydiff)
+        v = PointStamped()
+        v.header.frame_id = '/base_footprint'
+        v.header.stamp = rospy.Time.now()
+        v.point.x = (np.cos(theta) * xdiff + np.sin(theta) * ydiff) / d
+        v.point.y = (np.cos(theta) * ydiff - np.sin(theta) * xdiff) / d
         return v
 
     def run(self):
-        self.tf_listener.waitForTransform("/odom", "/base_footprint",
-                                          rospy.Time(), rospy.Duration(4.0))
+        # give odometry up to 4 s to start
+        deadline = time.time() + 4.0
+        while self.get_position_odom_frame() is None and \
+              time.time() < deadline and not rospy.is_shutdown():
+            self.sleeper.sleep()
         loop_count = 0
         while not rospy.is_shutdown():
             self.sleeper.sleep()
@@ -73,6 +81,10 @@ class MovementTester(threading.Thread):
             else:
                 self.current_waypoint = self.waypoints.popleft()
                 v = self.heading_to_current_waypoint()
+                if v is None:
+                    rospy.logwarn("No recent pose; holding waypoint.")
+                    self.waypoints.appendleft(self.current_waypoint)
+                    continue
                 rospy.loginfo("Heading to current waypoint: " + str(v))
             speed = 0.2
             msg = Twist()
@@ -112,7 +124,7 @@ class MovementTester(threading.Thread):
                 #         self.arrived = False
                 #else:
                 #    self.arrived = False
-                loop_count += 1
+            loop_count += 1
 
     def nav_goal_callback(self, goal_msg):
         nav_goal = goal_msg # PoseStamped
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+""" Compares the odometry models on a wheel trace: the velocity-median model
+    of OdometryPublisher (median of the last four speed readings times the
+    nominal loop period) against integrating encoder positions with their
+    measured stamps. Reports pose error against ground truth and the cost
+    of one update.
+
+    Without a trace file, a synthetic drive is generated: a varying twist,
+    motor feedback at 50 Hz with speed noise and tick-quantized positions,
+    and an odometry loop that sometimes runs late.
+
+    A trace file is a .npz with the feedback as 'stamps' (M,), 'velocities'
+    (M, 4) in rad/s and 'positions' (M, 4) in rad, wheels in the order lf,
+    lr, rr, rf. Ground truth, if known, goes in 'truth_stamps' (K,) and
+    'truth' (K, 3) as x, y, theta.
+
+    Usage: odometry_benchmark.py [trace.npz] [--save trace.npz]
+"""
+from collections import deque
+import sys
+import time
+
+import numpy as np
+
+from base_kinematics import HALF_WHEELBASE_X_m, HALF_WHEELBASE_Y_m, \
+    WHEEL_RADIUS_m, forward_matrix
+import encoder_odometry as eo
+from encoder_odometry import ODOMETRY_UPDATE_RATE_Hz
+from roboclaw import TICKS_PER_REV
+from wheel_telemetry import MEDIAN_WINDOW
+
+
+def synthetic_trace(duration_s=60.0, feedback_rate_hz=50.0, seed=0):
+    """Drive along a smooth, varying twist and record what the motor
+    drivers would report. Returns a dict laid out like a trace file."""
+    rng = np.random.RandomState(seed)
+    dt = 0.001
+    t = np.arange(0.0, duration_s, dt)
+    v = np.array([0.3 * np.sin(0.2 * t) + 0.2,
+                  0.15 * np.cos(0.13 * t),
+                  0.6 * np.sin(0.31 * t)]).T
+
+    forward = forward_matrix(WHEEL_RADIUS_m, HALF_WHEELBASE_X_m,
+                            HALF_WHEELBASE_Y_m)
+    w = np.dot(v, np.linalg.pinv(forward).T)
+    phi = np.concatenate([np.zeros((1, 4)), np.cumsum(w * dt, axis=0)[:-1]])
+    truth = eo.integrate(phi, forward)
+
+    n = int(duration_s * feedback_rate_hz)
+    i = np.arange(n) * int(round(1.0 / (feedback_rate_hz * dt)))
+    i = np.clip(i + rng.randint(0, 3, n), 0, len(t) - 1)
+    tick = 2.0 * np.pi / TICKS_PER_REV
+    return {
+        'stamps': t[i],
+        'velocities': w[i] + rng.normal(0.0, 0.05, (n, 4)),
+        'positions': np.floor(phi[i] / tick) * tick,
+        'truth_stamps': t,
+        'truth': truth,
+    }
+
+
+def loop_stamps(duration_s, rate_hz, seed=0):
+    """Wake-up times of an odometry loop at rate_hz, a fifth of whose
+    cycles overrun by up to a period."""
+    rng = np.random.RandomState(seed + 1)
+    period = 1.0 / rate_hz
+    n = int(duration_s * rate_hz)
+    late = rng.uniform(0.0, period, n) * (rng.uniform(size=n) < 0.2)
+    return np.cumsum(period + late)
+
+
+def velocity_median_model(trace, stamps, transform):
+    """OdometryPublisher's model: per wheel, the median of the last few
+    speeds, converted to a twist and integrated over the nominal period."""
+    delta_t = 1.0 / ODOMETRY_UPDATE_RATE_Hz
+    history = [deque([0.0] * MEDIAN_WINDOW) for wheel in range(4)]
+    (x, y, theta) = (0.0, 0.0, 0.0)
+    poses = []
+    j = 0
+    cost = 0.0
+    for stamp in stamps:
+        while j < len(trace['stamps']) and trace['stamps'][j] <= stamp:
+            for wheel in range(4):
+                history[wheel].append(trace['velocities'][j, wheel])
+                history[wheel].popleft()
+            j += 1
+        start = time.time()
+        w = np.array([np.median(h) for h in history])
+        v = np.dot(transform, w)
+        x += (v[0] * np.cos(theta) - v[1] * np.sin(theta)) * delta_t
+        y += (v[0] * np.sin(theta) + v[1] * np.cos(theta)) * delta_t
+        theta += v[2] * delta_t
+        cost += time.time() - start
+        poses.append((x, y, theta))
+    return (np.array(poses), cost / len(stamps))
+
+
+def encoder_model(trace, stamps, method):
+    """EncoderOdometry fed with the newest position reading at each loop."""
+    odometry = eo.EncoderOdometry(WHEEL_RADIUS_m, HALF_WHEELBASE_X_m,
+                                  HALF_WHEELBASE_Y_m, method)
+    odometry.update(trace['stamps'][0], trace['positions'][0])
+    latest = np.searchsorted(trace['stamps'], stamps, side='right') - 1
+    poses = []
+    cost = 0.0
+    for j in latest:
+        start = time.time()
+        (pose, twist) = odometry.update(trace['stamps'][j],
+                                        trace['positions'][j])
+        cost += time.time() - start
+        poses.append(pose.copy())
+    return (np.array(poses), cost / len(stamps))
+
+
+def errors(poses, stamps, trace):
+    """Final and RMS position error (m), and final heading error (rad)."""
+    i = np.searchsorted(trace['truth_stamps'], stamps, side='right') - 1
+    truth = trace['truth'][i]
+    d = np.hypot(poses[:, 0] - truth[:, 0], poses[:, 1] - truth[:, 1])
+    heading = poses[-1, 2] - truth[-1, 2]
+    heading = np.arctan2(np.sin(heading), np.cos(heading))
+    return (d[-1], np.sqrt(np.mean(d**2)), abs(heading))
+
+
+def main(args):
+    args = list(args[1:])
+    save = None
+    if '--save' in args:
+        i = args.index('--save')
+        save = args[i + 1]
+        del args[i:i + 2]
+    if args:
+        trace = dict(np.load(args[0]))
+    else:
+        trace = synthetic_trace()
+    if save is not None:
+        np.savez(save, **trace)
+
+    stamps = loop_stamps(trace['stamps'][-1] - trace['stamps'][0],
+                         ODOMETRY_UPDATE_RATE_Hz)
+    stamps = stamps[stamps <= trace['stamps'][-1] - trace['stamps'][0]]
+    stamps += trace['stamps'][0]
+    transform = forward_matrix(WHEEL_RADIUS_m, HALF_WHEELBASE_X_m,
+                               HALF_WHEELBASE_Y_m)
+
+    results = [('velocity median',) +
+               velocity_median_model(trace, stamps, transform)]
+    for method in (eo.METHOD_EULER, eo.METHOD_MIDPOINT, eo.METHOD_ARC):
+        results.append(('encoder ' + method,) +
+                       encoder_model(trace, stamps, method))
+
+    print('%d odometry updates over %.1f s' % (len(stamps),
+                                              stamps[-1] - stamps[0]))
+    if 'truth' in trace:
+        print('%-18s %10s %10s %12s %10s' % ('model', 'final (m)', 'rms (m)',
+                                            'heading (rad)', 'update'))
+        for (name, poses, cost) in results:
+            (final, rms, heading) = errors(poses, stamps, trace)
+            print('%-18s %10.4f %10.4f %12.4f %8.1fus' % (
+                name, final, rms, heading, cost * 1e6))
+    else:
+        print('%-18s %10s %10s %12s %10s' % ('model', 'x (m)', 'y (m)',
+                                            'theta (rad)', 'update'))
+        for (name, poses, cost) in results:
+            print('%-18s %10.4f %10.4f %12.4f %8.1fus' % (
+                (name,) + tuple(poses[-1]) + (cost * 1e6,)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -12,17 +12,41 @@ from geometry_msgs.msg import Twist, Point, Quaternion
 from nav_msgs.msg import Odometry
 from roboteq_msgs.msg import Command as MotorCommand
 from roboteq_msgs.msg import Feedback as MotorFeedback
+from base_control.msg import WheelFeedback
 from sensor_msgs.msg import Imu
 import PyKDL as kdl
 import tf
 
 from base_control_node import BaseTransformHandler, WHEEL_RADIUS_m, \
     HALF_WHEELBASE_X_m, HALF_WHEELBASE_Y_m
-
-ODOMETRY_UPDATE_RATE_Hz = 10
+from encoder_odometry import EncoderOdometry, ODOMETRY_UPDATE_RATE_Hz
+from wheel_telemetry import MEDIAN_WINDOW, WheelTelemetry
+
+# ~mode: integrate wheel velocities over the nominal loop period, or wheel
+# encoder positions over their measured stamps
+MODE_VELOCITY = 'velocity'
+MODE_ENCODER = 'encoder'
+
+def feedback_stamp(feedback_msg):
+    """Time a motor or wheel feedback message was measured, in seconds. Falls back to
+    the time of arrival if the driver left the header unstamped."""
+    stamp = feedback_msg.header.stamp.to_sec()
+    if 0.0 == stamp:
+        stamp = rospy.get_time()
+    return stamp
 
 class OdometryPublisher(threading.Thread):
-    def __init__(self, transformer, odometry_update_rate_hz):
+    def __init__(self, transformer, odometry_update_rate_hz,
+                 encoder_odometry=None, aggregated_feedback=False):
+        """
+        :param transformer: BaseTransformHandler for the base.
+        :param odometry_update_rate_hz: rate of pose updates.
+        :param encoder_odometry: an EncoderOdometry, to integrate the wheel
+            positions from motor feedback instead of the wheel velocities.
+        :param aggregated_feedback: take the feedback of all four wheels
+            from WheelFeedback messages on /wheel_feedback, instead of one
+            /motor_N/feedback topic per wheel.
+        """
         # Correction factor to account for cumulative error sources: Mecanum wheel slippage,
         # encoder miscalibrations, etc. Empirically determined using the "poor-man's map" 
         # technique described here: 
@@ -30,33 +54,39 @@ class OdometryPublisher(threading.Thread):
         # Might only be correct for carpet in EB 84; needs more testing.
         self.TWIST_ANGULAR_CORRECTION = 1.1
 
-        # front motors are #1, #4
-        self.motor_1_listener = rospy.Subscriber(
-            "/motor_1/feedback",
-            MotorFeedback,
-            self.motor_1_feedback_callback)
-
-        self.motor_4_listener = rospy.Subscriber(
-            "/motor_4/feedback",
-            MotorFeedback,
-            self.motor_4_feedback_callback)
-
-        # rear motors are #2, #3
-        self.motor_2_listener = rospy.Subscriber(
-            "/motor_2/feedback",
-            MotorFeedback,
-            self.motor_2_feedback_callback)
-
-        self.motor_3_listener = rospy.Subscriber(
-            "/motor_3/feedback",
-            MotorFeedback,
-            self.motor_3_feedback_callback)
-
-        # last three wheel angular velocities, rads/s
-        self.w_1 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_2 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_3 = deque([0.0, 0.0, 0.0, 0.0])
-        self.w_4 = deque([0.0, 0.0, 0.0, 0.0])
+        # recent wheel angular velocities, rads/s, and positions, rads
+        self.telemetry = WheelTelemetry()
+        self.positions = WheelTelemetry()
+        self.encoder_odometry = encoder_odometry
+
+        if aggregated_feedback:
+            # all four wheels in one message
+            self.wheel_listener = rospy.Subscriber(
+                "/wheel_feedback",
+                WheelFeedback,
+                self.wheel_feedback_callback)
+        else:
+            # front motors are #1, #4
+            self.motor_1_listener = rospy.Subscriber(
+                "/motor_1/feedback",
+                MotorFeedback,
+                self.motor_1_feedback_callback)
+
+            self.motor_4_listener = rospy.Subscriber(
+                "/motor_4/feedback",
+                MotorFeedback,
+                self.motor_4_feedback_callback)
+
+            # rear motors are #2, #3
+            self.motor_2_listener = rospy.Subscriber(
+                "/motor_2/feedback",
+                MotorFeedback,
+                self.motor_2_feedback_callback)
+
+            self.motor_3_listener = rospy.Subscriber(
+                "/motor_3/feedback",
+                MotorFeedback,
+                self.motor_3_feedback_callback)
 
         self.transformer = transformer
         self.sleeper = rospy.Rate(odometry_update_rate_hz)
@@ -76,22 +106,12 @@ class OdometryPublisher(threading.Thread):
         while not rospy.is_shutdown():
             self.sleeper.sleep()
 
-            # get the incoming update
-            w = [np.median(self.w_1), np.median(self.w_2), np.median(self.w_3), np.median(self.w_4)]
-            twist = self.transformer.wheel_velocities_to_twist(w)
-            rospy.logdebug("OdometryPublisher.run(): wheel velocities: " + str(w))
-            rospy.logdebug("OdometryPublisher.run(): twist: " + str(twist))
-
-            # calculate our new position using a
-            # simple deterministic model
-            delta_x = ((twist.linear.x * np.cos(self.theta) - twist.linear.y
-                        * np.sin(self.theta)) * self.delta_t)
-            delta_y = ((twist.linear.x * np.sin(self.theta) + twist.linear.y
-                        * np.cos(self.theta)) * self.delta_t)
-            delta_theta = twist.angular.z * self.delta_t
-            self.x += delta_x
-            self.y += delta_y
-            self.theta += delta_theta
+            if self.encoder_odometry is None:
+                twist = self.integrate_velocities()
+            else:
+                twist = self.integrate_positions()
+                if twist is None:
+                    continue
 
             # create an Odometry message
             msg = Odometry()
@@ -120,28 +140,81 @@ class OdometryPublisher(threading.Thread):
                                                   msg.child_frame_id,
                                                   msg.header.frame_id)
 
+    def integrate_velocities(self):
+        """Advance the pose by the latest wheel velocities over one nominal
+        loop period. Returns the twist."""
+        w = list(self.telemetry.median(MEDIAN_WINDOW))
+        twist = self.transformer.wheel_velocities_to_twist(w)
+        rospy.logdebug("OdometryPublisher.run(): wheel velocities: " + str(w))
+        rospy.logdebug("OdometryPublisher.run(): twist: " + str(twist))
+
+        # calculate our new position using a
+        # simple deterministic model
+        delta_x = ((twist.linear.x * np.cos(self.theta) - twist.linear.y
+                    * np.sin(self.theta)) * self.delta_t)
+        delta_y = ((twist.linear.x * np.sin(self.theta) + twist.linear.y
+                    * np.cos(self.theta)) * self.delta_t)
+        delta_theta = twist.angular.z * self.delta_t
+        self.x += delta_x
+        self.y += delta_y
+        self.theta += delta_theta
+        return twist
+
+    def integrate_positions(self):
+        """Advance the pose by how far the wheels have turned since the last
+        update, using the measured feedback stamps. Returns the mean twist
+        since then, or None until every wheel has reported a position."""
+        (stamps, phi) = self.positions.snapshot(1)
+        if 0 == phi.shape[1]:
+            return None
+        (pose, v) = self.encoder_odometry.update(stamps.max(), phi[:, 0])
+        (self.x, self.y, self.theta) = pose
+        twist = Twist()
+        (twist.linear.x, twist.linear.y, twist.angular.z) = v
+        rospy.logdebug("OdometryPublisher.run(): wheel positions: " + str(phi[:, 0]))
+        return twist
+
+    def wheel_feedback_callback(self, feedback_msg):
+        stamp = feedback_stamp(feedback_msg)
+        self.telemetry.append_all(stamp, feedback_msg.measured_velocity)
+        self.positions.append_all(stamp, feedback_msg.measured_position)
+
     def motor_1_feedback_callback(self, feedback_msg):
-        self.w_1.append(feedback_msg.measured_velocity)
-        self.w_1.popleft()
+        stamp = feedback_stamp(feedback_msg)
+        self.telemetry.append(0, stamp, feedback_msg.measured_velocity)
+        self.positions.append(0, stamp, feedback_msg.measured_position)
 
     def motor_2_feedback_callback(self, feedback_msg):
-        self.w_2.append(feedback_msg.measured_velocity)
-        self.w_2.popleft()
+        stamp = feedback_stamp(feedback_msg)
+        self.telemetry.append(1, stamp, feedback_msg.measured_velocity)
+        self.positions.append(1, stamp, feedback_msg.measured_position)
 
     def motor_3_feedback_callback(self, feedback_msg):
-        self.w_3.append(feedback_msg.measured_velocity)
-        self.w_3.popleft()
+        stamp = feedback_stamp(feedback_msg)
+        self.telemetry.append(2, stamp, feedback_msg.measured_velocity)
+        self.positions.append(2, stamp, feedback_msg.measured_position)
 
     def motor_4_feedback_callback(self, feedback_msg):
-        self.w_4.append(feedback_msg.measured_velocity)
-        self.w_4.popleft()
+        stamp = feedback_stamp(feedback_msg)
+        self.telemetry.append(3, stamp, feedback_msg.measured_velocity)
+        self.positions.append(3, stamp, feedback_msg.measured_position)
 
 def main(args):
     rospy.init_node('base_odometry', anonymous=True, log_level=rospy.INFO)
     bth = BaseTransformHandler(WHEEL_RADIUS_m,
                                HALF_WHEELBASE_X_m,
                                HALF_WHEELBASE_Y_m)
-    pub = OdometryPublisher(bth, ODOMETRY_UPDATE_RATE_Hz)
+    encoder_odometry = None
+    mode = rospy.get_param('~mode', MODE_VELOCITY)
+    if MODE_ENCODER == mode:
+        encoder_odometry = EncoderOdometry(WHEEL_RADIUS_m,
+                                           HALF_WHEELBASE_X_m,
+                                           HALF_WHEELBASE_Y_m)
+    elif MODE_VELOCITY != mode:
+        rospy.logerr("base_odometry: unknown ~mode " + str(mode) +
+                     ", using " + MODE_VELOCITY)
+    pub = OdometryPublisher(bth, ODOMETRY_UPDATE_RATE_Hz, encoder_odometry,
+                            rospy.get_param('~aggregated_feedback', False))
     pub.start()
     rospy.spin()
 
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Drives the base wheels through the front and rear RoboClaw controllers.
+Wheel commands come in as one WheelCommand on /wheel_cmd; the speeds and
+positions of all four wheels go out together as one WheelFeedback on
+/wheel_feedback."""
+from collections import deque
+import sys
+
+import rospy
+from base_control.msg import WheelCommand, WheelFeedback
+
+import roboclaw as rc
+
+POLL_RATE_Hz = 50
+BAUDRATE = 2400
+ACCEL = 250 # counts/s/s
+
+class WheelFeedbackPublisher(object):
+    """Publishes the samples of a RoboClawManager, standing in for its
+    sample queue."""
+    def __init__(self):
+        self.publisher = rospy.Publisher("/wheel_feedback", WheelFeedback,
+                                         queue_size=5)
+
+    def append(self, sample):
+        msg = WheelFeedback()
+        msg.header.stamp = rospy.Time.from_sec(sample.stamp)
+        msg.measured_velocity = sample.w
+        msg.measured_position = sample.phi
+        self.publisher.publish(msg)
+
+
+def main(args):
+    rospy.init_node('roboclaw_base', anonymous=True)
+    ports = (rospy.get_param('~front_port', '/dev/ttyACM0'),
+             rospy.get_param('~rear_port', '/dev/ttyACM1'))
+    cmd_queue = deque()
+    manager = rc.RoboClawManager(ports,
+                                 rospy.get_param('~baudrate', BAUDRATE),
+                                 rospy.get_param('~accel', ACCEL),
+                                 rc.MAX_TICKS_PER_SECOND,
+                                 rc.TICKS_PER_REV,
+                                 rospy.get_param('~poll_rate_hz',
+                                                 POLL_RATE_Hz),
+                                 cmd_queue,
+                                 deque(maxlen=1),
+                                 rospy.get_param('~simulate', False),
+                                 WheelFeedbackPublisher(),
+                                 read_positions=True)
+    subscriber = rospy.Subscriber(
+        "/wheel_cmd", WheelCommand,
+        lambda msg: cmd_queue.append(tuple(msg.commanded_velocity)))
+    manager.start()
+    rospy.spin()
+    manager.quit = True
+    manager.join()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
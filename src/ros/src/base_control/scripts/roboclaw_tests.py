@@ -8,7 +8,9 @@ import pdb
 import time
 import unittest
 
+import roboclaw_driver
 import roboclaw as rc
+from wheel_telemetry import WheelTelemetry
 
 class RoboClawCommTests(unittest.TestCase):
     def setUp(self):
@@ -182,7 +184,132 @@ class RoboClawManagerTests(unittest.TestCase):
     def test_radians_to_ticks(self):
        n = self.mgr.radians_to_ticks(2.0 * numpy.pi)
        self.assertEqual(n, rc.TICKS_PER_REV)
-    
+
+
+class RoboClawManagerCycleTests(unittest.TestCase):
+    """Single manager cycles against simulated controllers, without the
+    work thread."""
+    def setUp(self):
+        self.log = []
+        self.cmd_queue = deque()
+        self.output_queue = deque()
+        self.sample_queue = deque()
+        self.mgr = rc.RoboClawManager(('front', 'rear'), 2400, 250, 3336,
+                                      rc.TICKS_PER_REV, 10, self.cmd_queue,
+                                      self.output_queue, True,
+                                      self.sample_queue)
+        self.sims = (rc.RoboClawSim(), rc.RoboClawSim())
+        self.mgr.front = roboclaw_driver.RoboClaw(
+            LoggingBus([self.sims[0]], 'front', self.log))
+        self.mgr.rear = roboclaw_driver.RoboClaw(
+            LoggingBus([self.sims[1]], 'rear', self.log))
+
+    def test_queries_in_flight_together(self):
+        self.mgr.cycle()
+        self.assertEqual(self.log,
+                         [('write', 'front'), ('write', 'rear'),
+                          ('write', 'rear'), ('write', 'front'),
+                          ('read', 'front'), ('read', 'rear'),
+                          ('read', 'rear'), ('read', 'front')])
+
+    def test_latest_command_wins(self):
+        self.cmd_queue.extend([(1.0, 1.0, 1.0, 1.0), (2.0, 3.0, 4.0, 5.0)])
+        before = time.time()
+        self.mgr.cycle()
+        self.assertEqual(len(self.cmd_queue), 0)
+        self.assertEqual(self.log.count(('write', 'front')), 3)
+
+        sample = self.sample_queue.pop()
+        self.assertEqual(self.output_queue.pop(), sample.w)
+        self.assertTrue(before <= sample.stamp <= time.time())
+        for (w, expected) in zip(sample.w, (2.0, 3.0, 4.0, 5.0)):
+            self.assertAlmostEqual(w, expected, delta=0.05)
+
+    def test_read_positions(self):
+        self.mgr.read_positions = True
+        self.sims[0].M2EncoderCnts = rc.TICKS_PER_REV
+        self.sims[1].M1EncoderCnts = -rc.TICKS_PER_REV
+        self.mgr.cycle()
+        # speeds and positions all go out before the first answer is read
+        self.assertEqual([op for (op, name) in self.log],
+                         ['write'] * 8 + ['read'] * 8)
+        sample = self.sample_queue.pop()
+        self.assertEqual(sample.w, (0.0, 0.0, 0.0, 0.0))
+        self.assertAlmostEqual(sample.phi[1], -2.0 * numpy.pi)
+        self.assertAlmostEqual(sample.phi[3], 2.0 * numpy.pi)
+
+    def test_telemetry(self):
+        self.mgr.telemetry = WheelTelemetry()
+        self.cmd_queue.append((1.0, 1.0, 1.0, 1.0))
+        self.mgr.cycle()
+        self.mgr.cycle()
+        (stamps, w) = self.mgr.telemetry.snapshot()
+        self.assertEqual(w.shape, (4, 2))
+        self.assertEqual(stamps[0, 1], self.sample_queue[-1].stamp)
+        self.assertEqual(tuple(w[:, 1]), self.output_queue[-1])
+
+    def test_lost_answer_keeps_previous_speed(self):
+        self.cmd_queue.append((1.0, 1.0, 1.0, 1.0))
+        self.mgr.cycle()
+        self.mgr.rear.port.sims = {}
+        self.mgr.cycle()
+        (w0, w1, w2, w3) = self.output_queue.pop()
+        self.assertAlmostEqual(w1, 1.0, delta=0.05)
+        self.assertAlmostEqual(w2, 1.0, delta=0.05)
+
+    def test_stray_byte_is_discarded(self):
+        self.mgr.rear = roboclaw_driver.RoboClaw(NoisyBus([self.sims[1]]))
+        self.cmd_queue.append((1.0, 1.0, 1.0, 1.0))
+        self.mgr.cycle()
+        # a byte of noise ahead of the rear's answers: they are lost, and
+        # only the first is waited for
+        self.mgr.rear.port.noise = b'\x00'
+        self.mgr.rear.port.reads = 0
+        self.cmd_queue.append((2.0, 2.0, 2.0, 2.0))
+        self.mgr.cycle()
+        self.assertEqual(self.mgr.rear.port.reads, 1)
+        (w0, w1, w2, w3) = self.output_queue.pop()
+        self.assertAlmostEqual(w0, 2.0, delta=0.05)
+        self.assertAlmostEqual(w1, 1.0, delta=0.05)
+        self.assertAlmostEqual(w2, 1.0, delta=0.05)
+        self.assertAlmostEqual(w3, 2.0, delta=0.05)
+        # and the next cycle reads them in step again
+        self.cmd_queue.append((3.0, 3.0, 3.0, 3.0))
+        self.mgr.cycle()
+        for w in self.output_queue.pop():
+            self.assertAlmostEqual(w, 3.0, delta=0.05)
+
+
+class NoisyBus(roboclaw_driver.SimulatedBus):
+    """SimulatedBus that puts noise ahead of the next answer read, and
+    counts reads."""
+    noise = b''
+    reads = 0
+
+    def read(self, size):
+        self.reads += 1
+        if self.noise:
+            self.outgoing[:0] = bytearray(self.noise)
+            self.noise = b''
+        return roboclaw_driver.SimulatedBus.read(self, size)
+
+
+class LoggingBus(roboclaw_driver.SimulatedBus):
+    """SimulatedBus that logs the order of reads and writes."""
+    def __init__(self, sims, name, log):
+        roboclaw_driver.SimulatedBus.__init__(self, sims)
+        self.name = name
+        self.log = log
+
+    def write(self, data):
+        self.log.append(('write', self.name))
+        return roboclaw_driver.SimulatedBus.write(self, data)
+
+    def read(self, size):
+        self.log.append(('read', self.name))
+        return roboclaw_driver.SimulatedBus.read(self, size)
+
+
 def main():
     """Run all tests."""
     logging.basicConfig(level=logging.INFO)
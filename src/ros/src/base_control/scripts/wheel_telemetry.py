@@ -0,0 +1,87 @@
+"""Fixed-size, timestamped history of the four wheel speeds, shared by the
+nodes and threads that produce and consume them without locks."""
+import numpy as np
+
+WHEELS = 4
+DEFAULT_CAPACITY = 256
+# the odometry publishers take wheel speeds as the median of this many
+# recent samples
+MEDIAN_WINDOW = 4
+
+class WheelTelemetry(object):
+    """Preallocated ring buffer of wheel angular velocities (rad/s) and the
+    times they were measured (s), one row per wheel, in the usual order:
+    motor 1 to 4, i.e. lf, lr, rr, rf.
+
+    Each wheel's row must have a single writer, e.g. that wheel's feedback
+    callback, or one thread writing all rows with append_all. Any number of
+    readers may take snapshots at the same time without locking: a reader
+    copies what it needs and retries if a writer lapped it meanwhile.
+
+    Stamps must not decrease along a row. A sample older than the newest
+    one already in its row is dropped and counted in dropped.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, wheels=WHEELS):
+        """
+        :param capacity: samples kept per wheel. Snapshots can return up to
+            capacity - 1 of them; the last slot is the one being written.
+        :param wheels: number of rows.
+        """
+        self.capacity = capacity
+        self.wheels = wheels
+        self.values = np.zeros((wheels, capacity))
+        self.stamps = np.zeros((wheels, capacity))
+        # samples ever written to each row; a slot is published by
+        # incrementing its row's count after the slot has been filled
+        self.counts = np.zeros(wheels, dtype=np.int64)
+        self.dropped = np.zeros(wheels, dtype=np.int64)
+        self.rows = np.arange(wheels)[:, np.newaxis]
+
+    def append(self, wheel, stamp, w):
+        """Add a sample for one wheel. Returns False if it was dropped for
+        being older than the newest sample of that wheel."""
+        count = self.counts[wheel]
+        if count > 0 and stamp < self.stamps[wheel, (count - 1) % self.capacity]:
+            self.dropped[wheel] += 1
+            return False
+        i = count % self.capacity
+        self.values[wheel, i] = w
+        self.stamps[wheel, i] = stamp
+        self.counts[wheel] = count + 1
+        return True
+
+    def append_all(self, stamp, w):
+        """Add a sample of every wheel, all taken at the same time."""
+        for wheel in range(self.wheels):
+            self.append(wheel, stamp, w[wheel])
+
+    def snapshot(self, n=None):
+        """Copy out the newest samples of every wheel.
+
+        :param n: samples wanted per wheel; by default, as many as possible.
+            Fewer come back if some wheel hasn't got n samples yet.
+        :return: (stamps, values), two arrays of shape (wheels, k), oldest
+            sample first. k is the same for every wheel and may be 0.
+        """
+        limit = self.capacity - 1
+        if n is not None:
+            limit = min(n, limit)
+        while True:
+            counts = self.counts.copy()
+            k = int(min(limit, counts.min()))
+            slots = (counts[:, np.newaxis] - k + np.arange(k)) % self.capacity
+            stamps = self.stamps[self.rows, slots]
+            values = self.values[self.rows, slots]
+            # the copy is good unless a writer has since reached a slot we
+            # copied; the slot at each row's count may be half-written
+            if ((self.counts - counts) + k < self.capacity).all():
+                return (stamps, values)
+
+    def median(self, n):
+        """The per-wheel median of the newest n samples, zeros if there are
+        none yet."""
+        (stamps, values) = self.snapshot(n)
+        if 0 == values.shape[1]:
+            return np.zeros(self.wheels)
+        return np.median(values, axis=1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+""" Unit tests for the WheelTelemetry ring buffer.
+"""
+import logging
+import threading
+import unittest
+
+import numpy as np
+
+from wheel_telemetry import WheelTelemetry
+
+class WheelTelemetryTests(unittest.TestCase):
+    def setUp(self):
+        self.telemetry = WheelTelemetry(capacity=8)
+
+    def test_empty(self):
+        (stamps, values) = self.telemetry.snapshot()
+        self.assertEqual(values.shape, (4, 0))
+        self.assertEqual(list(self.telemetry.median(4)), [0.0, 0.0, 0.0, 0.0])
+
+    def test_snapshot_is_oldest_first(self):
+        for i in range(3):
+            self.telemetry.append_all(float(i), (i, 10 + i, 20 + i, 30 + i))
+        (stamps, values) = self.telemetry.snapshot()
+        self.assertEqual(stamps.tolist(), [[0.0, 1.0, 2.0]] * 4)
+        self.assertEqual(values[3].tolist(), [30.0, 31.0, 32.0])
+        (stamps, values) = self.telemetry.snapshot(2)
+        self.assertEqual(values[0].tolist(), [1.0, 2.0])
+
+    def test_wraps_around(self):
+        for i in range(20):
+            self.telemetry.append_all(float(i), (i, i, i, i))
+        (stamps, values) = self.telemetry.snapshot()
+        # one slot is always kept free for the writer
+        self.assertEqual(values[2].tolist(), list(range(13, 20)))
+        self.assertEqual(self.telemetry.counts.tolist(), [20, 20, 20, 20])
+
+    def test_wheels_fill_independently(self):
+        self.telemetry.append(0, 1.0, 5.0)
+        self.telemetry.append(0, 2.0, 7.0)
+        self.telemetry.append(0, 3.0, 100.0)
+        self.telemetry.append(3, 1.5, -1.0)
+        # only as many samples as the emptiest wheel has
+        self.assertEqual(self.telemetry.snapshot()[1].shape, (4, 0))
+        for wheel in (1, 2):
+            self.telemetry.append(wheel, 1.0, 1.0)
+        self.assertEqual(self.telemetry.snapshot()[1][:, 0].tolist(),
+                         [100.0, 1.0, 1.0, -1.0])
+        self.assertEqual(self.telemetry.median(1).tolist(),
+                         [100.0, 1.0, 1.0, -1.0])
+
+    def test_old_samples_dropped(self):
+        self.assertTrue(self.telemetry.append(1, 2.0, 1.0))
+        self.assertFalse(self.telemetry.append(1, 1.0, 2.0))
+        self.assertTrue(self.telemetry.append(1, 2.0, 3.0))
+        self.assertEqual(self.telemetry.dropped.tolist(), [0, 1, 0, 0])
+        self.assertEqual(self.telemetry.counts[1], 2)
+
+    def test_concurrent_readers(self):
+        # every value is its own stamp, so a torn or lapped copy shows up as
+        # a row that isn't consecutive
+        telemetry = WheelTelemetry(capacity=16)
+        done = []
+        def write():
+            for i in range(20000):
+                telemetry.append_all(float(i), (i, i, i, i))
+            done.append(True)
+        writer = threading.Thread(target=write)
+        writer.start()
+        snapshots = 0
+        while not done:
+            (stamps, values) = telemetry.snapshot()
+            np.testing.assert_array_equal(stamps, values)
+            if values.shape[1] > 1:
+                self.assertTrue((np.diff(values, axis=1) == 1.0).all())
+            snapshots += 1
+        writer.join()
+        self.assertTrue(snapshots > 0)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+.. module:: breadcrumbs
+   :synopsis: Where the robot has been, in fixed memory: the latest poses
+   in a ring of arrays, with running totals of distance and time so that
+   the length of a trip is known as soon as it ends, and vectorized
+   analysis of what is kept.
+"""
+from collections import namedtuple
+import threading
+
+import numpy as np
+
+# over five hours of move_base feedback at 10 Hz, in about 3 MB
+DEFAULT_CAPACITY = 200000
+# slower than this, m/s, the robot counts as stalled
+STALL_SPEED_mps = 0.05
+# and it must stay that slow this long, s
+STALL_DURATION_s = 5.0
+
+# the totals at a moment, to measure a trip from
+Mark = namedtuple('Mark', ['distance', 'stamp', 'x', 'y', 'count'])
+# a trip so far: distance travelled, m, time taken, s, and how far it got
+# from where it started in a straight line, m
+Trip = namedtuple('Trip', ['distance', 'duration', 'displacement'])
+
+
+class BreadcrumbRecorder(object):
+    """
+        Keeps the last capacity poses, x and y as float32 in m and stamps
+        as float64 in s, overwriting the oldest; the distance and count
+        totals cover everything ever added.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.xy = np.zeros((capacity, 2), dtype=np.float32)
+        self.stamps = np.zeros(capacity)
+        self.count = 0
+        self.distance = 0.0
+        # the first and latest poses, as (x, y, stamp)
+        self.first = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, x, y, stamp):
+        with self.lock:
+            if self.last is not None:
+                self.distance += np.hypot(x - self.last[0], y - self.last[1])
+            i = self.count % self.capacity
+            self.xy[i] = (x, y)
+            self.stamps[i] = stamp
+            self.count += 1
+            self.last = (x, y, stamp)
+            if self.first is None:
+                self.first = self.last
+
+    def mark(self):
+        """The totals now, for trip() to measure from."""
+        with self.lock:
+            if self.last is None:
+                return Mark(self.distance, None, None, None, self.count)
+            return Mark(self.distance, self.last[2], self.last[0],
+                        self.last[1], self.count)
+
+    def trip(self, mark):
+        """The trip from mark to the latest pose."""
+        with self.lock:
+            if self.last is None:
+                return Trip(0.0, 0.0, 0.0)
+            (x, y, stamp) = self.last
+            distance = self.distance - mark.distance
+            if mark.stamp is None:
+                # nothing had been added at the mark: from the first pose
+                (x0, y0, stamp0) = self.first
+            else:
+                (x0, y0, stamp0) = (mark.x, mark.y, mark.stamp)
+        return Trip(distance, stamp - stamp0, np.hypot(x - x0, y - y0))
+
+    def history(self, since=0):
+        """
+            The poses kept that were added from the since'th on (a count,
+            as in a Mark), oldest first: ((N, 2) x, y, (N,) stamps).
+        """
+        with self.lock:
+            first = max(since, self.count - self.capacity)
+            index = np.arange(first, self.count) % self.capacity
+            return (self.xy[index].astype(float), self.stamps[index])
+
+
+def speeds(xy, stamps):
+    """Speed over each step between poses, m/s; (N - 1,)."""
+    step = np.hypot(*np.diff(xy, axis=0).T)
+    dt = np.diff(stamps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(dt > 0.0, step / dt, 0.0)
+
+
+def stalls(xy, stamps, speed=STALL_SPEED_mps, duration=STALL_DURATION_s):
+    """Times (start, end), s, over which the robot moved slower than speed
+    for at least duration."""
+    slow = np.concatenate([[False], speeds(xy, stamps) < speed, [False]])
+    edges = np.flatnonzero(np.diff(slow.astype(np.int8)))
+    (starts, ends) = (edges[::2], edges[1::2])
+    keep = (stamps[ends] - stamps[starts]) >= duration
+    return list(zip(stamps[starts[keep]], stamps[ends[keep]]))
+
+
+def detour_ratio(trip):
+    """How much farther a trip went than the straight line from where it
+    started to where it ended; 1 is no detour at all."""
+    if trip.displacement <= 0.0:
+        return np.inf if trip.distance > 0.0 else 1.0
+    return trip.distance / trip.displacement
@@ -0,0 +1,186 @@
+"""
+.. module:: goal_queue
+   :synopsis: Keeps an action server busy with one goal after another:
+   the next goals are chosen while the current one runs, and the first of
+   them is sent as soon as it succeeds. Kept free of ROS; the caller
+   sends goals and reports how they ended.
+"""
+from collections import deque
+import threading
+import time
+
+# how a goal ended, as told to done()
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+PREEMPTED = 'preempted'
+
+DEFAULT_DEPTH = 2
+DEFAULT_TIMEOUT_s = 300.0
+# after a goal fails, or when there is nothing to do, wait this long
+# before trying again
+DEFAULT_RETRY_s = 1.0
+
+# what wait_for_turn() returns when the current goal has run too long
+TIMED_OUT = object()
+
+
+class GoalQueue(object):
+    """
+        Runs goals one at a time from a thread calling run().
+
+        select() chooses each goal, or returns None if there is none to
+        be had; it is called ahead, to keep depth goals queued. send(goal)
+        starts one, and whatever follows it must call done(goal, outcome)
+        when it ends. cancel() stops the current goal; done() must still
+        follow. on_done(goal, outcome), if given, is called from done()
+        before the next goal is sent. unselect(goals), if given, is called
+        with the goals chosen ahead whenever they are forgotten, oldest
+        first, so that they can be chosen again; like select(), it is
+        called holding the queue's condition.
+
+        A goal that runs longer than timeout_s is cancelled and counts as
+        failed.
+    """
+    def __init__(self, select, send, cancel, on_done=None, unselect=None,
+                 depth=DEFAULT_DEPTH, timeout_s=DEFAULT_TIMEOUT_s,
+                 retry_s=DEFAULT_RETRY_s, clock=time.time):
+        self.select = select
+        self.send = send
+        self.cancel = cancel
+        self.on_done = on_done
+        self.unselect = unselect
+        self.depth = depth
+        self.timeout_s = timeout_s
+        self.retry_s = retry_s
+        self.clock = clock
+        self.queue = deque()
+        self.current = None
+        self.started = None
+        self.timed_out = False
+        # whether the current goal is still being sent, and whether it was
+        # halted meanwhile, to be cancelled once it has been
+        self.sending = False
+        self.halted_sending = False
+        # whether goals should be sent, and not before when
+        self.running = False
+        self.not_before = 0.0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.sent = 0
+        self.succeeded = 0
+
+    def start(self):
+        """Start sending goals."""
+        with self.condition:
+            self.running = True
+            self.condition.notify()
+
+    def halt(self):
+        """Stop sending goals, cancel the current one, and forget those
+        chosen."""
+        with self.condition:
+            self.running = False
+            self.forget()
+            if self.current is None:
+                return
+            if self.sending:
+                # the server doesn't have it yet; run() cancels it after
+                self.halted_sending = True
+                return
+        self.cancel()
+
+    def refresh(self):
+        """Forget the goals chosen ahead, as what to choose from has
+        changed."""
+        with self.condition:
+            self.forget()
+
+    def close(self):
+        """Make run() return."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def done(self, goal, outcome):
+        """Report how the current goal ended."""
+        with self.condition:
+            if self.current is None:
+                return
+            if self.timed_out:
+                outcome = FAILED
+        try:
+            if self.on_done is not None:
+                self.on_done(goal, outcome)
+        finally:
+            with self.condition:
+                if SUCCEEDED == outcome:
+                    self.succeeded += 1
+                else:
+                    self.not_before = self.clock() + self.retry_s
+                self.current = None
+                self.condition.notify()
+
+    def run(self):
+        """Send goals until close()."""
+        while True:
+            with self.condition:
+                goal = self.wait_for_turn()
+            if goal is None:
+                return
+            if goal is TIMED_OUT:
+                # not holding the condition: the client may be calling
+                # done() from inside its own lock, which cancel needs too
+                self.cancel()
+                continue
+            self.send(goal)
+            with self.condition:
+                self.sending = False
+                halted = self.halted_sending
+                # choose the next while this one runs
+                if self.running:
+                    self.fill()
+            if halted:
+                self.cancel()
+
+    def wait_for_turn(self):
+        """Wait, holding the condition, until a goal should be sent, and
+        make it current; or until the current goal has run too long, then
+        TIMED_OUT. None once closed."""
+        while not self.closed:
+            now = self.clock()
+            if self.current is not None:
+                remaining = self.started + self.timeout_s - now
+                if remaining <= 0.0 and not self.timed_out:
+                    self.timed_out = True
+                    return TIMED_OUT
+                self.condition.wait(max(remaining, self.retry_s))
+            elif not self.running:
+                self.condition.wait()
+            elif now < self.not_before:
+                self.condition.wait(self.not_before - now)
+            else:
+                self.fill()
+                if not self.queue:
+                    self.not_before = now + self.retry_s
+                    continue
+                self.current = self.queue.popleft()
+                self.started = now
+                self.timed_out = False
+                self.sending = True
+                self.halted_sending = False
+                self.sent += 1
+                return self.current
+        return None
+
+    def fill(self):
+        while len(self.queue) < self.depth:
+            goal = self.select()
+            if goal is None:
+                break
+            self.queue.append(goal)
+
+    def forget(self):
+        """Clear the goals chosen ahead, handing them to unselect."""
+        if self.queue and self.unselect is not None:
+            self.unselect(list(self.queue))
+        self.queue.clear()
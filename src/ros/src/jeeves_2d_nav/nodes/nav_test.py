@@ -3,41 +3,96 @@
 .. module:: nav_test
    :synopsis: Node that waits for the service /waypoint_manager/get_waypoints
    service to become available, loads all waypoints then visits each waypoint
-   in turn before exiting.
+   in turn before exiting. Changes to the waypoints come in on the latched
+   topic /waypoint_manager/waypoints.
+
+   With the ~mode param 'random' (the default) each goal is an enabled
+   waypoint picked at random; with 'tour', the enabled waypoints are
+   visited over and over in the order of a short tour, planned again when
+   they change.
+
+   Goals are sent from a GoalQueue: the next are chosen while the robot
+   heads for the current one, and sent the moment it arrives; ~queue_depth
+   are chosen ahead, and a goal taking longer than ~goal_timeout s is
+   cancelled and counts as failed. HALT on /nav_test/cmd cancels the goal
+   at once; any other command starts or resumes.
+
+   What each trip between two waypoints cost is learned into a
+   PathCostCache, saved to ~path_cost_file if set, and used for planning
+   tours and for the expected duration announced with each goal.
 """
 import numpy as np
 import threading
 import yaml
 
 import actionlib
+from actionlib_msgs.msg import GoalStatus
 from geometry_msgs.msg import Pose, Point, Quaternion
 from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
+from nav_msgs.msg import MapMetaData
 from std_msgs.msg import String
 import rospy
 import tf
-from tf import TransformListener
 
 import jeeves_2d_nav
 from jeeves_2d_nav.srv import *
+import breadcrumbs
+import goal_queue
+from path_costs import PathCostCache
+import tour_planner
+
+MODE_RANDOM = 'random'
+MODE_TOUR = 'tour'
+# how move_base's final goal states count; anything else failed
+OUTCOMES = {GoalStatus.SUCCEEDED: goal_queue.SUCCEEDED,
+            GoalStatus.PREEMPTED: goal_queue.PREEMPTED,
+            GoalStatus.RECALLED: goal_queue.PREEMPTED}
 
 class NavTest(threading.Thread):
     def __init__(self):
-        self.halt = True
-        self.sleeper = rospy.Rate(1)
-        self.waypoints = {}
-        self.breadcrumbs = []
+        self.waypoints = []
+        self.mode = rospy.get_param('~mode', MODE_RANDOM)
+        # waypoints left to visit on the tour, the waypoints it was planned
+        # over, and the last waypoint chosen
+        self.tour = []
+        self.tour_waypoints = None
+        self.last_name = None
+        # the waypoint the robot is at, if the last trip arrived
+        self.at_name = None
+        self.path_cost_file = rospy.get_param('~path_cost_file', '')
+        self.path_costs = PathCostCache(
+            max_age_s=rospy.get_param('~path_cost_max_age', None))
+        self.path_costs_lock = threading.Lock()
+        if self.path_cost_file:
+            self.path_costs.load(self.path_cost_file)
+        self.breadcrumbs = breadcrumbs.BreadcrumbRecorder(
+            rospy.get_param('~breadcrumbs', breadcrumbs.DEFAULT_CAPACITY))
         self.total_distance_traveled_m = 0.0
+        self.arrivals = 0
+        self.trip_start = None
+        self.trip_start_time = None
         self.mbc = actionlib.SimpleActionClient('move_base', MoveBaseAction)
+        # goals go out from run(), once started by a command
+        self.goals = goal_queue.GoalQueue(
+            self.next_waypoint, self.send_goal, self.mbc.cancel_goal,
+            on_done=self.goal_done, unselect=self.unselect_waypoints,
+            depth=rospy.get_param('~queue_depth', goal_queue.DEFAULT_DEPTH),
+            timeout_s=rospy.get_param('~goal_timeout',
+                                      goal_queue.DEFAULT_TIMEOUT_s))
+        rospy.on_shutdown(self.goals.close)
         self.cmd_subscriber = rospy.Subscriber('/nav_test/cmd', String,
                                                self.cmd_callback)
         self.msg_pub = rospy.Publisher('/nav_test/last_message',
                                            String, latch=True, queue_size=10)
         self.progress_pub = rospy.Publisher('/nav_test/progress',
                                            String, latch=True, queue_size=10)        
-        self.tf = TransformListener()
         threading.Thread.__init__(self)
         self.get_waypoints = rospy.ServiceProxy(
             '/waypoint_manager/get_waypoints', jeeves_2d_nav.srv.GetWaypoints)
+        self.waypoints_subscriber = rospy.Subscriber(
+            '/waypoint_manager/waypoints', String, self.waypoints_callback)
+        self.map_subscriber = rospy.Subscriber(
+            '/map_metadata', MapMetaData, self.map_callback)
 
     def run(self):
         rospy.loginfo("Waiting for move_base action server.")
@@ -51,85 +106,160 @@ class NavTest(threading.Thread):
             self.waypoints = yaml.load(self.get_waypoints().waypoints)
         except Exception as e:
             rospy.logerr("Exception getting waypoints: " + str(e.args))
-        self.breadcrumbs.append(self.get_current_pose())
-
-        while not rospy.is_shutdown():
-            if not self.halt:
-                # select a random waypoint that is enabled
-                self.waypoints = yaml.load(self.get_waypoints().waypoints)
-                idx = np.random.randint(0, len(self.waypoints))
-                wp = self.waypoints[idx]
-                if not wp['enabled']:
-                    continue
-                name = wp['name']
-                x = wp['x']
-                y = wp['y']
-                q = tf.transformations.quaternion_from_euler(0.0, 0.0, wp['theta'])
-                goal = MoveBaseGoal()
-                goal.target_pose.pose = Pose(Point(x, y, 0.0),
-                                             Quaternion(q[0], q[1], q[2], q[3]))
-                goal.target_pose.header.frame_id = 'map'
-                goal.target_pose.header.stamp = rospy.Time.now()
-                msg = "Proceeding to waypoint: " + name
-                rospy.loginfo(msg)
-                self.msg_pub.publish(msg)
-                trip_start_idx = len(self.breadcrumbs)
-                self.mbc.send_goal(goal,
-                                   feedback_cb=self.move_base_feedback_callback)
-                result = self.mbc.wait_for_result(rospy.Duration(300))
-                if result:
-                    tl = trip_length(self.breadcrumbs[trip_start_idx:])
-                    self.total_distance_traveled_m += tl
-                    msg = "Arrived at waypoint: " + name
-                    self.msg_pub.publish(msg)
-                    rospy.loginfo(msg)
-                    rospy.loginfo("trip length: " + str(tl))
-                    rospy.loginfo("total_distance_traveled_m: " +
-                                  str(self.total_distance_traveled_m))
-                    rospy.logdebug("breadcrumbs: " + str(len(self.breadcrumbs)))
-                    
-                    # publish summary
-                    msg = "last trip length: " + str(tl) + '\n'
-                    msg += ("total_distance_traveled_m: " +
-                                  str(self.total_distance_traveled_m))
-                    self.progress_pub.publish(msg)
-
-                self.sleeper.sleep()
-            else:
-                self.sleeper.sleep()
-
-    def get_current_pose(self):
-        if self.tf.frameExists("base_footprint") and self.tf.frameExists("map"):
-            t = self.tf.getLatestCommonTime("base_footprint", "map")
-            pos, q = self.tf.lookupTransform("base_footprint", "map", t)
-            return Pose(pos, q)
+
+        self.goals.run()
+
+    def send_goal(self, wp):
+        """GoalQueue send: head for waypoint wp."""
+        name = wp['name']
+        q = tf.transformations.quaternion_from_euler(0.0, 0.0, wp['theta'])
+        goal = MoveBaseGoal()
+        goal.target_pose.pose = Pose(Point(wp['x'], wp['y'], 0.0),
+                                     Quaternion(q[0], q[1], q[2], q[3]))
+        goal.target_pose.header.frame_id = 'map'
+        goal.target_pose.header.stamp = rospy.Time.now()
+        msg = "Proceeding to waypoint: " + name
+        with self.path_costs_lock:
+            cost = self.path_costs.get(self.at_name, name)
+        if cost is not None and cost.trips > cost.failures:
+            msg += " (about %.0f s)" % cost.duration
+        rospy.loginfo(msg)
+        self.msg_pub.publish(msg)
+        self.trip_start = self.breadcrumbs.mark()
+        self.trip_start_time = rospy.get_time()
+        self.mbc.send_goal(
+            goal,
+            done_cb=lambda state, result: self.goals.done(wp, OUTCOMES.get(
+                state, goal_queue.FAILED)),
+            feedback_cb=self.move_base_feedback_callback)
+
+    def goal_done(self, wp, outcome):
+        """GoalQueue on_done: account for the trip to waypoint wp."""
+        name = wp['name']
+        trip = self.breadcrumbs.trip(self.trip_start)
+        tl = trip.distance
+        self.record_trip(name, outcome, tl,
+                         rospy.get_time() - self.trip_start_time)
+        if goal_queue.SUCCEEDED != outcome:
+            msg = "Did not reach waypoint: " + name + " (" + outcome + ")"
+            self.msg_pub.publish(msg)
+            rospy.loginfo(msg)
+            return
+        self.total_distance_traveled_m += tl
+        self.arrivals += 1
+        msg = "Arrived at waypoint: " + name
+        self.msg_pub.publish(msg)
+        rospy.loginfo(msg)
+        rospy.loginfo("trip length: " + str(tl))
+        rospy.loginfo("total_distance_traveled_m: " +
+                      str(self.total_distance_traveled_m))
+        (xy, stamps) = self.breadcrumbs.history(self.trip_start.count)
+        rospy.loginfo("detour ratio: %.2f, stalls: %d" % (
+            breadcrumbs.detour_ratio(trip),
+            len(breadcrumbs.stalls(xy, stamps))))
+        rospy.logdebug("breadcrumbs: " + str(self.breadcrumbs.count))
+
+        # publish summary
+        msg = "last trip length: " + str(tl) + '\n'
+        msg += ("total_distance_traveled_m: " +
+                      str(self.total_distance_traveled_m)) + '\n'
+        msg += ("waypoints reached: " + str(self.arrivals) + " of " +
+                str(self.goals.sent))
+        self.progress_pub.publish(msg)
+
+    def next_waypoint(self):
+        """The enabled waypoint to go to next, or None if there are none."""
+        waypoints = self.waypoints
+        enabled = [wp for wp in waypoints if wp['enabled']]
+        if not enabled:
+            return None
+        if self.mode != MODE_TOUR:
+            wp = enabled[np.random.randint(0, len(enabled))]
+        else:
+            if self.tour_waypoints is not waypoints or not self.tour:
+                self.plan_tour(enabled)
+                self.tour_waypoints = waypoints
+            wp = self.tour.pop(0)
+        self.last_name = wp['name']
+        return wp
+
+    def unselect_waypoints(self, wps):
+        """GoalQueue unselect: the waypoints chosen ahead weren't sent, so
+        put them back at the front of the tour, and carry on from the goal
+        the robot is heading for."""
+        if self.mode != MODE_TOUR:
+            return
+        self.tour[:0] = wps
+        current = self.goals.current
+        self.last_name = current['name'] if current is not None else None
+
+    def plan_tour(self, waypoints):
+        """Plan a tour of waypoints that carries on from the last one
+        chosen, if it is among them."""
+        names = [wp['name'] for wp in waypoints]
+        start = 0
+        if self.last_name in names:
+            start = names.index(self.last_name)
+        with self.path_costs_lock:
+            d = self.path_costs.cost_matrix(
+                names, [(wp['x'], wp['y']) for wp in waypoints])
+        order = tour_planner.plan_tour(d, start)
+        if self.last_name in names:
+            # already there; come back to it at the end
+            order = order[1:] + order[:1]
+        self.tour = [waypoints[i] for i in order]
+        rospy.loginfo("Planned a tour of " + str(len(order)) +
+                      " waypoints, length " +
+                      str(tour_planner.tour_length(order, d)))
+
+    def record_trip(self, name, outcome, distance, duration):
+        """Learn the cost of the trip to waypoint name from the one the
+        robot was at, given how the goal ended."""
+        succeeded = (goal_queue.SUCCEEDED == outcome)
+        if self.at_name not in (None, name) and \
+           goal_queue.PREEMPTED != outcome:
+            with self.path_costs_lock:
+                self.path_costs.record(self.at_name, name, succeeded,
+                                       distance, duration)
+                if self.path_cost_file:
+                    try:
+                        self.path_costs.save(self.path_cost_file)
+                    except EnvironmentError as e:
+                        rospy.logerr("Could not save path costs: " + str(e))
+        self.at_name = name if succeeded else None
+
+    def map_callback(self, msg):
+        # changes whenever a different map is loaded
+        map_id = "%dx%d %.3f (%.2f, %.2f)" % (
+            msg.width, msg.height, msg.resolution,
+            msg.origin.position.x, msg.origin.position.y)
+        with self.path_costs_lock:
+            self.path_costs.set_map(map_id)
 
     def cmd_callback(self, cmd_msg):
         if cmd_msg.data == "HALT":
             rospy.loginfo("Received cmd: HALT. Canceling goal.")
-            self.halt = True
-            self.mbc.cancel_goal()
+            self.goals.halt()
         else:
             rospy.loginfo("Received cmd: " + cmd_msg.data)
-            self.halt = False
+            self.goals.start()
+
+    def waypoints_callback(self, msg):
+        try:
+            self.waypoints = yaml.load(msg.data) or []
+        except Exception as e:
+            rospy.logerr("Exception parsing waypoints: " + str(e.args))
+            return
+        # choose the goals after the current one again, from these
+        self.goals.refresh()
 
     def move_base_feedback_callback(self, feedback_msg):
         # type(feedback_msg) =
         # <class 'move_base_msgs.msg._MoveBaseFeedback.MoveBaseFeedback'>
-        self.breadcrumbs.append(feedback_msg.base_position.pose)
-
-
-def trip_length(poses):
-    trip_len = 0.0
-    for pose in enumerate(poses):
-        idx = pose[0]
-        if idx == 0:
-            continue
-        dx = pose[1].position.x - poses[idx-1].position.x
-        dy = pose[1].position.y - poses[idx-1].position.y
-        d = np.sqrt((dx * dx) + (dy * dy))
-        trip_len += d
-    return trip_len
+        position = feedback_msg.base_position.pose.position
+        self.breadcrumbs.append(position.x, position.y,
+                                feedback_msg.base_position.header.stamp.to_sec())
+
 
 def main(args):
     rospy.init_node('nav_test_node', anonymous=True)
@@ -0,0 +1,173 @@
+"""
+.. module:: path_costs
+   :synopsis: What trips between pairs of waypoints have actually cost:
+   distance travelled, time taken and how often they failed, learned from
+   move_base results and kept across runs.
+"""
+from collections import OrderedDict
+import os
+import time
+
+import numpy as np
+import yaml
+
+import tour_planner
+from waypoint_file import write_atomically
+
+DEFAULT_CAPACITY = 5000
+# weight of the latest trip in the averages once there have been more
+# than 1 / TRIP_WEIGHT; until then they are plain means
+TRIP_WEIGHT = 0.2
+# failure rate beyond which a pair's cost stops growing
+MAX_FAILURE_RATE = 0.9
+
+
+class PathCost(object):
+    """Costs of going from one waypoint to another."""
+    def __init__(self, d=None):
+        self.trips = 0
+        self.failures = 0
+        # averages over successful trips: m and s
+        self.distance = 0.0
+        self.duration = 0.0
+        # average over all trips, 1 for failed
+        self.failure_rate = 0.0
+        # when a trip was last recorded, and the cost last asked for, s
+        self.recorded = 0.0
+        self.used = 0.0
+        if d is not None:
+            for attr in self.__dict__.keys():
+                if attr in d:
+                    self.__dict__[attr] = d[attr]
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def record(self, succeeded, distance, duration, now):
+        # plain floats, which safe_dump can write, whatever the caller
+        # measured with
+        (distance, duration, now) = (float(distance), float(duration),
+                                     float(now))
+        self.trips += 1
+        weight = max(1.0 / self.trips, TRIP_WEIGHT)
+        self.failure_rate += weight * ((0.0 if succeeded else 1.0) -
+                                       self.failure_rate)
+        if succeeded:
+            successes = self.trips - self.failures
+            weight = max(1.0 / successes, TRIP_WEIGHT)
+            self.distance += weight * (distance - self.distance)
+            self.duration += weight * (duration - self.duration)
+        else:
+            self.failures += 1
+        self.recorded = now
+
+    def expected_distance(self):
+        """Distance per successful arrival, counting trips that fail
+        as going the distance and having to be made again."""
+        rate = min(self.failure_rate, MAX_FAILURE_RATE)
+        return self.distance / (1.0 - rate)
+
+
+class PathCostCache(object):
+    """
+        PathCosts by (from, to) waypoint name, least recently used first,
+        holding at most capacity; saved to and loaded from a YAML file.
+
+        Costs learned on an old map mislead on a new one: set_map() drops
+        those recorded before the map they were learned on changed, and
+        max_age_s, if given, any recorded longer ago than that.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_age_s=None):
+        self.capacity = capacity
+        self.max_age_s = max_age_s
+        self.costs = OrderedDict()
+        # identifies the map the costs were learned on
+        self.map_id = None
+
+    def __len__(self):
+        return len(self.costs)
+
+    def get(self, from_name, to_name, now=None):
+        """The PathCost from one waypoint to another, or None if no trip
+        between them is known."""
+        cost = self.costs.pop((from_name, to_name), None)
+        if cost is not None:
+            cost.used = time.time() if now is None else float(now)
+            self.costs[(from_name, to_name)] = cost
+        return cost
+
+    def record(self, from_name, to_name, succeeded, distance=0.0,
+               duration=0.0, now=None):
+        """Add a trip's outcome; distance (m) and duration (s) count only
+        if it succeeded."""
+        now = time.time() if now is None else float(now)
+        cost = self.costs.pop((from_name, to_name), None) or PathCost()
+        cost.record(succeeded, distance, duration, now)
+        cost.used = now
+        self.costs[(from_name, to_name)] = cost
+        self.evict(now)
+
+    def evict(self, now=None):
+        """Drop the least recently used costs beyond capacity, and any
+        recorded more than max_age_s ago."""
+        if self.max_age_s is not None:
+            now = time.time() if now is None else now
+            self.evict_before(now - self.max_age_s)
+        while len(self.costs) > self.capacity:
+            self.costs.popitem(last=False)
+
+    def set_map(self, map_id, now=None):
+        """Note the map in use, identified by any string that changes
+        with it; if it isn't the one the costs were learned on, drop them
+        all."""
+        if map_id != self.map_id:
+            if self.map_id is not None:
+                self.evict_before(time.time() if now is None else now)
+            self.map_id = map_id
+
+    def evict_before(self, t):
+        """Drop costs last recorded before time t, s."""
+        for (pair, cost) in list(self.costs.items()):
+            if cost.recorded < t:
+                del self.costs[pair]
+
+    def cost_matrix(self, names, points):
+        """
+            Matrix of costs between the waypoints called names, at points
+            (N, 2) x, y, for tour_planner: the expected distance where
+            trips have succeeded, taking the mean of the two directions
+            where both are known, and the straight line elsewhere.
+        """
+        d = tour_planner.straight_line_costs(points)
+        known = np.zeros(d.shape, dtype=bool)
+        learned = np.zeros(d.shape)
+        index = dict((name, i) for (i, name) in enumerate(names))
+        for ((a, b), cost) in self.costs.items():
+            if a in index and b in index and cost.trips > cost.failures:
+                (i, j) = (index[a], index[b])
+                learned[i, j] = cost.expected_distance()
+                known[i, j] = True
+        # make it the same both ways
+        both = known & known.T
+        learned = np.where(both, 0.5 * (learned + learned.T),
+                           np.where(known, learned, learned.T))
+        return np.where(known | known.T, learned, d)
+
+    def save(self, path):
+        """Write the costs to path, in order of use."""
+        write_atomically(path, yaml.safe_dump(
+            {'map': self.map_id,
+             'costs': [{'from': a, 'to': b, 'cost': cost.as_dict()}
+                       for ((a, b), cost) in self.costs.items()]},
+            default_flow_style=False))
+
+    def load(self, path):
+        """Read costs saved by save(), if there is anything at path."""
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            saved = yaml.safe_load(f) or {}
+        self.map_id = saved.get('map')
+        for entry in saved.get('costs', []):
+            self.costs[(entry['from'], entry['to'])] = PathCost(entry['cost'])
+        self.evict()
@@ -0,0 +1,45 @@
+"""Tests for the breadcrumbs module.
+"""
+import numpy as np
+
+import breadcrumbs as bc
+
+
+def test_ring_and_totals():
+    recorder = bc.BreadcrumbRecorder(capacity=10)
+    start = recorder.mark()
+    assert(recorder.trip(start) == (0.0, 0.0, 0.0))
+    for i in range(25):
+        recorder.append(float(i), 0.0, 100.0 + i)
+    assert(len(recorder) == 10 and recorder.count == 25)
+    (xy, stamps) = recorder.history()
+    assert(list(xy[:, 0]) == list(range(15, 25)))
+    assert(list(stamps) == list(np.arange(115.0, 125.0)))
+
+    # totals run from the first pose, though it is no longer kept
+    trip = recorder.trip(start)
+    assert(np.isclose(trip.distance, 24.0))
+    assert(np.isclose(trip.duration, 24.0))
+
+    mark = recorder.mark()
+    for (x, y) in ((24.0, 3.0), (28.0, 3.0), (28.0, 0.0)):
+        recorder.append(x, y, recorder.last[2] + 1.0)
+    trip = recorder.trip(mark)
+    assert(np.allclose(trip, (10.0, 3.0, 4.0)))
+    assert(np.isclose(bc.detour_ratio(trip), 2.5))
+    assert(len(recorder.history(mark.count)[1]) == 3)
+
+
+def test_speeds_and_stalls():
+    stamps = np.arange(0.0, 30.0)
+    x = np.concatenate([np.arange(10) * 0.5,          # moving, 0.5 m/s
+                        4.5 + np.zeros(8),             # stopped for 8 s
+                        4.5 + np.arange(1, 5) * 0.5,   # moving
+                        6.5 + np.zeros(4),             # stopped for 4 s
+                        6.5 + np.arange(1, 5) * 0.5])
+    xy = np.array([x, np.zeros(30)]).T
+    v = bc.speeds(xy, stamps)
+    assert(v.shape == (29,))
+    assert(np.isclose(v.max(), 0.5) and v.min() == 0.0)
+    assert(bc.stalls(xy, stamps) == [(9.0, 17.0)])
+    assert(len(bc.stalls(xy, stamps, duration=3.0)) == 2)
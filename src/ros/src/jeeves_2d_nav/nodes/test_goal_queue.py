@@ -0,0 +1,205 @@
+"""Tests for the GoalQueue class.
+"""
+import threading
+import time
+
+import goal_queue as gq
+
+
+class FakeServer(object):
+    """Runs each goal it is sent for a moment, in a thread of its own."""
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.sent = []
+        self.cancelled = threading.Event()
+        self.queue = None
+
+    def send(self, goal):
+        self.sent.append((goal, time.time()))
+        outcome = self.outcomes.get(goal, gq.SUCCEEDED)
+
+        def finish():
+            if outcome is None:
+                # never finishes by itself
+                self.cancelled.wait()
+                self.cancelled.clear()
+                self.queue.done(goal, gq.PREEMPTED)
+                return
+            time.sleep(0.01)
+            self.queue.done(goal, outcome)
+        thread = threading.Thread(target=finish)
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def run_queue(outcomes, goals, **kwargs):
+    server = FakeServer(outcomes)
+    remaining = list(goals)
+    selected = []
+    finished = []
+
+    def select():
+        if not remaining:
+            return None
+        selected.append((remaining[0], len(server.sent)))
+        return remaining.pop(0)
+
+    queue = gq.GoalQueue(select, server.send, server.cancel,
+                         on_done=lambda g, o: finished.append((g, o)),
+                         **kwargs)
+    server.queue = queue
+    thread = threading.Thread(target=queue.run)
+    thread.daemon = True
+    thread.start()
+    return (queue, server, selected, finished, thread)
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.005)
+    assert(condition())
+
+
+def test_goals_follow_one_another():
+    (queue, server, selected, finished, thread) = run_queue(
+        {'b': gq.FAILED}, 'abcde', depth=2, retry_s=0.2)
+    time.sleep(0.05)
+    assert(not server.sent)
+    queue.start()
+    wait_until(lambda: len(finished) == 5)
+    queue.close()
+    thread.join()
+
+    assert([g for (g, t) in server.sent] == list('abcde'))
+    assert(finished == [('a', gq.SUCCEEDED), ('b', gq.FAILED),
+                        ('c', gq.SUCCEEDED), ('d', gq.SUCCEEDED),
+                        ('e', gq.SUCCEEDED)])
+    # chosen ahead: c while a was running
+    assert(dict(selected)['c'] == 1)
+    gaps = [t1 - t0 for ((g0, t0), (g1, t1)) in zip(server.sent, server.sent[1:])]
+    # no waiting after success; a pause after the failure
+    assert(gaps[0] < 0.1 and gaps[2] < 0.1 and gaps[1] >= 0.2)
+    assert((queue.sent, queue.succeeded) == (5, 4))
+
+
+def test_halt_and_timeout():
+    (queue, server, selected, finished, thread) = run_queue(
+        {'a': None, 'b': None}, 'abcde', timeout_s=0.1, retry_s=0.05)
+    queue.start()
+    wait_until(lambda: len(finished) == 1)
+    # a ran too long, was cancelled, and counts as failed
+    assert(finished == [('a', gq.FAILED)])
+
+    wait_until(lambda: len(server.sent) == 2)
+    queue.halt()
+    wait_until(lambda: len(finished) == 2)
+    assert(finished[1] == ('b', gq.PREEMPTED))
+    time.sleep(0.1)
+    assert(len(server.sent) == 2 and not queue.queue)
+
+    queue.start()
+    wait_until(lambda: len(finished) == 3)
+    queue.close()
+    thread.join()
+    # c and d were chosen before the halt and forgotten
+    assert([g for (g, t) in server.sent] == ['a', 'b', 'e'])
+
+
+def test_halt_while_sending():
+    (queue, server, selected, finished, thread) = run_queue(
+        {'a': None}, 'ab', retry_s=0.05)
+    cancels = []
+
+    def send(goal):
+        # HALT arrives after a was chosen, before the server has it
+        queue.halt()
+        server.send(goal)
+
+    def cancel():
+        cancels.append(len(server.sent))
+        server.cancel()
+    (queue.send, queue.cancel) = (send, cancel)
+    queue.start()
+    wait_until(lambda: len(finished) == 1)
+    # cancelled once the server had it
+    assert(cancels == [1])
+    assert(finished == [('a', gq.PREEMPTED)])
+    time.sleep(0.1)
+    assert(len(server.sent) == 1)
+    queue.close()
+    thread.join()
+
+
+def test_on_done_raises():
+    (queue, server, selected, finished, thread) = run_queue({}, 'ab')
+
+    def on_done(goal, outcome):
+        finished.append((goal, outcome))
+        raise ValueError(goal)
+    queue.on_done = on_done
+
+    def done(goal, outcome):
+        try:
+            gq.GoalQueue.done(queue, goal, outcome)
+        except ValueError:
+            pass
+    queue.done = done
+    queue.start()
+    # b is still sent
+    wait_until(lambda: len(finished) == 2)
+    queue.close()
+    thread.join()
+
+
+def test_done_during_timeout_cancel():
+    # like actionlib: the done callback runs holding the client's lock,
+    # and cancelling needs it too
+    (queue, server, selected, finished, thread) = run_queue(
+        {}, 'ab', timeout_s=0.05, retry_s=0.05)
+    client_lock = threading.Lock()
+    cancelling = threading.Event()
+
+    def send(goal):
+        server.sent.append((goal, time.time()))
+
+        def finish():
+            # the goal ends just as it times out
+            with client_lock:
+                cancelling.wait()
+                time.sleep(0.05)
+                queue.done(goal, gq.SUCCEEDED)
+        thread = threading.Thread(target=finish)
+        thread.daemon = True
+        thread.start()
+
+    def cancel():
+        cancelling.set()
+        with client_lock:
+            pass
+    (queue.send, queue.cancel) = (send, cancel)
+    queue.start()
+    wait_until(lambda: len(finished) == 1, timeout=1.0)
+    assert(finished == [('a', gq.FAILED)])
+    queue.close()
+    thread.join(1.0)
+    assert(not thread.is_alive())
+
+
+def test_forgotten_goals_are_unselected():
+    (queue, server, selected, finished, thread) = run_queue(
+        {'a': None}, 'abcd', retry_s=0.05)
+    unselected = []
+    queue.unselect = unselected.extend
+    queue.start()
+    wait_until(lambda: len(queue.queue) == 2)
+    queue.halt()
+    wait_until(lambda: len(finished) == 1)
+    queue.close()
+    thread.join()
+    # chosen while a ran, and handed back in order
+    assert(unselected == ['b', 'c'])
+    assert(not queue.queue)
@@ -0,0 +1,88 @@
+"""Tests for the PathCostCache class.
+"""
+import numpy as np
+
+from breadcrumbs import BreadcrumbRecorder
+from path_costs import PathCostCache, TRIP_WEIGHT
+
+
+def test_record():
+    cache = PathCostCache()
+    cache.record('a', 'b', True, 10.0, 20.0, now=1.0)
+    cache.record('a', 'b', True, 12.0, 30.0, now=2.0)
+    cache.record('a', 'b', False, 99.0, 99.0, now=3.0)
+    cost = cache.get('a', 'b')
+    assert((cost.trips, cost.failures) == (3, 1))
+    assert(np.isclose(cost.distance, 11.0))
+    assert(np.isclose(cost.duration, 25.0))
+    assert(np.isclose(cost.failure_rate, 1.0 / 3.0))
+    assert(np.isclose(cost.expected_distance(), 16.5))
+    assert(cache.get('b', 'a') is None)
+
+    # later trips count for more than 1 / trips once there are many
+    for _ in range(50):
+        cache.record('a', 'b', True, 11.0, 25.0)
+    cache.record('a', 'b', True, 21.0, 25.0)
+    assert(np.isclose(cache.get('a', 'b').distance, 11.0 + 10.0 * TRIP_WEIGHT))
+
+
+def test_eviction():
+    cache = PathCostCache(capacity=3, max_age_s=100.0)
+    for (i, name) in enumerate('abcd'):
+        cache.record(name, 'z', True, 1.0, 1.0, now=10.0 * i)
+    # 'a' was used least recently
+    assert(len(cache) == 3 and cache.get('a', 'z') is None)
+
+    cache.get('b', 'z', now=30.0)
+    cache.record('e', 'z', True, 1.0, 1.0, now=40.0)
+    assert(cache.get('b', 'z') is not None and cache.get('c', 'z') is None)
+
+    # too old
+    cache.record('f', 'z', True, 1.0, 1.0, now=125.0)
+    assert(cache.get('b', 'z') is None and cache.get('e', 'z') is not None)
+
+    # learned with no map noted yet: kept
+    cache.set_map('first', now=200.0)
+    assert(len(cache) == 3)
+    cache.set_map('second', now=200.0)
+    assert(len(cache) == 0)
+
+
+def test_cost_matrix_and_save(tmpdir):
+    cache = PathCostCache()
+    cache.set_map('floor')
+    cache.record('a', 'b', True, 5.0, 10.0)
+    cache.record('b', 'c', True, 4.0, 10.0)
+    cache.record('c', 'b', True, 6.0, 10.0)
+    cache.record('a', 'c', False)
+    d = cache.cost_matrix(['a', 'b', 'c'], [(0, 0), (3, 0), (3, 2)])
+    expected = np.array([[0.0, 5.0, np.hypot(3, 2)],
+                         [5.0, 0.0, 5.0],
+                         [np.hypot(3, 2), 5.0, 0.0]])
+    assert(np.allclose(d, expected))
+
+    path = str(tmpdir.join('path_costs.yaml'))
+    cache.save(path)
+    loaded = PathCostCache()
+    loaded.load(path)
+    assert(loaded.map_id == 'floor')
+    assert(list(loaded.costs.keys()) == list(cache.costs.keys()))
+    assert(np.allclose(loaded.cost_matrix(['a', 'b', 'c'],
+                                          [(0, 0), (3, 0), (3, 2)]), d))
+
+
+def test_save_trip_from_breadcrumbs(tmpdir):
+    recorder = BreadcrumbRecorder()
+    start = recorder.mark()
+    for (i, (x, y)) in enumerate(((0.0, 0.0), (3.0, 4.0), (6.0, 8.0))):
+        recorder.append(x, y, 10.0 + i)
+    trip = recorder.trip(start)
+    cache = PathCostCache()
+    cache.record('a', 'b', True, trip.distance, trip.duration,
+                 now=np.float64(20.0))
+    path = str(tmpdir.join('path_costs.yaml'))
+    cache.save(path)
+    loaded = PathCostCache()
+    loaded.load(path)
+    cost = loaded.get('a', 'b')
+    assert(np.isclose(cost.distance, 10.0) and np.isclose(cost.duration, 2.0))
@@ -0,0 +1,46 @@
+"""Tests for the tour_planner module.
+"""
+import itertools
+
+import numpy as np
+
+import tour_planner as tp
+
+
+def brute_force(d):
+    n = len(d)
+    return min(tp.tour_length((0,) + p, d)
+               for p in itertools.permutations(range(1, n)))
+
+
+def test_small_tours_are_optimal():
+    rng = np.random.RandomState(0)
+    for n in range(1, 9):
+        d = tp.straight_line_costs(rng.uniform(0, 10, (n, 2)))
+        tour = tp.plan_tour(d, start=n - 1)
+        assert(sorted(tour) == list(range(n)))
+        assert(tour[0] == n - 1)
+        # 2-opt and Or-opt don't guarantee it, but at this size they find it
+        if n >= 2:
+            assert(np.isclose(tp.tour_length(tour, d), brute_force(d)))
+
+
+def test_points_on_a_circle():
+    angles = np.random.RandomState(1).permutation(100) * 2.0 * np.pi / 100
+    d = tp.straight_line_costs(np.array([np.cos(angles), np.sin(angles)]).T)
+    order = np.argsort(angles)
+    assert(np.isclose(tp.tour_length(tp.plan_tour(d), d),
+                      tp.tour_length(order, d)))
+
+
+def test_moves_never_lengthen():
+    rng = np.random.RandomState(2)
+    d = tp.straight_line_costs(rng.uniform(0, 100, (150, 2)))
+    tour = list(rng.permutation(150))
+    length = tp.tour_length(tour, d)
+    for improve in (tp.two_opt, tp.or_opt, tp.two_opt):
+        tour = improve(tour, d)
+        assert(sorted(tour) == list(range(150)))
+        assert(tp.tour_length(tour, d) <= length + 1e-9)
+        length = tp.tour_length(tour, d)
+    assert(length < tp.tour_length(tp.nearest_neighbour_tour(d), d))
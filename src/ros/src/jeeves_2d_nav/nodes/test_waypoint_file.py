@@ -0,0 +1,137 @@
+"""Tests for the WaypointFile class.
+"""
+import os
+import time
+
+import numpy as np
+import yaml
+
+from pose_provider import PoseCache, chain
+from waypoint_file import WaypointFile
+from waypoint_store import Waypoint, WaypointStore
+
+
+def make(name, x=0.0, y=0.0):
+    return Waypoint({'name': name, 'x': x, 'y': y})
+
+
+def names_in(path):
+    with open(path) as f:
+        return [wp['name'] for wp in yaml.safe_load(f)]
+
+
+def test_changes_are_batched(tmpdir):
+    path = str(tmpdir.join('waypoints.yaml'))
+    store = WaypointStore()
+    saver = WaypointFile(path, store, delay_s=0.2)
+    saver.start()
+    writes = []
+    compact = saver.compact
+    saver.compact = lambda: writes.append(compact())
+
+    for i in range(50):
+        store.add(make('wp%d' % i, i))
+    store.remove('wp0')
+    time.sleep(0.5)
+    assert(len(writes) == 1)
+    assert(names_in(path) == ['wp%d' % i for i in range(1, 50)])
+    assert(not os.path.exists(path + '.tmp'))
+
+    store.add(make('late'))
+    saver.close()
+    assert(names_in(path)[-1] == 'late')
+    assert(len(writes) == 2)
+
+
+def test_journal(tmpdir):
+    path = str(tmpdir.join('waypoints.yaml'))
+    with open(path, 'w') as f:
+        f.write(yaml.dump([make('a').as_dict(), make('b').as_dict()]))
+    store = WaypointStore()
+    saver = WaypointFile(path, store, delay_s=60.0, journal=True,
+                         compact_every=1000)
+    for wp in saver.load():
+        store.add(Waypoint(wp))
+    saver.start()
+
+    store.add(make('c', 1.0))
+    store.remove('a')
+    store.replace(make('b', 2.0))
+    store.add(make('a', 3.0))
+    saver.save()
+    # the file is untouched; the changes are in the journal
+    assert(names_in(path) == ['a', 'b'])
+    with open(path + '.journal') as f:
+        lines = f.readlines()
+    assert(len(lines) == 4)
+
+    # a crash part way through the next record
+    with open(path + '.journal', 'a') as f:
+        f.write(lines[0][:len(lines[0]) // 2])
+    reloaded = WaypointFile(path, WaypointStore(), journal=True)
+    waypoints = reloaded.load()
+    assert([(wp['name'], wp['x']) for wp in waypoints] ==
+           [('b', 2.0), ('c', 1.0), ('a', 3.0)])
+    assert(reloaded.journal_records == 4)
+
+    # replaying the journal again over the compacted file changes nothing
+    saver.close()
+    saver.compact()
+    with open(path + '.journal', 'w') as f:
+        f.writelines(lines)
+    assert(WaypointFile(path, WaypointStore()).load() == waypoints)
+
+
+def test_failed_save_is_reported(tmpdir):
+    path = str(tmpdir.join('waypoints.yaml'))
+    store = WaypointStore()
+    errors = []
+    saver = WaypointFile(path, store, delay_s=0.1, on_error=errors.append)
+    saver.start()
+    # safe_dump can't write numpy's floats
+    store.add(Waypoint({'name': 'bad', 'theta': np.float64(1.0)}))
+    time.sleep(0.3)
+    assert(errors and isinstance(errors[0], yaml.YAMLError))
+    assert(not os.path.exists(path))
+
+    # the thread carries on and saves once it can
+    store.replace(make('bad'))
+    store.add(make('good'))
+    saver.close()
+    assert(names_in(path) == ['bad', 'good'])
+
+
+def test_journal_without_file(tmpdir):
+    path = str(tmpdir.join('waypoints.yaml'))
+    store = WaypointStore()
+    saver = WaypointFile(path, store, delay_s=60.0, journal=True)
+    saver.start()
+    store.add(make('a'))
+    saver.save()
+    assert(not os.path.exists(path))
+    waypoints = WaypointFile(path, WaypointStore(), journal=True).load()
+    assert([wp['name'] for wp in waypoints] == ['a'])
+    saver.close()
+
+
+def test_current_pose_loads(tmpdir):
+    (map_odom, odom_base) = (PoseCache(), PoseCache())
+    map_odom.add(9.0, (2.0, 3.0, 0.5))
+    map_odom.add(11.0, (4.0, 3.0, 0.5))
+    odom_base.add(10.0, (1.0, 0.0, 0.25))
+    for journal in (False, True):
+        path = str(tmpdir.join('waypoints%d.yaml' % journal))
+        store = WaypointStore()
+        saver = WaypointFile(path, store, delay_s=0.0, journal=journal)
+        saver.start()
+        # as WaypointManager.handle_save_current_pose does
+        for (name, (stamp, (x, y, theta))) in (
+                ('chained', chain(map_odom, odom_base, 10.0, 0.5)),
+                ('latest', odom_base.latest()),
+                ('at', (10.0, map_odom.at(10.0)))):
+            store.add(Waypoint({'name': name, 'x': x, 'y': y,
+                                'theta': theta}))
+        saver.close()
+        loaded = WaypointFile(path, WaypointStore(), journal=journal).load()
+        assert([wp['name'] for wp in loaded] == ['chained', 'latest', 'at'])
+        assert(np.isclose(loaded[2]['x'], 3.0))
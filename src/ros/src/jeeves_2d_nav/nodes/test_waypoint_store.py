@@ -0,0 +1,154 @@
+"""Tests for the WaypointStore class.
+"""
+import math
+import random
+import threading
+
+from waypoint_store import ChangeLog, Waypoint, WaypointStore
+
+
+def make(name, x, y, enabled=True):
+    return Waypoint({'name': name, 'x': x, 'y': y, 'enabled': enabled})
+
+
+def test_add_remove():
+    store = WaypointStore()
+    assert(store.add(make('a', 0.0, 0.0)))
+    assert(store.add(make('b', 1.0, 0.0)))
+    assert(not store.add(make('a', 5.0, 5.0)))
+    assert(store.get('a').x == 0.0)
+    assert(store.names() == ['a', 'b'])
+    assert('b' in store and len(store) == 2)
+
+    assert(store.remove('a'))
+    assert(not store.remove('a'))
+    assert(store.get('a') is None)
+    assert(store.names() == ['b'])
+    assert(store.nearest(0.0, 0.0)[0][1].name == 'b')
+
+
+def test_snapshot():
+    store = WaypointStore()
+    store.add(make('a', 0.0, 0.0))
+    before = store.snapshot()
+    assert(store.snapshot() is before)
+
+    store.add(make('b', 1.0, 0.0))
+    store.replace(make('a', 2.0, 2.0))
+    after = store.snapshot()
+    assert(after.version == before.version + 2)
+    assert([wp.name for wp in before.waypoints] == ['a'])
+    assert(before.waypoints[0].x == 0.0)
+    assert([(wp.name, wp.x) for wp in after.waypoints] == [('a', 2.0), ('b', 1.0)])
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(0)
+    store = WaypointStore(cell_size=2.0)
+    waypoints = [make('wp%d' % i, rng.uniform(-50, 50), rng.uniform(-30, 30),
+                      enabled=(i % 4 != 0))
+                 for i in range(300)]
+    for wp in waypoints:
+        store.add(wp)
+
+    for _ in range(50):
+        (x, y) = (rng.uniform(-80, 80), rng.uniform(-60, 60))
+        for enabled_only in (False, True):
+            expected = sorted(
+                (math.hypot(wp.x - x, wp.y - y), wp.name) for wp in waypoints
+                if wp.enabled or not enabled_only)
+            found = store.nearest(x, y, 5, enabled_only)
+            assert([wp.name for (d, wp) in found] ==
+                   [name for (d, name) in expected[:5]])
+
+        found = store.within(x, y, 10.0)
+        expected = sorted((math.hypot(wp.x - x, wp.y - y), wp.name)
+                          for wp in waypoints)
+        assert([wp.name for (d, wp) in found] ==
+               [name for (d, name) in expected if d <= 10.0])
+
+
+def test_concurrent_mutations():
+    store = WaypointStore()
+
+    def churn(k):
+        for i in range(200):
+            name = 'wp%d_%d' % (k, i)
+            store.add(make(name, i, k))
+            if i % 2:
+                store.remove(name)
+            (version, waypoints) = store.snapshot()
+            assert(len(set(wp.name for wp in waypoints)) == len(waypoints))
+
+    threads = [threading.Thread(target=churn, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert(len(store) == 400)
+    assert(store.version == 4 * 300)
+    assert(sum(len(names) for names in store.cells.values()) == 400)
+
+
+def test_change_log():
+    store = WaypointStore(version=1000)
+    store.add(make('a', 0.0, 0.0))
+    store.add(make('b', 1.0, 0.0))
+    log = ChangeLog(store, limit=2)
+    start = store.version
+
+    delta = log.since(start)
+    assert(delta.unchanged and delta.version == start)
+    # from before the log, or from a version the store hasn't reached
+    for version in (0, start - 1, start + 1):
+        delta = log.since(version)
+        assert(delta.full and [wp.name for wp in delta.changed] == ['a', 'b'])
+
+    store.add(make('c', 2.0, 0.0))
+    store.replace(make('a', 5.0, 0.0))
+    store.remove('b')
+    delta = log.since(start)
+    assert(not delta.unchanged and not delta.full)
+    assert([(wp.name, wp.x) for wp in delta.changed] == [('a', 5.0), ('c', 2.0)])
+    assert(delta.removed == ('b',))
+    assert(log.since(delta.version).unchanged)
+
+    # re-added after removal: changed, not removed
+    store.add(make('b', 3.0, 0.0))
+    delta = log.since(start)
+    assert([wp.name for wp in delta.changed] == ['a', 'c', 'b'])
+    assert(delta.removed == ())
+
+    # clients from before the oldest removal remembered get everything
+    middle = store.version
+    for name in ('a', 'b', 'c'):
+        store.remove(name)
+    assert(log.since(middle).full)
+    assert(log.since(store.version - 2).removed == ('b', 'c'))
+
+
+def test_nearest_far_away():
+    store = WaypointStore(cell_size=1.0)
+    for i in range(10):
+        store.add(make('near%d' % i, i * 0.5, 0.0))
+    store.add(make('far', 1e6, 1e6))
+    walked = []
+    ring_cells = store.ring_cells
+    store.ring_cells = lambda cx, cy, ring: walked.append(ring) or \
+        ring_cells(cx, cy, ring)
+
+    # further from every waypoint than there are occupied cells: the ring
+    # walk is skipped
+    found = store.nearest(-1e9, 0.0, 2)
+    assert([wp.name for (d, wp) in found] == ['near0', 'near1'])
+    assert(walked == [])
+
+    found = store.nearest(1e6 + 3.5, 1e6, 1)
+    assert(found[0][1].name == 'far' and found[0][0] == 3.5)
+    assert(walked == [])
+
+    # otherwise the walk starts at the nearest occupied ring
+    store.remove('far')
+    found = store.nearest(-3.5, 0.0, 1)
+    assert(found[0][1].name == 'near0')
+    assert(walked == [4])
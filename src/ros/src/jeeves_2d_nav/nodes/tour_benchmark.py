@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+""" Plans tours of synthetic waypoint sets, without ROS, and reports the
+    tour lengths of random order, nearest neighbour and the full planner,
+    and how long planning took.
+
+    Waypoints are laid out as on a floor plan: clustered in rooms spread
+    over a square floor, so that a poor order crosses the floor often.
+
+    Usage: tour_benchmark.py [--points 200] [--rooms 12] [--size 100]
+               [--seeds 5]
+"""
+import sys
+import time
+
+import numpy as np
+
+import tour_planner as tp
+
+
+def synthetic_waypoints(points, rooms, size, seed=0):
+    """(points, 2) x, y in rooms of about a tenth of the floor's width."""
+    rng = np.random.RandomState(seed)
+    centres = rng.uniform(0.0, size, (rooms, 2))
+    room = rng.randint(0, rooms, points)
+    return centres[room] + rng.uniform(-0.05 * size, 0.05 * size, (points, 2))
+
+
+def main(args):
+    args = list(args[1:])
+    options = {'--points': '200', '--rooms': '12', '--size': '100',
+               '--seeds': '5'}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    if args:
+        print(__doc__)
+        return 1
+    (points, rooms, seeds) = [int(options[o]) for o in
+                              ('--points', '--rooms', '--seeds')]
+    size = float(options['--size'])
+
+    print('%d waypoints in %d rooms on a %.0f m floor' % (points, rooms, size))
+    print('%-6s %10s %10s %10s %8s %10s' % (
+        'seed', 'random', 'nearest', 'planned', 'saved', 'time (s)'))
+    for seed in range(seeds):
+        d = tp.straight_line_costs(
+            synthetic_waypoints(points, rooms, size, seed))
+        random_order = np.random.RandomState(seed).permutation(points)
+        nearest = tp.nearest_neighbour_tour(d)
+        start = time.time()
+        tour = tp.plan_tour(d)
+        elapsed = time.time() - start
+        lengths = [tp.tour_length(t, d) for t in (random_order, nearest, tour)]
+        print('%-6d %10.1f %10.1f %10.1f %7.1f%% %10.3f' % tuple(
+            [seed] + lengths + [100.0 * (1.0 - lengths[2] / lengths[1]),
+                                elapsed]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
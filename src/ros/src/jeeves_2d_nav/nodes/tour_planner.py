@@ -0,0 +1,131 @@
+"""
+.. module:: tour_planner
+   :synopsis: Orders waypoints into a short closed tour that visits each
+   once: nearest neighbour to start with, then improved with 2-opt and
+   Or-opt moves until neither finds anything shorter.
+
+Costs come as a matrix, d[i, j] being the cost of going from waypoint i
+to waypoint j, the same both ways; straight_line_costs() gives the
+simplest one. Kept free of ROS.
+"""
+import numpy as np
+
+# improvements smaller than this are ignored, so rounding can't cycle
+EPSILON = 1e-9
+# longest run of consecutive waypoints Or-opt moves at once
+OR_OPT_SEGMENT = 3
+
+
+def straight_line_costs(points):
+    """Matrix of distances between points, (N, 2) x, y."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    delta = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    return np.sqrt((delta**2).sum(axis=2))
+
+
+def tour_length(tour, d):
+    """Cost of the closed tour, a sequence of indices into d."""
+    tour = np.asarray(tour)
+    if len(tour) < 2:
+        return 0.0
+    return d[tour, np.roll(tour, -1)].sum()
+
+
+def nearest_neighbour_tour(d, start=0):
+    """From start, always go to the nearest waypoint not yet visited."""
+    n = len(d)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        costs = np.where(visited, np.inf, d[tour[-1]])
+        tour.append(int(np.argmin(costs)))
+        visited[tour[-1]] = True
+    return tour
+
+
+def two_opt(tour, d):
+    """
+        Improve a closed tour by reversing stretches of it: replace edges
+        (a, b) and (c, e) with (a, c) and (b, e) wherever that is shorter.
+        For each a, every c is tried at once and the best is taken; passes
+        repeat until nothing improves. Returns the new tour.
+    """
+    tour = np.array(tour)
+    n = len(tour)
+    if n < 4:
+        return list(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            (a, b) = (tour[i], tour[i + 1])
+            # j from i + 2; with i == 0, j == n - 1 would share a
+            last = n - 1 if i == 0 else n
+            c = tour[i + 2:last]
+            e = tour[(np.arange(i + 2, last) + 1) % n]
+            gain = d[a, b] + d[c, e] - d[a, c] - d[b, e]
+            if not len(gain):
+                continue
+            k = np.argmax(gain)
+            if gain[k] > EPSILON:
+                j = i + 2 + k
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+    return list(tour)
+
+
+def or_opt(tour, d, segment=OR_OPT_SEGMENT):
+    """
+        Improve a closed tour by moving runs of up to segment consecutive
+        waypoints, either way round, to wherever else in the tour they
+        cost least. Passes repeat until nothing improves. Returns the new
+        tour.
+    """
+    tour = list(tour)
+    n = len(tour)
+    if n < 4:
+        return tour
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, min(segment, n - 2) + 1):
+            i = 0
+            while i < n:
+                rotated = tour[i:] + tour[:i]
+                (seg, rest) = (rotated[:length], np.array(rotated[length:]))
+                (first, last) = (seg[0], seg[-1])
+                # rest runs from the waypoint after seg round to the one
+                # before it; taking seg out joins those two
+                removed = (d[rest[-1], first] + d[last, rest[0]]
+                           - d[rest[-1], rest[0]])
+                (u, v) = (rest[:-1], rest[1:])
+                forward = d[u, first] + d[last, v] - d[u, v]
+                backward = d[u, last] + d[first, v] - d[u, v]
+                cost = np.minimum(forward, backward)
+                k = np.argmin(cost)
+                if removed - cost[k] > EPSILON:
+                    if backward[k] < forward[k]:
+                        seg = seg[::-1]
+                    tour = list(rest[:k + 1]) + seg + list(rest[k + 1:])
+                    improved = True
+                i += 1
+    return [int(w) for w in tour]
+
+
+def plan_tour(d, start=0):
+    """
+        A short closed tour of every waypoint of the cost matrix d,
+        beginning at start: nearest neighbour, then 2-opt and Or-opt in
+        turn until neither improves it.
+    """
+    tour = nearest_neighbour_tour(d, start)
+    length = tour_length(tour, d)
+    while True:
+        tour = or_opt(two_opt(tour, d), d)
+        improved = tour_length(tour, d)
+        if improved > length - EPSILON:
+            break
+        length = improved
+    i = tour.index(start)
+    return tour[i:] + tour[:i]
@@ -0,0 +1,203 @@
+"""
+.. module:: waypoint_file
+   :synopsis: Keeps a waypoint file up to date with a WaypointStore, off
+   the threads that change the store.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+import yaml
+
+DEFAULT_SAVE_DELAY_s = 1.0
+# journal records to collect before compacting them into the waypoint file
+DEFAULT_COMPACT_EVERY = 100
+JOURNAL_SUFFIX = '.journal'
+# wide enough to keep each journal record on one line
+JOURNAL_WIDTH = 1 << 20
+
+
+def write_atomically(path, s):
+    """Replace the file at path with s, so that a crash leaves either the
+    old or the new contents there, never part of either."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(s)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+
+
+class WaypointFile(object):
+    """Saves the waypoints of a store to a YAML file (see waypoints.yaml)
+    from a thread of its own.
+
+    Changes are collected for delay_s after the first, then saved
+    together: by rewriting the file, written to a temporary file and
+    renamed over it; or, with journal, by appending them to path +
+    '.journal', a line of YAML each, which are compacted into the file once
+    compact_every have built up.
+
+    load() reads the file back, replaying any journal over it.
+
+    A save that fails is reported to on_error, with the exception, and
+    tried again delay_s later.
+    """
+    def __init__(self, path, store, delay_s=DEFAULT_SAVE_DELAY_s,
+                 journal=False, compact_every=DEFAULT_COMPACT_EVERY,
+                 on_error=None):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.store = store
+        self.delay_s = delay_s
+        self.journal = journal
+        self.compact_every = compact_every
+        self.on_error = on_error
+        # records of changes not yet saved, and whether any are
+        self.pending = []
+        self.dirty = False
+        self.journal_records = 0
+        # version of the store last written to the file
+        self.saved_version = None
+        self.condition = threading.Condition()
+        self.closing = threading.Event()
+        self.save_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def load(self):
+        """The waypoints saved, as a list of dicts in order: the file's,
+        with any changes in the journal since it was last compacted.
+        Raises IOError if there is neither."""
+        if os.path.exists(self.path) or \
+           not os.path.exists(self.journal_path):
+            with open(self.path) as f:
+                waypoints = yaml.safe_load(f) or []
+        else:
+            # journaled from an empty store, and never compacted
+            waypoints = []
+        if not os.path.exists(self.journal_path):
+            return waypoints
+        by_name = OrderedDict((wp['name'], wp) for wp in waypoints)
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    record = yaml.safe_load(line)
+                except yaml.YAMLError:
+                    record = None
+                if not isinstance(record, dict):
+                    # a record cut short by a crash: the last one
+                    break
+                replay(by_name, record)
+                self.journal_records += 1
+        return list(by_name.values())
+
+    def start(self):
+        """Save every change to the store from now on. Compacts a journal
+        left over from before."""
+        self.store.listeners.append(self.changed)
+        if self.journal_records:
+            with self.condition:
+                self.dirty = True
+                self.condition.notify()
+        self.thread.start()
+
+    def changed(self, version, op, wp):
+        """Store listener: queue a change to be saved."""
+        with self.condition:
+            if self.journal:
+                if 'remove' == op:
+                    self.pending.append({'version': version, 'remove': wp.name})
+                else:
+                    self.pending.append({'version': version, op: wp.as_dict()})
+            self.dirty = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.dirty and not self.closing.is_set():
+                    self.condition.wait()
+            if self.closing.is_set():
+                return
+            # let more changes collect
+            self.closing.wait(self.delay_s)
+            try:
+                self.save()
+            except Exception as e:
+                # whatever went wrong, keep the thread alive to save later
+                # changes
+                if self.on_error is not None:
+                    self.on_error(e)
+
+    def save(self):
+        """Save any changes now."""
+        with self.save_lock:
+            with self.condition:
+                if not self.dirty:
+                    return
+                (records, self.pending) = (self.pending, [])
+                self.dirty = False
+            try:
+                self.write(records)
+            except Exception:
+                # keep them for the next try
+                with self.condition:
+                    self.pending[:0] = records
+                    self.dirty = True
+                raise
+
+    def write(self, records):
+        if not self.journal:
+            self.compact()
+            return
+        # anything already in the file needn't be journaled
+        records = [r for r in records
+                   if self.saved_version is None or
+                   r['version'] > self.saved_version]
+        if records:
+            with open(self.journal_path, 'a') as f:
+                f.write(''.join(yaml.safe_dump(r, default_flow_style=True,
+                                               width=JOURNAL_WIDTH)
+                                for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_records += len(records)
+        if self.journal_records >= self.compact_every or \
+           (self.journal_records and not records):
+            self.compact()
+
+    def compact(self):
+        """Write the store to the file and empty the journal."""
+        (version, waypoints) = self.store.snapshot()
+        write_atomically(self.path, yaml.safe_dump(
+            [wp.as_dict() for wp in waypoints], default_flow_style=False))
+        self.saved_version = version
+        if self.journal_records or os.path.exists(self.journal_path):
+            # every journaled change is in the file now
+            write_atomically(self.journal_path, '')
+            self.journal_records = 0
+
+    def close(self):
+        """Stop the thread and save whatever hasn't been."""
+        self.closing.set()
+        with self.condition:
+            self.condition.notify()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.save()
+
+
+def replay(by_name, record):
+    """Apply a journal record to an OrderedDict of waypoint dicts by name.
+    Replaying records already applied leaves the same waypoints."""
+    if 'add' in record:
+        wp = record['add']
+        if wp['name'] not in by_name:
+            by_name[wp['name']] = wp
+    elif 'replace' in record:
+        wp = record['replace']
+        if wp['name'] in by_name:
+            by_name[wp['name']] = wp
+    elif 'remove' in record:
+        by_name.pop(record['remove'], None)
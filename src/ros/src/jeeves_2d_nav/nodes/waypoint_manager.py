@@ -2,18 +2,21 @@
 import json
 import pdb
 import threading
+import time
 import yaml
 
 import actionlib
 from geometry_msgs.msg import Pose, PoseWithCovarianceStamped, Point, Quaternion, Twist
 from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
+from std_msgs.msg import String
 import numpy as np
 import rospy
-import tf
 from tf import transformations
-from tf import TransformListener
 
 from jeeves_2d_nav.srv import *
+from pose_provider.provider import PoseProvider
+from waypoint_file import DEFAULT_SAVE_DELAY_s, WaypointFile
+from waypoint_store import ChangeLog, Waypoint, WaypointStore
 
 DEFAULT_WAYPOINT_FILENAME = 'waypoints.yaml'
 RESULT_OK = 0
@@ -22,44 +25,40 @@ RESULT_DNE = -2
 RESULT_POSE_NOT_AVAILABLE = -3
 
 
-class Waypoint(object):
-    def __init__(self, wp_dict):
-        """Construct from a dictionary."""
-        # first, sane defaults
-        self.name = 'default'
-        self.x = 0.0
-        self.y = 0.0
-        self.theta = 0.0
-        self.enabled = True
-        
-        # load in anything from the incoming dict that
-        # matches one of our attributes
-        for attr in self.__dict__.keys():
-            if attr in wp_dict.keys():
-                self.__dict__[attr] = wp_dict[attr]
-
-    def __getitem__(self, key):
-        return self.__dict__[key]
-    
-    def as_dict(self):
-        d = {}
-        for attr in self.__dict__.keys():
-            d[attr] = self.__dict__[attr]
-        return d
-
-    
 class WaypointManager(threading.Thread):
-    def __init__(self, waypoint_file, base_frame):
+    def __init__(self, waypoint_file, base_frame, journal=False,
+                 save_delay=DEFAULT_SAVE_DELAY_s):
         self.sleeper = rospy.Rate(1)
         self.sleeper.sleep()
-        self.tl = TransformListener()
         self.base_frame = base_frame
+        self.poses = PoseProvider(base_frame=base_frame)
         self.waypoint_file = waypoint_file
-        self.waypoints = []
+        # versions count up from the time started, so that clients can
+        # tell versions from before a restart from current ones
+        self.waypoints = WaypointStore(version=int(time.time()))
+        self.store_file = WaypointFile(waypoint_file, self.waypoints,
+                                       delay_s=save_delay, journal=journal,
+                                       on_error=self.log_save_error)
         self.load_waypoints_from_file(waypoint_file)
+        # from here on, changes are saved in the background
+        self.store_file.start()
+        self.changes = ChangeLog(self.waypoints)
+        self.yaml_cache = (None, None)
+        self.published_version = None
+        self.waypoints_pub = rospy.Publisher('/waypoint_manager/waypoints',
+                                             String,
+                                             latch=True,
+                                             queue_size=1)
+        self.publish_waypoints()
         rospy.Service('/waypoint_manager/get_waypoints',
                       GetWaypoints,
                       self.handle_get_waypoints)
+        rospy.Service('/waypoint_manager/get_waypoint_changes',
+                      GetWaypointChanges,
+                      self.handle_get_waypoint_changes)
+        rospy.Service('/waypoint_manager/get_nearest_waypoints',
+                      GetNearestWaypoints,
+                      self.handle_get_nearest_waypoints)
         rospy.Service('/waypoint_manager/add_waypoint',
                       AddWaypoint,
                       self.handle_add_waypoint)
@@ -82,8 +81,7 @@ class WaypointManager(threading.Thread):
         """ See waypoints.yaml for examples of the waypoint format."""
         rospy.loginfo("Loading waypoints from " + f)
         try:
-            wp = yaml.load(file(f))
-            for p in wp:
+            for p in self.store_file.load():
                 self.add_waypoint(p)
         except IOError:
             msg = "IOError: could not open waypoint file " + f + "...skipping."
@@ -96,8 +94,8 @@ class WaypointManager(threading.Thread):
             return
 
         msg = "waypoints: "
-        for wp in self.waypoints:
-            msg += wp['name'] + ', '
+        for name in self.waypoints.names():
+            msg += name + ', '
         rospy.loginfo(msg)
 
     def run(self):
@@ -107,28 +105,63 @@ class WaypointManager(threading.Thread):
                 self.sleeper.sleep()
             except Exception:
                 pass
-        self.save_waypoints()
+            self.publish_waypoints()
+        self.store_file.close()
 
     def add_waypoint(self, wp):
-        names = [p['name'] for p in self.waypoints]
-        if wp['name'] not in names:
+        if self.waypoints.add(Waypoint(wp)):
             rospy.logdebug("Adding new waypoint name: " + wp['name'])
-            self.waypoints.append(Waypoint(wp))
-            self.save_waypoints()
             return RESULT_OK
         else:
             rospy.logwarn("Ignoring duplicate waypoint name: " + wp['name'])
             return RESULT_DUPLICATE_WAYPOINT
 
-    def save_waypoints(self):
-        s = yaml.dump([wp.as_dict() for wp in self.waypoints], default_flow_style=False)    
-        with open(self.waypoint_file, 'w') as f:
-            f.write(s)
+    def log_save_error(self, e):
+        rospy.logerr("Could not save waypoints to " + self.waypoint_file +
+                     ": " + str(e))
+
+    def waypoints_yaml(self):
+        """The current version and the waypoints as a YAML list, dumped
+        once per version."""
+        (version, s) = self.yaml_cache
+        (current, waypoints) = self.waypoints.snapshot()
+        if version != current:
+            s = yaml.dump([wp.as_dict() for wp in waypoints],
+                          default_flow_style=False)
+            self.yaml_cache = (current, s)
+        return (current, s)
+
+    def publish_waypoints(self):
+        """Publish the waypoints on the latched topic if they have changed
+        since last published."""
+        (version, s) = self.waypoints_yaml()
+        if version != self.published_version:
+            self.waypoints_pub.publish(s)
+            self.published_version = version
 
     def handle_get_waypoints(self, req):
         rospy.logdebug("waypoint_manager.handle_get_waypoints()")
+        return self.waypoints_yaml()[1]
+
+    def handle_get_waypoint_changes(self, req):
+        rospy.logdebug("waypoint_manager.handle_get_waypoint_changes()")
+        delta = self.changes.since(req.since_version)
+        if delta.full:
+            (version, s) = self.waypoints_yaml()
+            return GetWaypointChangesResponse(version, False, True, s, [])
+        s = ''
+        if delta.changed:
+            s = yaml.dump([wp.as_dict() for wp in delta.changed],
+                          default_flow_style=False)
+        return GetWaypointChangesResponse(delta.version, delta.unchanged,
+                                          False, s, list(delta.removed))
+
+    def handle_get_nearest_waypoints(self, req):
+        rospy.logdebug("waypoint_manager.handle_get_nearest_waypoints()")
+        nearest = self.waypoints.nearest(req.x, req.y, max(req.count, 1),
+                                         enabled_only=True)
         return yaml.dump(
-            [wp.as_dict() for wp in self.waypoints],
+            [wp.as_dict() for (d, wp) in nearest],
             default_flow_style=False)
 
     def handle_add_waypoint(self, req):
@@ -139,30 +172,22 @@ class WaypointManager(threading.Thread):
         return self.add_waypoint(wp)
 
     def handle_delete_waypoint(self, req):
-        try:
-            found = next(x for x in self.waypoints if x['name'] == req.name)
-            self.waypoints.remove(found)
-            self.save_waypoints()
+        if self.waypoints.remove(req.name):
             return RESULT_OK
-        except StopIteration:
-            return RESULT_DNE
+        return RESULT_DNE
 
     def handle_save_current_pose(self, req):
-        if self.tl.frameExists(self.base_frame) and self.tl.frameExists("map"):
-            t = self.tl.getLatestCommonTime("map", self.base_frame)
-            p, q = self.tl.lookupTransform("map", self.base_frame, t)
-            theta = tf.transformations.euler_from_quaternion(q)[2]
-            wp = {'name': req.name, 'x': p[0], 'y': p[1], 'theta': theta}
-            return self.add_waypoint(wp)
-        else:
+        pose = self.poses.map_pose()
+        if pose is None:
             return RESULT_POSE_NOT_AVAILABLE
+        (x, y, theta) = pose[1]
+        wp = {'name': req.name, 'x': x, 'y': y, 'theta': theta}
+        return self.add_waypoint(wp)
 
     def handle_set_current_pose_to_waypoint(self, req):
         """Set initialpose to pose described by req.name"""
-        wp = None
-        try:
-            wp = next(wp for wp in self.waypoints if wp['name'] == req.name)
-        except StopIteration:
+        wp = self.waypoints.get(req.name)
+        if wp is None:
             msg = "KeyError: waypoint '" + req.name + "' not found."
             rospy.logerr(msg)
             return RESULT_DNE
@@ -190,6 +215,8 @@ if __name__ == '__main__':
     rospy.init_node('waypoint_manager_node')
     mgr = WaypointManager(
         rospy.get_param('/waypoint_manager/waypoint_file', 'waypoints.yaml'),
-        rospy.get_param('base_frame', 'base_footprint'))
+        rospy.get_param('base_frame', 'base_footprint'),
+        rospy.get_param('/waypoint_manager/journal', False),
+        rospy.get_param('/waypoint_manager/save_delay', DEFAULT_SAVE_DELAY_s))
     mgr.start()
     rospy.spin()
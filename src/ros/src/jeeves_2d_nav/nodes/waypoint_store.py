@@ -0,0 +1,270 @@
+"""
+.. module:: waypoint_store
+   :synopsis: Waypoints indexed by name and by position, safe to share
+   between the threads of ROS service handlers.
+"""
+from collections import OrderedDict, namedtuple
+from itertools import groupby
+import math
+import threading
+
+DEFAULT_CELL_SIZE_m = 5.0
+
+# removals to remember for deltas; clients further behind get everything
+DEFAULT_CHANGE_LOG_LIMIT = 1000
+
+Snapshot = namedtuple('Snapshot', ['version', 'waypoints'])
+# what changed since a client's version: unchanged; or full, with every
+# waypoint in changed; or the waypoints added or replaced since, and the
+# names removed since
+Delta = namedtuple('Delta', ['version', 'unchanged', 'full', 'changed',
+                             'removed'])
+
+
+class Waypoint(object):
+    def __init__(self, wp_dict):
+        """Construct from a dictionary."""
+        # first, sane defaults
+        self.name = 'default'
+        self.x = 0.0
+        self.y = 0.0
+        self.theta = 0.0
+        self.enabled = True
+
+        # load in anything from the incoming dict that
+        # matches one of our attributes
+        for attr in self.__dict__.keys():
+            if attr in wp_dict.keys():
+                self.__dict__[attr] = wp_dict[attr]
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def as_dict(self):
+        d = {}
+        for attr in self.__dict__.keys():
+            d[attr] = self.__dict__[attr]
+        return d
+
+
+class WaypointStore(object):
+    """Waypoints in the order they were added, indexed by name and by a
+    grid of square cells for nearest-neighbour queries.
+
+    Every mutation takes the store's lock and bumps its version. Readers
+    take a snapshot: the version and a tuple of the waypoints as of that
+    version, which stays consistent however the store changes afterwards.
+    Waypoints are never changed in place once added, only replaced, so a
+    snapshot's waypoints must be treated as read-only.
+
+    Each function in listeners is called after every mutation, still
+    holding the lock, as listener(version, op, waypoint), op being 'add',
+    'remove' or 'replace'; so listeners see the changes in version order
+    and must be quick.
+    """
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE_m, version=0):
+        """
+        :param cell_size: side of a cell of the spatial index, m; about the
+            typical distance between waypoints works best.
+        :param version: version to count up from.
+        """
+        self.cell_size = float(cell_size)
+        self.lock = threading.RLock()
+        self.waypoints = OrderedDict()
+        self.cells = {}
+        self.version = version
+        self.listeners = []
+        self._snapshot = Snapshot(version, ())
+
+    def __len__(self):
+        return len(self.waypoints)
+
+    def __contains__(self, name):
+        return name in self.waypoints
+
+    def names(self):
+        """Names of the waypoints, in order."""
+        with self.lock:
+            return list(self.waypoints.keys())
+
+    def get(self, name):
+        """The waypoint called name, or None."""
+        with self.lock:
+            return self.waypoints.get(name)
+
+    def snapshot(self):
+        """The current version and waypoints, as a Snapshot."""
+        with self.lock:
+            if self._snapshot.version != self.version:
+                self._snapshot = Snapshot(self.version,
+                                          tuple(self.waypoints.values()))
+            return self._snapshot
+
+    def add(self, wp):
+        """Add a Waypoint. Returns False, changing nothing, if there is
+        already one by its name."""
+        with self.lock:
+            if wp.name in self.waypoints:
+                return False
+            self.waypoints[wp.name] = wp
+            self.cells.setdefault(self.cell_of(wp.x, wp.y), set()).add(wp.name)
+            self.changed('add', wp)
+            return True
+
+    def remove(self, name):
+        """Remove the waypoint called name. Returns False if there was
+        none."""
+        with self.lock:
+            wp = self.waypoints.pop(name, None)
+            if wp is None:
+                return False
+            cell = self.cell_of(wp.x, wp.y)
+            self.cells[cell].discard(name)
+            if not self.cells[cell]:
+                del self.cells[cell]
+            self.changed('remove', wp)
+            return True
+
+    def replace(self, wp):
+        """Put wp in place of the waypoint of the same name, keeping its
+        position in the order. Returns False if there was none."""
+        with self.lock:
+            old = self.waypoints.get(wp.name)
+            if old is None:
+                return False
+            old_cell = self.cell_of(old.x, old.y)
+            self.cells[old_cell].discard(wp.name)
+            if not self.cells[old_cell]:
+                del self.cells[old_cell]
+            self.waypoints[wp.name] = wp
+            self.cells.setdefault(self.cell_of(wp.x, wp.y), set()).add(wp.name)
+            self.changed('replace', wp)
+            return True
+
+    def changed(self, op, wp):
+        self.version += 1
+        for listener in self.listeners:
+            listener(self.version, op, wp)
+
+    def cell_of(self, x, y):
+        return (int(math.floor(x / self.cell_size)),
+                int(math.floor(y / self.cell_size)))
+
+    def nearest(self, x, y, count=1, enabled_only=False):
+        """The count waypoints nearest to (x, y), nearest first, as a list
+        of (distance, waypoint).
+
+        Searches rings of cells outward, from the nearest one that holds a
+        waypoint, stopping once no unsearched cell can hold anything nearer.
+        When there are fewer occupied cells than rings between the nearest
+        and the farthest, as for a query far from every waypoint, the
+        occupied cells are visited directly instead, nearest ring first.
+        """
+        with self.lock:
+            if not self.cells:
+                return []
+            (cx, cy) = self.cell_of(x, y)
+            rings = dict((cell, max(abs(cell[0] - cx), abs(cell[1] - cy)))
+                         for cell in self.cells)
+            first_ring = min(rings.values())
+            last_ring = max(rings.values())
+            if len(rings) < last_ring - first_ring + 1:
+                by_ring = groupby(sorted(rings, key=rings.get), key=rings.get)
+            else:
+                by_ring = ((ring, self.ring_cells(cx, cy, ring))
+                           for ring in range(first_ring, last_ring + 1))
+            found = []
+            for (ring, cells) in by_ring:
+                for cell in cells:
+                    for name in self.cells.get(cell, ()):
+                        wp = self.waypoints[name]
+                        if enabled_only and not wp.enabled:
+                            continue
+                        found.append((math.hypot(wp.x - x, wp.y - y), wp))
+                found.sort(key=lambda f: f[0])
+                # anything beyond this ring is at least this far away
+                if len(found) >= count and \
+                   found[count - 1][0] <= ring * self.cell_size:
+                    break
+            return found[:count]
+
+    def ring_cells(self, cx, cy, ring):
+        """The cells at Chebyshev distance ring from (cx, cy)."""
+        if 0 == ring:
+            return [(cx, cy)]
+        if len(self.cells) < 8 * ring:
+            # cheaper to look at the occupied cells than to walk the ring
+            return [(i, j) for (i, j) in self.cells
+                    if max(abs(i - cx), abs(j - cy)) == ring]
+        cells = []
+        for k in range(-ring, ring + 1):
+            cells.extend([(cx + k, cy - ring), (cx + k, cy + ring)])
+        for k in range(-ring + 1, ring):
+            cells.extend([(cx - ring, cy + k), (cx + ring, cy + k)])
+        return cells
+
+    def within(self, x, y, radius):
+        """All waypoints within radius of (x, y), as (distance, waypoint),
+        nearest first."""
+        with self.lock:
+            (x0, y0) = self.cell_of(x - radius, y - radius)
+            (x1, y1) = self.cell_of(x + radius, y + radius)
+            found = []
+            for (i, j) in self.cells.keys():
+                if x0 <= i <= x1 and y0 <= j <= y1:
+                    for name in self.cells[(i, j)]:
+                        wp = self.waypoints[name]
+                        d = math.hypot(wp.x - x, wp.y - y)
+                        if d <= radius:
+                            found.append((d, wp))
+            found.sort(key=lambda f: f[0])
+            return found
+
+
+class ChangeLog(object):
+    """Remembers which version of a WaypointStore last changed each
+    waypoint, from when it is created, to tell clients what has changed
+    since the version they last saw.
+
+    Only the last limit removals are kept; a client from before the
+    oldest of those, or from before the log was started, is sent every
+    waypoint. So is one from a version the store hasn't reached, as after
+    a restart: start the store's version from something that grows across
+    restarts, such as the time, to tell them apart from current clients.
+    """
+    def __init__(self, store, limit=DEFAULT_CHANGE_LOG_LIMIT):
+        self.store = store
+        self.limit = limit
+        # version at which each waypoint was added or last replaced
+        self.changed_at = {}
+        # version at which each waypoint was removed, oldest first
+        self.removed_at = OrderedDict()
+        with store.lock:
+            self.oldest = store.version
+            store.listeners.append(self.changed)
+
+    def changed(self, version, op, wp):
+        """Store listener."""
+        self.removed_at.pop(wp.name, None)
+        if 'remove' == op:
+            self.changed_at.pop(wp.name, None)
+            self.removed_at[wp.name] = version
+            if len(self.removed_at) > self.limit:
+                (name, removed) = self.removed_at.popitem(last=False)
+                self.oldest = removed
+        else:
+            self.changed_at[wp.name] = version
+
+    def since(self, version):
+        """A Delta from version to the store's current one."""
+        with self.store.lock:
+            (current, waypoints) = self.store.snapshot()
+            if version == current:
+                return Delta(current, True, False, (), ())
+            if version < self.oldest or version > current:
+                return Delta(current, False, True, waypoints, ())
+            changed = tuple(wp for wp in waypoints
+                            if self.changed_at.get(wp.name, 0) > version)
+            removed = tuple(name for (name, v) in self.removed_at.items()
+                            if v > version)
+            return Delta(current, False, False, changed, removed)
@@ -0,0 +1,9 @@
+#!/bin/bash
+
+if [ $# -lt 2 ]
+then
+    echo "Usage: get_nearest_waypoints.sh x y [count]"
+    exit
+fi
+
+rosservice call /waypoint_manager/get_nearest_waypoints -- $1 $2 ${3:-1}
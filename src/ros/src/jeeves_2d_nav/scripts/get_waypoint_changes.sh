@@ -0,0 +1,9 @@
+#!/bin/bash
+
+if [ $# -ne 1 ]
+then
+    echo "Usage: get_waypoint_changes.sh since_version"
+    exit
+fi
+
+rosservice call /waypoint_manager/get_waypoint_changes $1
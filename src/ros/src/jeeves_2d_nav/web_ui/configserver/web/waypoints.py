@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import pdb
 import sys
 import yaml
@@ -21,6 +22,13 @@ class WaypointServer:
         self.prxy_get_waypoints = rospy.ServiceProxy(
             'waypoint_manager/get_waypoints',
             jeeves_2d_nav.srv.GetWaypoints)
+        self.prxy_get_waypoint_changes = rospy.ServiceProxy(
+            'waypoint_manager/get_waypoint_changes',
+            jeeves_2d_nav.srv.GetWaypointChanges)
+        # the waypoints as of waypoints_version, kept up to date from the
+        # changes since
+        self.waypoints = OrderedDict()
+        self.waypoints_version = 0
         self.prxy_save_current_pose = rospy.ServiceProxy(
             'waypoint_manager/save_current_pose',
             jeeves_2d_nav.srv.SaveCurrentPose)
@@ -96,7 +104,19 @@ class WaypointServer:
         raise cherrypy.HTTPRedirect("/waypoints")
 
     def get_waypoints(self):
-        return yaml.load(self.prxy_get_waypoints().waypoints)
+        changes = self.prxy_get_waypoint_changes(self.waypoints_version)
+        if not changes.unchanged:
+            # built aside, as other requests may be reading the old ones
+            waypoints = OrderedDict()
+            if not changes.full:
+                waypoints.update(self.waypoints)
+            for name in changes.removed:
+                waypoints.pop(name, None)
+            for wp in yaml.load(changes.waypoints) or []:
+                waypoints[wp['name']] = wp
+            (self.waypoints, self.waypoints_version) = (waypoints,
+                                                        changes.version)
+        return self.waypoints.values()
     
 
         
\ No newline at end of file
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+""" Replays a scan and IMU trace through the obstacle avoider's decisions,
+    without ROS, and reports decisions per second, p50/p99 decision time
+    and how the twists differ between configurations, or from a run saved
+    earlier, e.g. before a change to the rules.
+
+    Without a trace file, a synthetic drive is generated: down a corridor
+    with posts in it, swaying, with a 640-ray Kinect-like scanner at 10 Hz
+    that reports NaN for anything out of range and some dropouts.
+
+    A trace file is a .npz with 'stamps' (N,) in s, 'ranges' (N, R) in m,
+    the scalars 'angle_min', 'angle_increment', 'range_min' and
+    'range_max' as in LaserScan, 'yaw' (N,) from the IMU in rad, and
+    optionally 'poses' (N, 3) of x, y, theta for the local grid.
+
+    Configurations: rules (the fuzzy rule engine), table (its lookup
+    table), grid (the rules on a local grid), dwa (the dynamic window
+    planner). The first one given is the reference for the diffs.
+
+    Usage: avoider_benchmark.py [trace.npz] [--save trace.npz]
+               [--configs rules,table,grid,dwa] [--output twists.npz]
+               [--compare twists.npz]
+"""
+import sys
+import time
+
+import numpy as np
+
+from avoider_logic import AvoiderLogic
+import avoider_rules as ar
+import dwa
+from local_grid import LocalGrid
+
+CONFIGS = {
+    'rules': lambda: AvoiderLogic(),
+    'table': lambda: AvoiderLogic(table=ar.compile_table()),
+    'grid': lambda: AvoiderLogic(grid=LocalGrid()),
+    'dwa': lambda: AvoiderLogic(planner=dwa.DynamicWindow()),
+}
+DEFAULT_CONFIGS = 'rules,table,grid,dwa'
+# twists differing by more than this (m/s or rad/s) count as changed
+DIFF_TOLERANCE = 1e-3
+
+class Scan(object):
+    """The LaserScan fields the avoider reads."""
+    def __init__(self, trace, i):
+        self.ranges = trace['ranges'][i]
+        self.angle_min = float(trace['angle_min'])
+        self.angle_increment = float(trace['angle_increment'])
+        self.range_min = float(trace['range_min'])
+        self.range_max = float(trace['range_max'])
+
+
+def synthetic_trace(duration_s=60.0, rate_hz=10.0, rays=640, seed=0):
+    """Drive down a corridor past some posts, recording what the scanner
+    and IMU would report. Returns a dict laid out like a trace file."""
+    rng = np.random.RandomState(seed)
+    (fov, range_min, range_max) = (1.0, 0.45, 5.0)
+    half_width = 1.2
+    posts = np.array([rng.uniform(1.0, 0.15 * duration_s + 5.0, 12),
+                      rng.uniform(-0.8, 0.8, 12)]).T
+    post_radius = 0.15
+
+    t = np.arange(0.0, duration_s, 1.0 / rate_hz)
+    poses = np.array([0.15 * t, 0.3 * np.sin(0.1 * t), 0.2 * np.sin(0.15 * t)]).T
+    angles = -fov / 2.0 + fov / (rays - 1) * np.arange(rays)
+
+    # distance along each ray to the walls and to each post
+    a = poses[:, 2, np.newaxis] + angles
+    (c, s) = (np.cos(a), np.sin(a))
+    (x, y) = (poses[:, 0, np.newaxis], poses[:, 1, np.newaxis])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranges = np.where(s > 0.0, (half_width - y) / s, (-half_width - y) / s)
+    ranges[~(ranges > 0.0)] = np.inf
+    for (px, py) in posts:
+        (dx, dy) = (px - x, py - y)
+        along = dx * c + dy * s
+        across2 = dx**2 + dy**2 - along**2
+        hit = (along > 0.0) & (across2 < post_radius**2)
+        d = along - np.sqrt(np.maximum(post_radius**2 - across2, 0.0))
+        ranges = np.where(hit, np.minimum(ranges, d), ranges)
+
+    ranges = ranges + rng.normal(0.0, 0.01, ranges.shape)
+    ranges[(ranges < range_min) | (ranges > range_max)] = np.nan
+    ranges[rng.uniform(size=ranges.shape) < 0.02] = np.nan
+    return {
+        'stamps': t,
+        'ranges': ranges.astype(np.float32),
+        'angle_min': -fov / 2.0,
+        'angle_increment': fov / (rays - 1),
+        'range_min': range_min,
+        'range_max': range_max,
+        'yaw': poses[:, 2] + rng.normal(0.0, 0.005, len(t)),
+        'poses': poses,
+    }
+
+
+def replay(trace, logic):
+    """Feed every scan of the trace to logic. Returns the twists, (N, 3),
+    and how long each decision took, (N,) in s."""
+    n = len(trace['stamps'])
+    poses = trace.get('poses', np.zeros((n, 3)))
+    twists = np.empty((n, 3))
+    elapsed = np.empty(n)
+    for i in range(n):
+        scan = Scan(trace, i)
+        delta_heading = trace['yaw'][0] - trace['yaw'][i]
+        start = time.time()
+        twists[i] = logic.decide(scan, delta_heading, trace['stamps'][i],
+                                 poses[i])
+        elapsed[i] = time.time() - start
+    return (twists, elapsed)
+
+
+def diff(twists, reference):
+    """Largest difference of any twist component, and the fraction of
+    decisions that changed."""
+    d = np.abs(twists - reference).max(axis=1)
+    return (d.max(), (d > DIFF_TOLERANCE).mean())
+
+
+def main(args):
+    args = list(args[1:])
+    options = {'--save': None, '--configs': DEFAULT_CONFIGS,
+               '--output': None, '--compare': None}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = args[i + 1]
+            del args[i:i + 2]
+    if args:
+        trace = dict(np.load(args[0]))
+    else:
+        trace = synthetic_trace()
+    if options['--save'] is not None:
+        np.savez(options['--save'], **trace)
+    names = options['--configs'].split(',')
+    for name in names:
+        if name not in CONFIGS:
+            print('unknown configuration: ' + name)
+            return 1
+    previous = {}
+    if options['--compare'] is not None:
+        previous = dict(np.load(options['--compare']))
+
+    results = {}
+    for name in names:
+        results[name] = replay(trace, CONFIGS[name]())
+
+    print('%d scans of %d rays over %.1f s' % (
+        trace['ranges'].shape + (trace['stamps'][-1] - trace['stamps'][0],)))
+    print('%-8s %12s %10s %10s %12s %10s' % (
+        'config', 'decisions/s', 'p50 (us)', 'p99 (us)',
+        'max diff', 'changed'))
+    for name in names:
+        (twists, elapsed) = results[name]
+        row = '%-8s %12.0f %10.1f %10.1f' % (
+            name, len(elapsed) / elapsed.sum(),
+            np.percentile(elapsed, 50) * 1e6, np.percentile(elapsed, 99) * 1e6)
+        if name != names[0]:
+            row += ' %12.4f %9.1f%%' % tuple(
+                np.array(diff(twists, results[names[0]][0])) * (1, 100))
+        print(row)
+
+    for name in names:
+        if name in previous:
+            (largest, changed) = diff(results[name][0], previous[name])
+            print('%-8s vs %s: max diff %.4f, %.1f%% changed' % (
+                name, options['--compare'], largest, 100.0 * changed))
+
+    if options['--output'] is not None:
+        np.savez(options['--output'],
+                 **dict((name, results[name][0]) for name in names))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
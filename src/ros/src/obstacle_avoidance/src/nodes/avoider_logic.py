@@ -0,0 +1,106 @@
+"""
+    The obstacle avoider's decisions, from a scan and the heading to a
+    twist, apart from the node's topics and threads: ObstacleAvoider runs
+    it on live messages, and avoider_benchmark.py on recorded ones, so
+    both go through exactly the same sectors, grid and planner.
+"""
+import numpy as np
+
+from avoider_rules import avoider_engine, decide
+import dwa
+import scan_sectors as ss
+
+ANGULAR_SCALING = 0.7       # rad/s of turn rate per rad of fuzzy turn
+MAX_ANGULAR_Z = 0.38        # rad/s, to the left; turns right aren't capped
+LINEAR_RATE = 0.15          # m/s at full go_forward
+DISTANCE_SCALING = 1.0
+
+class AvoiderLogic(object):
+    """
+        Turns each scan into a twist, (linear.x, linear.y, angular.z), with
+        the fuzzy rules or a dynamic window planner. What went into the
+        last decision is kept in last, for logging.
+    """
+    def __init__(self, table=None, sectors=None, grid=None, planner=None):
+        """
+            table: a LookupTable compiled from the rule base by
+                compile_avoider_table.py, answering in place of the rules
+            sectors: a ScanSectors with right, front and left sectors, by
+                default the mean over scan_sectors.avoider_sectors()
+            grid: a LocalGrid to add the scans to, for the rules or the
+                planner to go by what it remembers; or None
+            planner: a dwa.DynamicWindow to plan with instead of the
+                rules, or None
+        """
+        if table is not None:
+            self.decisions = table.evaluate
+        else:
+            engine = avoider_engine()
+            self.decisions = lambda x: decide(engine, x)
+        if sectors is None:
+            sectors = ss.ScanSectors(ss.avoider_sectors())
+        self.sectors = sectors
+        self.grid = grid
+        self.planner = planner
+        self.last_twist = np.zeros(3)
+        self.last_stamp = None
+        self.last = {}
+
+    def decide(self, scan, delta_heading, stamp, pose=(0.0, 0.0, 0.0)):
+        """
+            The twist for a scan.
+
+            delta_heading: how far the base has turned from its initial
+                heading, rad
+            stamp: time of the scan, s
+            pose: where the scan was taken in the odometry frame, as
+                (x, y, theta); only the local grid needs it
+        """
+        if self.grid is not None:
+            self.grid.recenter(pose[0], pose[1])
+            self.grid.integrate(pose, scan.ranges, scan.angle_min,
+                                scan.angle_increment, scan.range_min,
+                                scan.range_max)
+        if self.planner is not None:
+            twist = self.plan(scan, delta_heading, stamp, pose)
+        else:
+            twist = self.fuzzy(scan, delta_heading, pose)
+        self.last_twist = twist
+        self.last_stamp = stamp
+        return twist
+
+    def fuzzy(self, scan, delta_heading, pose):
+        # Dividing the laser scan data to right, front and left perception
+        if self.grid is not None:
+            distances = self.grid.sector_distances(pose, self.sectors.bounds)
+        else:
+            distances = self.sectors.reduce(scan)
+        (right_distance, front_distance, left_distance) = \
+            distances * DISTANCE_SCALING
+
+        (output, go_forward) = self.decisions((left_distance, front_distance,
+                                               right_distance, delta_heading))
+        (output, go_forward) = (float(output), float(go_forward))
+        self.last = {'distances': distances, 'output': output,
+                     'go_forward': go_forward}
+
+        angular_z = min(output * ANGULAR_SCALING, MAX_ANGULAR_Z)
+        return np.array([min(go_forward, 1.0) * LINEAR_RATE, 0.0, angular_z])
+
+    def plan(self, scan, delta_heading, stamp, pose):
+        """Plan the next twist with the dynamic window, starting from the
+        last twist planned, from the scan's points or, with a grid, from
+        every obstacle it remembers."""
+        dt = self.planner.horizon / len(self.planner.times)
+        if self.last_stamp is not None:
+            dt = min(max(stamp - self.last_stamp, 0.0), 2.0 * dt)
+        if self.grid is not None:
+            points = self.grid.occupied_points(pose)
+        else:
+            points = dwa.scan_points(scan.ranges, scan.angle_min,
+                                     scan.angle_increment, scan.range_min,
+                                     scan.range_max, self.planner.reach)
+        twist = self.planner.plan(self.last_twist, points, delta_heading, dt)
+        self.last = {'points': len(points),
+                     'samples': self.planner.budget.samples}
+        return twist
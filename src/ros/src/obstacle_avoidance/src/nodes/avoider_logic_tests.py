@@ -0,0 +1,86 @@
+""" Unit tests for the avoider's decisions and their replay benchmark.
+"""
+import logging
+import unittest
+
+import numpy as np
+
+import avoider_benchmark as ab
+from avoider_logic import AvoiderLogic, LINEAR_RATE, MAX_ANGULAR_Z
+import dwa
+from local_grid import LocalGrid
+
+class AvoiderLogicTests(unittest.TestCase):
+    def setUp(self):
+        self.trace = ab.synthetic_trace(duration_s=5.0)
+
+    def test_open_space_goes_straight(self):
+        self.trace['ranges'][0] = 4.0
+        logic = AvoiderLogic()
+        twist = logic.decide(ab.Scan(self.trace, 0), 0.0, 0.0)
+        np.testing.assert_allclose(twist, (LINEAR_RATE, 0.0, 0.0))
+        self.assertEqual(logic.last['go_forward'], 2.0)
+
+    def test_no_returns_read_as_blocked(self):
+        # only the rightmost ray has a valid range
+        self.trace['ranges'][0] = np.nan
+        self.trace['ranges'][0, 0] = 4.0
+        twist = AvoiderLogic().decide(ab.Scan(self.trace, 0), 0.0, 0.0)
+        self.assertTrue(twist[2] < 0.0)
+
+    def test_no_returns_at_all_read_as_clear(self):
+        # +inf: nothing within range_max in any direction
+        self.trace['ranges'][0] = np.inf
+        twist = AvoiderLogic().decide(ab.Scan(self.trace, 0), 0.0, 0.0)
+        np.testing.assert_allclose(twist, (LINEAR_RATE, 0.0, 0.0))
+
+    def test_limits(self):
+        (twists, elapsed) = ab.replay(self.trace, AvoiderLogic())
+        self.assertEqual(twists.shape, (50, 3))
+        self.assertTrue((twists[:, 0] <= LINEAR_RATE).all())
+        self.assertTrue((twists[:, 1] == 0.0).all())
+        self.assertTrue((twists[:, 2] <= MAX_ANGULAR_Z).all())
+        self.assertTrue((elapsed > 0.0).all())
+
+    def test_replay_repeats(self):
+        (first, elapsed) = ab.replay(self.trace, AvoiderLogic())
+        (second, elapsed) = ab.replay(self.trace, AvoiderLogic())
+        self.assertEqual(ab.diff(second, first), (0.0, 0.0))
+
+    def test_planner_within_limits(self):
+        logic = AvoiderLogic(planner=dwa.DynamicWindow())
+        (twists, elapsed) = ab.replay(self.trace, logic)
+        self.assertTrue((twists[:, 0] >= 0.0).all())
+        self.assertTrue((np.abs(twists) <= dwa.DEFAULT_MAX_SPEED).all())
+
+    def test_planner_slides(self):
+        # something just right of the path, closer than the robot can
+        # stop short of: it slides left, away from it
+        rays = self.trace['ranges'].shape[1]
+        self.trace['ranges'][:] = np.nan
+        self.trace['ranges'][:, rays // 2 - 20:rays // 2] = 0.6
+        logic = AvoiderLogic(planner=dwa.DynamicWindow())
+        (twists, elapsed) = ab.replay(self.trace, logic)
+        self.assertTrue((twists[:, 1] > 0.0).any())
+        self.assertTrue((twists[:, 1] >= 0.0).all())
+
+    def test_planner_uses_grid(self):
+        logic = AvoiderLogic(grid=LocalGrid(4.0, 0.05),
+                             planner=dwa.DynamicWindow())
+        self.trace['ranges'][0] = 1.0
+        logic.decide(ab.Scan(self.trace, 0), 0.0, 0.0)
+        self.assertTrue(logic.last['points'] > 0)
+        # out of view, but remembered
+        self.trace['ranges'][1] = np.nan
+        logic.decide(ab.Scan(self.trace, 1), 0.0, 0.1, (0.0, 0.0, 0.1))
+        self.assertTrue(logic.last['points'] > 0)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+    The obstacle avoider's fuzzy rule base: the membership functions of its
+    inputs, its rules as data, and how the rule outputs become a turn.
+    Kept free of ROS so that it can be evaluated and compiled offline into
+    a lookup table (see compile_avoider_table.py).
+"""
+from math import pi
+
+import numpy as np
+
+from fuzzy import FuzzyEngine, LookupTable, MembershipFunction
+
+# The avoider's inputs: distance to obstacles on the left, in front and on
+# the right (m), and drift from the initial heading (rad)
+AVOIDER_INPUTS = ('left', 'front', 'right', 'heading_delta')
+AVOIDER_TERMS = {
+    'left': {
+        'near': MembershipFunction( ((0.,1.), (1.,1.), (1.5,0.)) ),
+        'mid': MembershipFunction( ((1.,0.), (1.5,1.), (2.,1.), (2.5,0.)) ),
+        'far': MembershipFunction( ((2.,0.), (2.5,1.), (5.,1.)) ),
+    },
+    'front': {
+        'near': MembershipFunction( ((0.,1.), (1.,1.), (2.,0.)) ),
+        'mid': MembershipFunction( ((1.,0.), (2.,1.), (3.,1.), (4.5,0.)) ),
+        'far': MembershipFunction( ((3.,0.), (4.5,1.),(6.,1.)) ),
+    },
+    'right': {
+        'near': MembershipFunction( ((0.,1.), (1.,1.), (1.5,0.)) ),
+        'mid': MembershipFunction( ((1.,0.), (1.5,1.), (2.,1.), (2.5,0.)) ),
+        'far': MembershipFunction( ((2.,0.), (2.5,1.), (5.,1.)) ),
+    },
+    'heading_delta': {
+        'right': MembershipFunction( ((-1., 1.), (-0.07,1.),(-0.03,0.)) ),
+        'front': MembershipFunction( ((-0.07,0.), (-0.03,1.), (0.03,1.), (0.07,0.)) ),
+        'left': MembershipFunction( ((0.03,0.),(0.07,1.),(1.,1.)) ),
+    },
+}
+
+AVOIDER_OUTPUTS = ('turn_right', 'go_forward', 'turn_left')
+AVOIDER_RULES = (
+    ('turn_right', ('!right.near', 'front.near', 'left.near')),
+    ('turn_right', ('!right.near', 'front.near', 'left.mid')),
+    ('turn_right', ('!right.near', 'front.mid', 'left.near')),
+    ('turn_right', ('!right.near', 'front.mid', 'left.mid')),
+    ('turn_right', ('!right.near', '!left.far')),
+    ('turn_right', ('!right.near', 'heading_delta.left')),
+
+    ('go_forward', ('!front.near',)),
+    ('go_forward', ('!front.near', 'left.near', 'right.near')),
+    ('go_forward', ('!front.near', 'left.near', '!right.near')),
+    ('go_forward', ('!front.near', 'heading_delta.front')),
+
+    ('turn_left', ('!left.near', 'right.near', 'front.near')),
+    ('turn_left', ('!left.near', 'right.near', 'front.mid')),
+    ('turn_left', ('!left.near', 'right.mid', 'front.near')),
+    ('turn_left', ('!left.near', 'right.mid', 'front.mid')),
+    ('turn_left', ('!left.near', '!right.far')),
+    ('turn_left', ('!left.near', 'heading_delta.right')),
+)
+
+# where each output pulls the steering, in rad
+AVOIDER_TURNS = np.array([-pi/4., 0.0, pi/4.])
+
+# The grid the avoider's lookup table is sampled on: (low, high, points)
+# per input. It spans every breakpoint, beyond which the memberships are
+# constant, and its steps land on all of them.
+AVOIDER_GRID = (
+    (0.0, 5.0, 21),         # left, 0.25 m
+    (0.0, 6.0, 25),         # front, 0.25 m
+    (0.0, 5.0, 21),         # right, 0.25 m
+    (-0.07, 0.07, 15),      # heading_delta, 0.01 rad
+)
+
+# columns of the avoider's decisions
+DECISION_TURN = 0           # turn angle, rad
+DECISION_FORWARD = 1        # go_forward strength
+
+def avoider_engine():
+    return FuzzyEngine(AVOIDER_INPUTS, AVOIDER_TERMS, AVOIDER_OUTPUTS,
+                       AVOIDER_RULES)
+
+def steer(strengths):
+    """Defuzzify output strengths, shape (..., 3), into turn angles (rad):
+    the average of AVOIDER_TURNS weighted by the square roots of the
+    strengths, or no turn if neither turn fires."""
+    strengths = np.asarray(strengths, dtype=float)
+    weights = np.sqrt(strengths)
+    turning = (strengths[..., 0] > 0.0) | (strengths[..., 2] > 0.0)
+    total = np.where(turning, weights.sum(axis=-1), 1.0)
+    return np.where(turning, np.dot(weights, AVOIDER_TURNS) / total, 0.0)
+
+def decide(engine, x):
+    """The avoider's decisions for inputs x, shape (N, 4) or (4,): turn
+    angle and forward strength, shape (N, 2) or (2,)."""
+    strengths = engine.evaluate(x)
+    return np.array([steer(strengths), strengths[..., 1]]).T
+
+def compile_table(path=None, grid=AVOIDER_GRID):
+    """Sample the avoider's decisions into a LookupTable, saved to path if
+    given."""
+    engine = avoider_engine()
+    return LookupTable.build(lambda x: decide(engine, x), grid, path)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+""" Compiles the obstacle avoider's fuzzy rule base into a lookup table for
+    obstacle_avoidance.py's ~lookup_table parameter, and reports how far
+    the table is from the exact engine and what a decision costs with each.
+
+    The table holds the turn angle (rad) and forward strength on a regular
+    grid over left, front and right distance and heading delta, by default
+    avoider_rules.AVOIDER_GRID; --points scales every distance axis to
+    that many points per metre instead.
+
+    Usage: compile_avoider_table.py table.npy [--points N] [--samples N]
+"""
+import sys
+import time
+
+import numpy as np
+
+import avoider_rules as ar
+from fuzzy import LookupTable
+
+TOLERANCE = np.array([0.05, 0.05])  # rad, forward strength
+SAMPLES = 20000
+TIMING_CALLS = 2000
+
+
+def scaled_grid(points_per_m):
+    """AVOIDER_GRID with points_per_m points per metre on the distances."""
+    grid = []
+    for (i, (low, high, points)) in enumerate(ar.AVOIDER_GRID):
+        if 'heading_delta' != ar.AVOIDER_INPUTS[i]:
+            points = int(round((high - low) * points_per_m)) + 1
+        grid.append((low, high, points))
+    return tuple(grid)
+
+
+def cost(function, x):
+    """Mean time of function on single rows of x, s."""
+    start = time.time()
+    for row in x:
+        function(row)
+    return (time.time() - start) / len(x)
+
+
+def main(args):
+    args = list(args[1:])
+    options = {'--points': None, '--samples': SAMPLES}
+    for option in options:
+        if option in args:
+            i = args.index(option)
+            options[option] = int(args[i + 1])
+            del args[i:i + 2]
+    if 1 != len(args):
+        print(__doc__)
+        return 1
+    path = args[0]
+    grid = ar.AVOIDER_GRID
+    if options['--points'] is not None:
+        grid = scaled_grid(options['--points'])
+
+    start = time.time()
+    ar.compile_table(path, grid)
+    print('compiled %s in %.2f s' % (path, time.time() - start))
+    table = LookupTable.load(path)
+    print('grid %s, %d bytes' % (' x '.join(str(n) for n in table.points),
+                                 table.values.nbytes))
+
+    # random inputs, reaching a little past the grid on every side
+    engine = ar.avoider_engine()
+    exact = lambda x: ar.decide(engine, x)
+    rng = np.random.RandomState(0)
+    margin = 0.1 * (table.high - table.low)
+    x = rng.uniform(table.low - margin, table.high + margin,
+                    (options['--samples'], len(table.points)))
+
+    print('%-10s %10s %10s %12s  %s' % ('output', 'max', 'rms', 'over tol',
+                                        'worst input'))
+    (worst, rms, over, where) = table.errors(exact, x, TOLERANCE)
+    for (k, name) in enumerate(('turn', 'forward')):
+        print('%-10s %10.4f %10.4f %11.2f%%  %s' % (
+            name, worst[k], rms[k], 100.0 * over[k],
+            np.array2string(where[k], precision=3)))
+
+    print('decision: engine %.1fus, table %.1fus' % (
+        cost(exact, x[:TIMING_CALLS]) * 1e6,
+        cost(table.evaluate, x[:TIMING_CALLS]) * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
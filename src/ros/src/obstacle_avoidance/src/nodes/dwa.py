@@ -0,0 +1,198 @@
+"""
+    A dynamic window planner for the mecanum base: an alternative to the
+    fuzzy rules that uses the base's sideways motion. Each cycle it
+    samples the (vx, vy, wz) reachable from the current command within the
+    base's acceleration limits, simulates each for a short horizon, and
+    scores every trajectory against the points of the latest scan at once.
+    Twists are (vx, vy, wz) arrays and obstacles are (N, 2) points in the
+    base frame, whatever sensor they came from.
+"""
+import time
+
+import numpy as np
+
+from scan_sectors import ranges_array
+
+# the avoider's limits: x, y (m/s) and theta (rad/s)
+DEFAULT_MAX_SPEED = (0.15, 0.1, 0.38)
+DEFAULT_MAX_ACCEL = (0.3, 0.3, 1.0)
+ROBOT_RADIUS_m = 0.35
+HORIZON_s = 2.0
+HORIZON_STEPS = 10
+
+# weights of the scores of a twist: how fast it goes ahead, how far its
+# trajectory keeps from obstacles, how well it holds the initial heading,
+# and how much it slides sideways, which it should only do to get around
+# something
+WEIGHT_PROGRESS = 1.0
+WEIGHT_CLEARANCE = 0.5
+WEIGHT_HEADING = 0.5
+WEIGHT_SIDEWAYS = 0.2
+# clearance beyond this counts no more, m
+CLEARANCE_CAP_m = 1.0
+# scan points closer together than this are merged, m
+POINT_SPACING_m = 0.05
+
+def scan_points(ranges, angle_min, angle_increment, range_min=0.0,
+                range_max=np.inf, reach=np.inf):
+    """The valid returns of a scan within reach, as (N, 2) x, y in the
+    robot frame."""
+    r = ranges_array(ranges)
+    angles = angle_min + angle_increment * np.arange(len(r))
+    with np.errstate(invalid='ignore'):
+        valid = (r >= range_min) & (r <= min(range_max, reach))
+    (r, angles) = (r[valid], angles[valid])
+    return np.array([r * np.cos(angles), r * np.sin(angles)]).T
+
+def thin_points(points, spacing=POINT_SPACING_m):
+    """One point from each spacing-wide square that has any, so that the
+    cost of scoring depends on the area around the base and not on the
+    scanner's resolution."""
+    cells = np.floor(points / spacing).astype(np.int64)
+    keys = cells[:, 0] * (1 << 32) + cells[:, 1]
+    (keys, first) = np.unique(keys, return_index=True)
+    return points[first]
+
+def trajectories(v, times):
+    """
+        Poses reached by holding body-frame twists v, shape (N, 3), from the
+        origin, at each of times, shape (S,): (N, S, 3) x, y, theta.
+    """
+    (vx, vy, w) = [v[:, i, np.newaxis] for i in range(3)]
+    theta = w * times
+    small = np.abs(theta) < 1e-6
+    # sin(theta)/w and (1 - cos(theta))/w, with their limits as w -> 0
+    safe = np.where(small, 1.0, w)
+    s = np.where(small, times, np.sin(theta) / safe)
+    c = np.where(small, 0.5 * w * times**2, (1.0 - np.cos(theta)) / safe)
+    return np.dstack([vx * s - vy * c, vx * c + vy * s, theta])
+
+
+def axis_counts(samples):
+    """Points along vx, vy and wz of a lattice of at most samples twists,
+    at least two each and as even as they can be, so that the lattice
+    grows and shrinks with samples rather than in whole cubes. Points to
+    spare go to vy and wz first: vx's window is cut off at zero."""
+    n = max(2, int(samples ** (1.0 / 3.0) + 1e-9))
+    counts = [n, n, n]
+    for i in (1, 2, 0):
+        if (counts[0] * counts[1] * counts[2]) // n * (n + 1) <= samples:
+            counts[i] += 1
+    return counts
+
+
+class SampleBudget(object):
+    """
+        Number of candidates to score per cycle, adjusted to keep each
+        cycle within a time budget: it shrinks when a cycle runs over, as
+        when the CPU is loaded, and grows back when there's time to spare.
+    """
+    def __init__(self, budget_s, samples, minimum=27, maximum=3375):
+        self.budget_s = budget_s
+        self.samples = samples
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def update(self, elapsed_s):
+        """Adjust the sample count after a cycle that took elapsed_s."""
+        scale = np.clip(self.budget_s / max(elapsed_s, 1e-6), 0.5, 1.25)
+        self.samples = int(np.clip(self.samples * scale, self.minimum,
+                                   self.maximum))
+
+
+class DynamicWindow(object):
+    """Picks a twist for the base each cycle; see the module description."""
+
+    def __init__(self, max_speed=DEFAULT_MAX_SPEED, max_accel=DEFAULT_MAX_ACCEL,
+                 budget=None, radius=ROBOT_RADIUS_m, horizon=HORIZON_s,
+                 steps=HORIZON_STEPS):
+        """
+            max_speed, max_accel: limits of the base along x, y and theta,
+                in m/s and rad/s, and per s
+            budget: a SampleBudget, by default 343 candidates within 20 ms
+            radius: distance the base must keep from every scan point, m
+            horizon: how far ahead trajectories are simulated, s
+            steps: poses simulated along each trajectory
+        """
+        self.max_speed = np.array(max_speed, dtype=float)
+        self.max_accel = np.array(max_accel, dtype=float)
+        if budget is None:
+            budget = SampleBudget(0.02, 343)
+        self.budget = budget
+        self.radius = radius
+        self.horizon = horizon
+        self.times = np.linspace(horizon / steps, horizon, steps)
+        # scan points farther than this can't be reached within the horizon
+        self.reach = np.hypot(*self.max_speed[:2]) * horizon + radius
+
+    def candidates(self, current, dt, samples):
+        """A lattice of up to samples twists (see axis_counts) filling the
+        window reachable from the current twist in dt, and that twist
+        itself."""
+        current = np.asarray(current, dtype=float)
+        low = np.maximum(current - self.max_accel * dt, -self.max_speed)
+        high = np.minimum(current + self.max_accel * dt, self.max_speed)
+        # the avoider doesn't back up
+        low[0] = max(low[0], 0.0)
+        high[0] = max(high[0], low[0])
+        axes = [np.linspace(l, h, n)
+                for (l, h, n) in zip(low, high, axis_counts(samples))]
+        for a in axes:
+            # so that going straight, or not turning, is always a candidate
+            if a[0] < 0.0 < a[-1]:
+                a[np.argmin(np.abs(a))] = 0.0
+        lattice = np.array([a.ravel() for a in
+                            np.meshgrid(*axes, indexing='ij')]).T
+        held = np.clip(current, low, high)[np.newaxis, :]
+        return np.vstack([held, lattice])
+
+    def score(self, v, points, delta_heading=0.0):
+        """
+            Score of each twist in v, shape (N, 3), against scan points,
+            shape (M, 2); -inf for those that come within radius of a point.
+            delta_heading is how far the base has turned from its initial
+            heading, rad, positive to the left as the fuzzy rules take it;
+            the heading score favours twists that undo it.
+        """
+        poses = trajectories(v, self.times)
+        if len(points):
+            # squared distances from every pose to every point, as one
+            # matrix product
+            xy = poses[:, :, :2].reshape(-1, 2)
+            d2 = ((xy**2).sum(axis=1)[:, np.newaxis] - 2.0 * np.dot(xy, points.T)
+                  + (points**2).sum(axis=1)[np.newaxis, :])
+            d2 = d2.min(axis=1).reshape(len(v), -1).min(axis=1)
+            clearance = np.sqrt(np.maximum(d2, 0.0))
+        else:
+            clearance = np.empty(len(v))
+            clearance.fill(np.inf)
+        progress = v[:, 0] / self.max_speed[0]
+        # turning by theta adds to the drift
+        heading = np.abs(delta_heading + poses[:, -1, 2]) / np.pi
+        sideways = np.abs(v[:, 1]) / self.max_speed[1]
+        score = (WEIGHT_PROGRESS * progress
+                 + WEIGHT_CLEARANCE * np.minimum(clearance - self.radius,
+                                                 CLEARANCE_CAP_m)
+                 - WEIGHT_HEADING * heading
+                 - WEIGHT_SIDEWAYS * sideways)
+        return np.where(clearance > self.radius, score, -np.inf)
+
+    def plan(self, current, points, delta_heading=0.0, dt=0.2):
+        """
+            The best twist (vx, vy, wz) to follow current, dt s later, given
+            scan points in the robot frame; stop if every candidate would
+            hit something. Adjusts the budget by how long it took.
+        """
+        start = time.time()
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        points = thin_points(
+            points[np.hypot(points[:, 0], points[:, 1]) <= self.reach])
+        v = self.candidates(current, dt, self.budget.samples)
+        score = self.score(v, points, delta_heading)
+        best = np.argmax(score)
+        if np.isinf(score[best]):
+            twist = np.zeros(3)
+        else:
+            twist = v[best]
+        self.budget.update(time.time() - start)
+        return twist
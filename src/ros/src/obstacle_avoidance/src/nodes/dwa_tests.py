@@ -0,0 +1,110 @@
+""" Unit tests for the dynamic window planner.
+"""
+import logging
+from math import pi
+import unittest
+
+import numpy as np
+
+import avoider_rules
+import dwa
+
+class TrajectoryTests(unittest.TestCase):
+    def test_straight_and_sideways(self):
+        poses = dwa.trajectories(np.array([[0.1, 0.0, 0.0], [0.0, -0.1, 0.0]]),
+                                 np.array([1.0, 2.0]))
+        np.testing.assert_allclose(poses[0], [[0.1, 0.0, 0.0], [0.2, 0.0, 0.0]])
+        np.testing.assert_allclose(poses[1], [[0.0, -0.1, 0.0], [0.0, -0.2, 0.0]])
+
+    def test_arc(self):
+        # a quarter circle of radius 1
+        poses = dwa.trajectories(np.array([[pi / 2.0, 0.0, pi / 2.0]]),
+                                 np.array([1.0]))
+        np.testing.assert_allclose(poses[0, 0], (1.0, 1.0, pi / 2.0))
+
+
+class DynamicWindowTests(unittest.TestCase):
+    def setUp(self):
+        self.planner = dwa.DynamicWindow()
+
+    def test_window_within_limits(self):
+        v = self.planner.candidates((0.1, 0.0, 0.0), 0.2, 125)
+        self.assertEqual(v.shape, (126, 3))
+        np.testing.assert_allclose(v[0], (0.1, 0.0, 0.0))
+        self.assertTrue((v[:, 0] >= 0.04 - 1e-9).all())
+        self.assertTrue((np.abs(v) <= np.array(dwa.DEFAULT_MAX_SPEED)).all())
+
+    def test_window_follows_samples(self):
+        previous = 0
+        for samples in range(27, 1000):
+            n = len(self.planner.candidates((0.1, 0.0, 0.0), 0.2, samples)) - 1
+            self.assertTrue(0.75 * samples <= n <= samples)
+            self.assertTrue(n >= previous)
+            previous = n
+        # halving the budget halves the work, about
+        self.assertEqual(
+            len(self.planner.candidates((0.1, 0.0, 0.0), 0.2, 171)) - 1, 150)
+        # an even count still holds a twist that neither slides nor turns
+        v = self.planner.candidates((0.1, 0.0, 0.0), 0.2, 180)
+        self.assertTrue(((v[1:, 1] == 0.0) & (v[1:, 2] == 0.0)).any())
+
+    def test_clear_path_goes_ahead(self):
+        twist = self.planner.plan((0.15, 0.0, 0.0), np.zeros((0, 2)))
+        self.assertAlmostEqual(twist[0], 0.15)
+        self.assertAlmostEqual(twist[2], 0.0)
+
+    def test_steps_around_obstacle(self):
+        # a post just off to the right of the path: sidestep or turn left
+        points = np.array([[0.5, -0.2]])
+        twist = self.planner.plan((0.1, 0.0, 0.0), points)
+        self.assertTrue(twist[1] > 0.0 or twist[2] > 0.0)
+        v = np.array([twist])
+        poses = dwa.trajectories(v, self.planner.times)
+        d = np.hypot(poses[0, :, 0] - 0.5, poses[0, :, 1] + 0.2)
+        self.assertTrue((d > self.planner.radius).all())
+
+    def test_recovers_heading(self):
+        # drifted left: turn right, as the fuzzy rules do
+        twist = np.zeros(3)
+        for i in range(20):
+            twist = self.planner.plan(twist, np.zeros((0, 2)), 0.3)
+        self.assertTrue(twist[2] < 0.0)
+        (turn, forward) = avoider_rules.decide(avoider_rules.avoider_engine(),
+                                               (5.0, 6.0, 5.0, 0.3))
+        self.assertTrue(turn < 0.0)
+        twist = self.planner.plan(np.zeros(3), np.zeros((0, 2)), -0.3)
+        self.assertTrue(twist[2] > 0.0)
+
+    def test_stops_when_boxed_in(self):
+        angles = np.linspace(-pi, pi, 72, endpoint=False)
+        points = 0.4 * np.array([np.cos(angles), np.sin(angles)]).T
+        twist = self.planner.plan((0.1, 0.0, 0.0), points)
+        np.testing.assert_array_equal(twist, (0.0, 0.0, 0.0))
+
+    def test_scan_points(self):
+        points = dwa.scan_points([1.0, np.nan, 2.0, 0.1], -pi / 2.0, pi / 2.0,
+                                 0.45, 10.0, reach=1.5)
+        np.testing.assert_allclose(points, [[0.0, -1.0]], atol=1e-12)
+
+
+class SampleBudgetTests(unittest.TestCase):
+    def test_shrinks_and_grows(self):
+        budget = dwa.SampleBudget(0.02, 1000, minimum=100, maximum=2000)
+        budget.update(0.08)
+        self.assertEqual(budget.samples, 500)
+        for i in range(10):
+            budget.update(0.2)
+        self.assertEqual(budget.samples, 100)
+        for i in range(20):
+            budget.update(0.001)
+        self.assertEqual(budget.samples, 2000)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
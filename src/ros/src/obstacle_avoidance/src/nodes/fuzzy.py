@@ -10,6 +10,7 @@
     
 """
 
+import itertools
 import os
 import numpy as np
 
@@ -51,38 +52,22 @@ class MembershipFunction:
         Format: (val, membership), (val, membership), (val, membership)
         e.g. (0, 1), (10, 1), (15, 0)
              (10, 0), (15, 1), (20, 0)
-             
+
+        Membership is interpolated linearly between the breakpoints, and
+        held at the first and last values outside them.
     """
     def __init__(self, mem_ship):
         self.mem_ship = mem_ship
+        self.xp = np.array([float(p[0]) for p in mem_ship])
+        self.fp = np.array([float(p[1]) for p in mem_ship])
 
     def get_value(self, input_val):
-        ms_count= len(self.mem_ship)
-        for i in range(ms_count - 1):
-            #print "input_val: %s" % (input_val)
-            #print "i: %s, mem_ship1: %s | mem_ship2: %s" % (i, self.mem_ship[i], self.mem_ship[i+1])
-            if (i==0 and input_val <= self.mem_ship[0][0]):
-                #print "case 1"
-                return float(self.mem_ship[i][1])
-            
-            if input_val >= self.mem_ship[i][0] and input_val < self.mem_ship[i+1][0]:
-                #print "case 3"
-                return self.member(self.mem_ship[i], self.mem_ship[i+1], input_val)
-
-        else:
-            return float(self.mem_ship[i+1][1])
-            
-        
-    def member(self, mem1, mem2, value):
-        """
-            mem# = (value, membership)
-        """
-        if mem1[1] == 1 and mem2[1] == 1:
-            return 1.0
-        elif mem1[1] == 0 and mem2[1] == 1: # on incline slope
-            return float(value-mem1[0])/(mem2[0] - mem1[0])
-        else:   # on decline slope
-            return 1- float(value-mem1[0])/(mem2[0] - mem1[0])
+        """Degree of membership of input_val; input_val may also be an
+        array, giving an array of degrees."""
+        value = np.interp(input_val, self.xp, self.fp)
+        if np.ndim(value) == 0:
+            return float(value)
+        return value
 
 class Fuzzy(object):
 
@@ -135,6 +120,209 @@ class Fuzzy(object):
 
     #def evaluate_rules(self):
 
+class FuzzyEngine(object):
+    """
+        A rule base compiled to array operations, evaluated for a whole
+        batch of inputs at once.
+
+        Rules are data: (output, literals), meaning "if all the literals
+        hold, then output". A literal names a membership function as
+        'variable.term', or its negation as '!variable.term'. AND is min
+        and NOT is 1 - x, as in fuzzyAND and fuzzyNOT; each output's
+        strength is the sum of its rules' firing strengths, each raised to
+        power.
+
+        e.g. rules = (('turn_right', ('!right.near', 'front.near')),
+                      ('go_forward', ('!front.near',)))
+    """
+    def __init__(self, input_names, terms, output_names, rules, power=2):
+        """
+            input_names: input variables, in the order of the input columns
+            terms: {variable: {term: MembershipFunction}}
+            output_names: outputs, in the order of the output columns
+            rules: sequence of (output, literals), as above
+            power: exponent applied to each rule's firing strength
+        """
+        self.input_names = tuple(input_names)
+        self.output_names = tuple(output_names)
+        self.power = power
+
+        # one column per membership function, then one per negation, then
+        # a column of ones that pads short rules
+        self.columns = []
+        self.term_inputs = []
+        xp = []
+        fp = []
+        for (i, name) in enumerate(self.input_names):
+            for term in sorted(terms[name]):
+                self.columns.append(name + '.' + term)
+                self.term_inputs.append(i)
+                xp.append(terms[name][term].xp)
+                fp.append(terms[name][term].fp)
+        self.xp = xp
+        self.fp = fp
+        n = len(self.columns)
+        index = dict((column, k) for (k, column) in enumerate(self.columns))
+
+        width = max(len(literals) for (output, literals) in rules)
+        self.rule_literals = np.empty((len(rules), width), dtype=int)
+        self.rule_literals.fill(2 * n)
+        self.rule_outputs = np.zeros((len(rules), len(self.output_names)))
+        for (r, (output, literals)) in enumerate(rules):
+            for (j, literal) in enumerate(literals):
+                if literal.startswith('!'):
+                    self.rule_literals[r, j] = n + index[literal[1:]]
+                else:
+                    self.rule_literals[r, j] = index[literal]
+            self.rule_outputs[r, self.output_names.index(output)] = 1.0
+
+    def memberships(self, x):
+        """Degrees of membership, shape (N, columns), for inputs x of shape
+        (N, inputs)."""
+        x = np.asarray(x, dtype=float)
+        m = np.empty((x.shape[0], len(self.columns)))
+        for (k, i) in enumerate(self.term_inputs):
+            m[:, k] = np.interp(x[:, i], self.xp[k], self.fp[k])
+        return m
+
+    def evaluate(self, x):
+        """
+            Output strengths for inputs x, one row of input_names values
+            per sample: shape (N, inputs) gives (N, outputs), and a single
+            row of shape (inputs,) gives (outputs,).
+        """
+        x = np.asarray(x, dtype=float)
+        single = (1 == x.ndim)
+        if single:
+            x = x[np.newaxis, :]
+        m = self.memberships(x)
+        literals = np.hstack([m, 1.0 - m, np.ones((m.shape[0], 1))])
+        firing = literals[:, self.rule_literals].min(axis=2)
+        strengths = np.dot(firing ** self.power, self.rule_outputs)
+        if single:
+            return strengths[0]
+        return strengths
+
+
+class LookupTable(object):
+    """
+        A function of a few inputs, sampled on a regular grid and answered
+        by multilinear interpolation between the grid points. A lookup
+        costs the same however big the rule base behind the table is.
+
+        Inputs outside the grid are clamped to its edges, so the grid
+        should reach the outermost breakpoints of the membership functions,
+        beyond which nothing changes.
+
+        Tables are saved as a .npy file of samples, which load() memory
+        maps, and a small GRID_SUFFIX file next to it holding the grid.
+    """
+    GRID_SUFFIX = '.grid'
+
+    def __init__(self, grid, values):
+        """
+            grid: (low, high, points) for each input
+            values: samples, shape (points_0, ..., points_k-1, outputs)
+        """
+        self.grid = np.array(grid, dtype=float)
+        self.values = values
+        self.low = self.grid[:, 0]
+        self.high = self.grid[:, 1]
+        self.points = self.grid[:, 2].astype(int)
+        self.step = (self.high - self.low) / (self.points - 1)
+        self.flat = values.reshape(-1, values.shape[-1])
+
+        # offsets of the 2**k corners of a grid cell in the flat samples,
+        # and which corners are on the upper side along each input
+        strides = np.cumprod(np.concatenate([[1], self.points[:0:-1]]))[::-1]
+        self.strides = strides
+        self.corners = np.array(list(itertools.product((0, 1),
+                                                       repeat=len(strides))))
+        self.corner_offsets = np.dot(self.corners, strides)
+
+    @classmethod
+    def build(cls, function, grid, path=None, dtype=np.float32):
+        """
+            Sample function on grid. function maps inputs of shape
+            (N, inputs) to outputs of shape (N, outputs). With a path, the
+            table is written straight to that file as it is sampled, and
+            saved there.
+        """
+        grid = np.array(grid, dtype=float)
+        axes = [np.linspace(low, high, int(points))
+                for (low, high, points) in grid]
+        values = None
+        # one slice along the first input at a time keeps memory bounded
+        for (i, first) in enumerate(axes[0]):
+            mesh = np.meshgrid(*([[first]] + axes[1:]), indexing='ij')
+            x = np.array([m.ravel() for m in mesh]).T
+            y = function(x)
+            if values is None:
+                shape = tuple(len(a) for a in axes) + (y.shape[1],)
+                if path is None:
+                    values = np.empty(shape, dtype=dtype)
+                else:
+                    values = np.lib.format.open_memmap(path, mode='w+',
+                                                       dtype=dtype,
+                                                       shape=shape)
+            values[i] = y.reshape(shape[1:])
+        table = cls(grid, values)
+        if path is not None:
+            values.flush()
+            table.save_grid(path)
+        return table
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved table, memory mapping its samples unless mmap is
+        False. A mapped file must not be rewritten while it is in use."""
+        values = np.load(path, mmap_mode='r' if mmap else None)
+        with open(path + cls.GRID_SUFFIX, 'rb') as f:
+            grid = np.load(f)
+        return cls(grid, values)
+
+    def save(self, path):
+        np.save(path, np.asarray(self.values))
+        self.save_grid(path)
+
+    def save_grid(self, path):
+        with open(path + self.GRID_SUFFIX, 'wb') as f:
+            np.save(f, self.grid)
+
+    def evaluate(self, x):
+        """
+            Interpolated outputs for inputs x: shape (N, inputs) gives
+            (N, outputs), and a single row of shape (inputs,) gives
+            (outputs,).
+        """
+        x = np.asarray(x, dtype=float)
+        single = (1 == x.ndim)
+        if single:
+            x = x[np.newaxis, :]
+        u = (np.clip(x, self.low, self.high) - self.low) / self.step
+        cell = np.minimum(np.floor(u).astype(int), self.points - 2)
+        f = (u - cell)[:, np.newaxis, :]
+        weights = np.where(self.corners, f, 1.0 - f).prod(axis=2)
+        samples = self.flat[np.dot(cell, self.strides)[:, np.newaxis]
+                            + self.corner_offsets]
+        y = (weights[:, :, np.newaxis] * samples).sum(axis=1)
+        if single:
+            return y[0]
+        return y
+
+    def errors(self, function, x, tolerance=0.05):
+        """
+            How far the table is from function at inputs x, shape
+            (N, inputs). Returns (max, rms, over, worst), per output: the
+            largest and RMS absolute error, the fraction of inputs where
+            the error exceeds tolerance, and the input with the largest
+            error.
+        """
+        x = np.asarray(x, dtype=float)
+        error = np.abs(self.evaluate(x) - function(x))
+        return (error.max(axis=0), np.sqrt((error**2).mean(axis=0)),
+                (error > tolerance).mean(axis=0), x[error.argmax(axis=0)])
+
 def fuzzyAND(input1, input2):
     return min(input1, input2)
 
@@ -0,0 +1,165 @@
+""" Unit tests for the fuzzy engine and the obstacle avoider's rule base.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from fuzzy import (FuzzyEngine, LookupTable, MembershipFunction,
+                   fuzzyAND, fuzzyNOT)
+import avoider_rules as ar
+
+def hand_written_rules(left, front, right, heading):
+    """The avoider's rule base as it was written out by hand."""
+    turn_right = fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['near'], left['near']))**2\
+                 + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['near'], left['mid']))**2\
+                 + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['mid'], left['near']))**2\
+                 + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['mid'], left['mid']))**2\
+                 + fuzzyAND(fuzzyNOT(right['near']), fuzzyNOT(left['far']))**2\
+                 + fuzzyAND(fuzzyNOT(right['near']), heading['left'])**2
+
+    go_forward = fuzzyNOT(front['near'])**2\
+                 + fuzzyAND(fuzzyNOT(front['near']), fuzzyAND(left['near'],right['near']))**2\
+                 + fuzzyAND(fuzzyNOT(front['near']), fuzzyAND(left['near'], fuzzyNOT(right['near'])))**2\
+                 + fuzzyAND(fuzzyNOT(front['near']), heading['front'])**2
+
+    turn_left = fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['near'],front['near']))**2\
+                + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['near'], front['mid']))**2\
+                + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['mid'], front['near']))**2\
+                + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['mid'], front['mid']))**2\
+                + fuzzyAND(fuzzyNOT(left['near']), fuzzyNOT(right['far']))**2\
+                + fuzzyAND(fuzzyNOT(left['near']), heading['right'])**2
+    return (turn_right, go_forward, turn_left)
+
+
+class MembershipFunctionTests(unittest.TestCase):
+    def test_trapezoid(self):
+        mid = MembershipFunction( ((1.,0.), (2.,1.), (3.,1.), (4.5,0.)) )
+        self.assertEqual(mid.get_value(0.0), 0.0)
+        self.assertEqual(mid.get_value(1.5), 0.5)
+        self.assertEqual(mid.get_value(2.5), 1.0)
+        self.assertAlmostEqual(mid.get_value(4.0), 1.0 / 3.0)
+        self.assertEqual(mid.get_value(10.0), 0.0)
+        np.testing.assert_allclose(mid.get_value([1.5, 2.5]), [0.5, 1.0])
+
+    def test_shoulders(self):
+        near = MembershipFunction( ((0.,1.), (1.,1.), (2.,0.)) )
+        self.assertEqual(near.get_value(-1.0), 1.0)
+        self.assertEqual(near.get_value(1.25), 0.75)
+        self.assertEqual(near.get_value(3.0), 0.0)
+
+
+class FuzzyEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = ar.avoider_engine()
+
+    def test_matches_hand_written_rules(self):
+        rng = np.random.RandomState(0)
+        x = np.column_stack([rng.uniform(0.0, 6.0, (500, 3)),
+                             rng.uniform(-0.2, 0.2, 500)])
+        strengths = self.engine.evaluate(x)
+        self.assertEqual(strengths.shape, (500, 3))
+        for (row, expected) in zip(x, strengths):
+            memberships = [dict((term, f.get_value(value)) for (term, f)
+                                in ar.AVOIDER_TERMS[name].items())
+                           for (name, value) in zip(ar.AVOIDER_INPUTS, row)]
+            np.testing.assert_allclose(hand_written_rules(*memberships),
+                                       expected, atol=1e-12)
+
+    def test_single_input(self):
+        strengths = self.engine.evaluate((5.0, 5.0, 5.0, 0.0))
+        self.assertEqual(strengths.shape, (3,))
+        # open space, on course: straight ahead at full strength
+        np.testing.assert_allclose(strengths, (0.0, 2.0, 0.0))
+        self.assertEqual(ar.steer(strengths), 0.0)
+
+    def test_wall_ahead_and_left(self):
+        strengths = self.engine.evaluate((0.5, 0.5, 5.0, 0.0))
+        self.assertTrue(strengths[0] > 0.0)
+        self.assertEqual(strengths[2], 0.0)
+        self.assertTrue(ar.steer(strengths) < 0.0)
+
+    def test_steer_batch(self):
+        turns = ar.steer([(0.0, 1.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 1.0)])
+        np.testing.assert_allclose(turns, (0.0, -np.pi / 4.0, 0.0))
+
+    def test_unknown_term(self):
+        self.assertRaises(KeyError, FuzzyEngine, ar.AVOIDER_INPUTS,
+                          ar.AVOIDER_TERMS, ar.AVOIDER_OUTPUTS,
+                          (('turn_left', ('left.close',)),))
+
+
+def multilinear(x):
+    """A function that multilinear interpolation reproduces exactly."""
+    x = np.asarray(x, dtype=float)
+    return np.array([1.0 + x[..., 0] - 2.0 * x[..., 1] * x[..., 2],
+                     x[..., 0] * x[..., 1] * x[..., 2]]).T
+
+
+class LookupTableTests(unittest.TestCase):
+    GRID = ((0.0, 2.0, 5), (-1.0, 1.0, 3), (0.0, 3.0, 4))
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_multilinear_is_exact(self):
+        table = LookupTable.build(multilinear, self.GRID, dtype=float)
+        x = np.random.RandomState(0).uniform((0.0, -1.0, 0.0), (2.0, 1.0, 3.0),
+                                             (200, 3))
+        np.testing.assert_allclose(table.evaluate(x), multilinear(x))
+        np.testing.assert_allclose(table.evaluate(x[0]), multilinear(x[0]))
+        # the upper edge of the grid is inside the last cell
+        np.testing.assert_allclose(table.evaluate((2.0, 1.0, 3.0)),
+                                   multilinear((2.0, 1.0, 3.0)))
+
+    def test_clamps_to_grid(self):
+        table = LookupTable.build(multilinear, self.GRID, dtype=float)
+        np.testing.assert_allclose(table.evaluate((-5.0, 3.0, 1.5)),
+                                   multilinear((0.0, 1.0, 1.5)))
+
+    def test_save_and_map(self):
+        path = os.path.join(self.dir, 'table.npy')
+        built = LookupTable.build(multilinear, self.GRID, path)
+        loaded = LookupTable.load(path)
+        self.assertTrue(isinstance(loaded.values, np.memmap))
+        self.assertEqual(loaded.values.dtype, np.float32)
+        x = np.array([(0.3, 0.2, 2.9), (1.7, -0.4, 0.1)])
+        np.testing.assert_array_equal(loaded.evaluate(x), built.evaluate(x))
+
+        copy = os.path.join(self.dir, 'copy.npy')
+        built.save(copy)
+        self.assertEqual(LookupTable.load(copy, mmap=False).values.shape,
+                         (5, 3, 4, 2))
+
+    def test_avoider_table(self):
+        engine = ar.avoider_engine()
+        exact = lambda x: ar.decide(engine, x)
+        table = ar.compile_table()
+        # exact at the grid points, whatever the rules
+        axes = [np.linspace(*g) for g in ar.AVOIDER_GRID]
+        x = np.array([g.ravel() for g in
+                      np.meshgrid(*axes, indexing='ij')]).T[::17]
+        (worst, rms, over, where) = table.errors(exact, x)
+        self.assertTrue((worst < 1e-6).all())
+
+        x = np.random.RandomState(0).uniform((0.0, 0.0, 0.0, -0.1),
+                                             (6.0, 6.0, 6.0, 0.1), (2000, 4))
+        (worst, rms, over, where) = table.errors(exact, x)
+        self.assertTrue((rms < 0.1).all())
+        self.assertTrue((over < 0.1).all())
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+    Hands the newest message of a topic from its subscriber callback to a
+    worker thread, waking the worker as soon as one arrives.
+"""
+import threading
+
+class LatestMessage(object):
+    """
+        Holds the newest message of a stream for one consumer thread.
+        Putting a message replaces one that hasn't been taken yet, which
+        is counted in dropped: a consumer that falls behind skips straight
+        to the newest message instead of working through a backlog.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.message = None
+        self.stamp = None
+        self.fresh = False      # whether message hasn't been taken yet
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, message, stamp=None):
+        """Replace the message, and wake the consumer. stamp is kept with
+        it, e.g. the time it arrived."""
+        with self.condition:
+            if self.fresh:
+                self.dropped += 1
+            self.message = message
+            self.stamp = stamp
+            self.fresh = True
+            self.received += 1
+            self.condition.notify()
+
+    def take(self):
+        """
+            Wait for a message that hasn't been taken yet and take it.
+            Returns (message, stamp), or None once closed.
+
+            There is deliberately no timeout: on Python 2, a timed wait
+            polls with sleeps of up to 50 ms, which is the latency this
+            is here to avoid. Use close() to let the consumer go.
+        """
+        with self.condition:
+            while not self.fresh and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+            self.fresh = False
+            return (self.message, self.stamp)
+
+    def peek(self):
+        """The newest message, taken or not; None if there's been none."""
+        with self.condition:
+            return self.message
+
+    def close(self):
+        """Wake the consumer for good; take() returns None from now on."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -0,0 +1,50 @@
+""" Unit tests for LatestMessage.
+"""
+import logging
+import threading
+import time
+import unittest
+
+from latest_message import LatestMessage
+
+class LatestMessageTests(unittest.TestCase):
+    def setUp(self):
+        self.latest = LatestMessage()
+
+    def test_newest_wins(self):
+        self.latest.put('a', 1.0)
+        self.latest.put('b', 2.0)
+        self.assertEqual(self.latest.take(), ('b', 2.0))
+        self.assertEqual((self.latest.received, self.latest.dropped), (2, 1))
+        self.assertEqual(self.latest.peek(), 'b')
+
+    def test_take_waits_for_put(self):
+        taken = []
+        consumer = threading.Thread(
+            target=lambda: taken.append(self.latest.take()))
+        consumer.start()
+        time.sleep(0.05)
+        self.assertEqual(taken, [])
+        self.latest.put('scan')
+        consumer.join(1.0)
+        self.assertEqual(taken, [('scan', None)])
+
+    def test_close_releases_consumer(self):
+        taken = []
+        consumer = threading.Thread(
+            target=lambda: taken.append(self.latest.take()))
+        consumer.start()
+        self.latest.close()
+        consumer.join(1.0)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(taken, [None])
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
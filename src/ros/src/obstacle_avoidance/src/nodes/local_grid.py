@@ -0,0 +1,151 @@
+"""
+    A rolling occupancy grid around the robot, built up from laser scans,
+    so that obstacles stay remembered after they leave the scanner's field
+    of view. Poses come in as (x, y, theta) and scans as bare arrays and
+    angles; the grid holds no messages.
+"""
+from math import floor
+
+import numpy as np
+
+from scan_sectors import ranges_array
+
+DEFAULT_SIZE_m = 8.0
+DEFAULT_RESOLUTION_m = 0.05
+
+# log odds added to a cell for each scan that ends in it, and for each
+# that passes through it; cells are held within +/- LOG_ODDS_LIMIT, so an
+# obstacle that has gone is forgotten after a few scans see through it
+LOG_ODDS_HIT = 0.85
+LOG_ODDS_MISS = -0.4
+LOG_ODDS_LIMIT = 3.5
+
+def yaw_of(q):
+    """Heading (rad) of an orientation quaternion with x, y, z, w."""
+    return np.arctan2(2.0 * (q.w * q.z + q.x * q.y),
+                      1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+
+
+class LocalGrid(object):
+    """
+        Square grid of log odds of occupancy, aligned with the odometry
+        frame and kept centred on the robot: as the robot moves, the cells
+        are shifted by whole cells rather than the grid being rebuilt.
+        Memory is fixed by the size and resolution.
+
+        log_odds[row, col] covers the cell whose centre is at
+        origin + ((col, row) - centre) * resolution in the odometry frame;
+        0 means nothing is known about it.
+    """
+    def __init__(self, size=DEFAULT_SIZE_m, resolution=DEFAULT_RESOLUTION_m):
+        """
+            size: width of the grid, m
+            resolution: width of a cell, m
+        """
+        self.resolution = resolution
+        self.cells = int(round(size / resolution)) | 1  # odd, for a centre
+        self.centre = self.cells // 2
+        self.radius = (self.centre + 0.5) * resolution
+        self.log_odds = np.zeros((self.cells, self.cells), dtype=np.float32)
+        self.origin = np.zeros(2)
+        # distances along a ray at which it is sampled, half a cell apart
+        # so that no cell it crosses is skipped
+        self.steps = np.arange(0.0, self.radius * np.sqrt(2.0),
+                               0.5 * resolution)
+
+    def recenter(self, x, y):
+        """Shift the grid by whole cells to keep (x, y) in its centre cell.
+        Cells that come into view are unknown."""
+        (dc, dr) = [int(floor((p - o) / self.resolution + 0.5))
+                    for (p, o) in zip((x, y), self.origin)]
+        if (0, 0) == (dc, dr):
+            return
+        n = self.cells
+        shifted = np.zeros_like(self.log_odds)
+        if abs(dr) < n and abs(dc) < n:
+            shifted[max(-dr, 0):n - max(dr, 0), max(-dc, 0):n - max(dc, 0)] = \
+                self.log_odds[max(dr, 0):n - max(-dr, 0),
+                              max(dc, 0):n - max(-dc, 0)]
+        self.log_odds = shifted
+        self.origin += np.array((dc, dr)) * self.resolution
+
+    def cells_of(self, x, y):
+        """Flat indices of the cells containing points (x, y), and which of
+        the points are on the grid at all."""
+        col = np.floor((x - self.origin[0]) / self.resolution + 0.5).astype(int)
+        row = np.floor((y - self.origin[1]) / self.resolution + 0.5).astype(int)
+        col += self.centre
+        row += self.centre
+        inside = (col >= 0) & (col < self.cells) & (row >= 0) & (row < self.cells)
+        return (row * self.cells + col, inside)
+
+    def integrate(self, pose, ranges, angle_min, angle_increment,
+                  range_min=0.0, range_max=np.inf):
+        """
+            Add a scan taken from pose (x, y, theta in the odometry frame,
+            the scanner at the robot's centre facing ahead). Each beam
+            clears the cells it passes and marks the one it ends in; beams
+            out of range_max clear the cells up to it; NaN and too short
+            beams are left out. A cell gets at most one update per scan.
+        """
+        (x, y, theta) = pose
+        r = ranges_array(ranges).astype(float)
+        angles = theta + angle_min + angle_increment * np.arange(len(r))
+        with np.errstate(invalid='ignore'):
+            valid = (r >= range_min)
+            hit = valid & (r <= range_max)
+        length = np.where(hit, r, min(range_max, self.steps[-1]))
+        length[~valid] = 0.0
+        (c, s) = (np.cos(angles), np.sin(angles))
+
+        # free space: every sample short of the end cell of each beam
+        steps = self.steps[:np.searchsorted(self.steps, length.max())]
+        free = steps < (length - 0.5 * self.resolution)[:, np.newaxis]
+        (cells, inside) = self.cells_of(x + c[:, np.newaxis] * steps,
+                                        y + s[:, np.newaxis] * steps)
+        cells = cells[free & inside]
+        self.log_odds.flat[cells] = self.log_odds.flat[cells] + LOG_ODDS_MISS
+
+        (cells, inside) = self.cells_of(x + c[hit] * r[hit], y + s[hit] * r[hit])
+        cells = cells[inside]
+        self.log_odds.flat[cells] = self.log_odds.flat[cells] + LOG_ODDS_HIT
+        np.clip(self.log_odds, -LOG_ODDS_LIMIT, LOG_ODDS_LIMIT,
+                out=self.log_odds)
+
+    def sector_distances(self, pose, sectors, empty=None):
+        """
+            Distance from pose to the nearest occupied cell in each sector.
+
+            sectors: (from, to) bearings for each sector, rad from the
+                robot's heading, counterclockwise
+            empty: the distance of a sector with nothing occupied in it;
+                by default, the radius of the grid
+        """
+        if empty is None:
+            empty = self.radius
+        (dx, dy) = self.occupied_points(pose).T
+        d = np.hypot(dx, dy)
+        bearing = np.arctan2(dy, dx)
+        result = np.empty(len(sectors))
+        for (k, (low, high)) in enumerate(sectors):
+            within = d[(bearing >= low) & (bearing < high)]
+            result[k] = within.min() if len(within) else empty
+        return result
+
+    def occupied_points(self, pose):
+        """Centres of the occupied cells as seen from pose, as (N, 2) x, y
+        in the robot frame."""
+        (x, y, theta) = pose
+        (rows, cols) = np.nonzero(self.log_odds > 0.0)
+        dx = (cols - self.centre) * self.resolution + self.origin[0] - x
+        dy = (rows - self.centre) * self.resolution + self.origin[1] - y
+        (c, s) = (np.cos(theta), np.sin(theta))
+        return np.array([c * dx + s * dy, c * dy - s * dx]).T.reshape(-1, 2)
+
+    def occupancy(self):
+        """The grid as nav_msgs/OccupancyGrid data: rows from the bottom,
+        percent likelihood of occupancy, -1 where unknown."""
+        percent = 100.0 / (1.0 + np.exp(-self.log_odds))
+        data = np.round(percent).astype(np.int8)
+        data[0.0 == self.log_odds] = -1
+        return data.ravel()
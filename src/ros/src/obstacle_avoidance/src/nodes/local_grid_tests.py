@@ -0,0 +1,99 @@
+""" Unit tests for the rolling local occupancy grid.
+"""
+import logging
+from math import pi
+import unittest
+
+import numpy as np
+
+from local_grid import LocalGrid
+import scan_sectors as ss
+
+FRONT = np.array([[-0.1, 0.1]])
+
+def wall_scan(distance, rays=41, fov=1.0):
+    """Ranges of a scanner facing a wall across its path; (ranges,
+    angle_min, angle_increment)."""
+    angles = np.linspace(-fov / 2.0, fov / 2.0, rays)
+    return (distance / np.cos(angles), -fov / 2.0, fov / (rays - 1))
+
+
+class LocalGridTests(unittest.TestCase):
+    def setUp(self):
+        self.grid = LocalGrid(4.0, 0.05)
+
+    def test_shape(self):
+        self.assertEqual(self.grid.log_odds.shape, (81, 81))
+        self.assertTrue((-1 == self.grid.occupancy()).all())
+
+    def test_wall_marked_and_path_cleared(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0))
+        d = self.grid.sector_distances((0.0, 0.0, 0.0), FRONT)
+        self.assertAlmostEqual(d[0], 1.0, delta=0.05)
+        row = self.grid.centre
+        self.assertTrue((self.grid.log_odds[row, row:row + 19] < 0.0).all())
+        self.assertTrue(self.grid.log_odds[row, row + 20] > 0.0)
+
+    def test_remembered_after_turning_away(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0))
+        # turned left: the wall is out of view, now on the right
+        self.grid.integrate((0.0, 0.0, pi / 2.0), *wall_scan(3.0))
+        right = self.grid.sector_distances((0.0, 0.0, pi / 2.0),
+                                           [(-pi / 2.0 - 0.1, -pi / 2.0 + 0.1)])
+        self.assertAlmostEqual(right[0], 1.0, delta=0.05)
+
+    def test_seen_through_is_forgotten(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0))
+        for i in range(5):
+            self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.5))
+        d = self.grid.sector_distances((0.0, 0.0, 0.0), FRONT)
+        self.assertAlmostEqual(d[0], 1.5, delta=0.05)
+
+    def test_occupied_points_in_robot_frame(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0, rays=3, fov=0.01))
+        # from a metre to the left, turned right
+        points = self.grid.occupied_points((0.0, 1.0, -pi / 2.0))
+        np.testing.assert_allclose(points, [(1.0, 1.0)], atol=0.05)
+
+    def test_recenter_keeps_world_position(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0))
+        before = self.grid.log_odds.copy()
+        self.grid.recenter(0.52, -0.1)
+        np.testing.assert_allclose(self.grid.origin, (0.5, -0.1))
+        np.testing.assert_array_equal(self.grid.log_odds[2:, :-10],
+                                      before[:-2, 10:])
+        d = self.grid.sector_distances((0.52, -0.1, 0.0), [(-0.3, 0.3)])
+        self.assertAlmostEqual(d[0], 0.5, delta=0.1)
+        # moving off the grid entirely forgets everything
+        self.grid.recenter(100.0, 0.0)
+        self.assertTrue((0.0 == self.grid.log_odds).all())
+
+    def test_invalid_beams(self):
+        (ranges, angle_min, increment) = wall_scan(1.0)
+        ranges[:] = np.nan
+        self.grid.integrate((0.0, 0.0, 0.0), ranges, angle_min, increment)
+        self.assertTrue((0.0 == self.grid.log_odds).all())
+        ranges[:] = np.inf
+        self.grid.integrate((0.0, 0.0, 0.0), ranges, angle_min, increment,
+                            0.45, 1.0)
+        d = self.grid.sector_distances((0.0, 0.0, 0.0), FRONT, empty=-1.0)
+        self.assertEqual(d[0], -1.0)
+        self.assertTrue((self.grid.log_odds < 0.0).any())
+
+    def test_avoider_sectors(self):
+        self.grid.integrate((0.0, 0.0, 0.0), *wall_scan(1.0))
+        bounds = ss.ScanSectors(ss.avoider_sectors()).bounds
+        (right, front, left) = self.grid.sector_distances((0.0, 0.0, 0.0),
+                                                          bounds)
+        self.assertAlmostEqual(front, 1.0, delta=0.05)
+        self.assertTrue(left > front and right > front)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,180 +7,150 @@ import time
 import numpy as np
 
 import rospy
-from std_msgs.msg import String
+from rospy.numpy_msg import numpy_msg
+from std_msgs.msg import Float32, String
 from imu_thing.msg import RazorImu
 from sensor_msgs.msg import LaserScan
 from geometry_msgs.msg import Twist
+from nav_msgs.msg import OccupancyGrid, Odometry
 
 from fuzzy import *
 from math import *
+from avoider_logic import AvoiderLogic
+import scan_sectors as ss
+from latest_message import LatestMessage
+import local_grid as lg
+import dwa
 
-UPDATE_RATE_Hz = 5
+# scans older than this when they would be acted on are skipped, s
+MAX_SCAN_AGE_s = 0.5
+# with a local grid, it is published after every this many scans
+GRID_PUBLISH_EVERY = 5
 
 class ObstacleAvoider(threading.Thread):
-
-    def __init__(self):
+    """Decides a cmd_vel for each new scan as soon as it arrives. If a scan
+    comes in while the last one is still being handled, the one before it
+    is dropped; scans that are too old by the time they would be acted on
+    are skipped. The delay from each scan's stamp to its cmd_vel is
+    published as a latency metric.
+
+    The decisions themselves are made by an AvoiderLogic. With a local
+    grid, scans are added to it as the robot moves, and the avoider steers
+    by the nearest remembered obstacle in each sector rather than by the
+    latest scan alone. With a dynamic window planner, that plans every
+    twist instead of the fuzzy rules, sliding sideways as well as
+    turning; with both, the planner keeps clear of everything the grid
+    remembers."""
+
+    def __init__(self, logic=None, max_scan_age=MAX_SCAN_AGE_s):
+        """logic: the AvoiderLogic to decide with, by default the fuzzy
+        rules on the mean distance in each sector.
+        max_scan_age: scans older than this, in s, are skipped."""
+        self.imu = LatestMessage()
+        self.scans = LatestMessage()
         self.imu_subscriber = rospy.Subscriber("/imuRaw", RazorImu, self.imu_callback)
-        self.scan_subscriber = rospy.Subscriber("/scan", LaserScan, self.scan_callback)
+        # numpy_msg deserializes the ranges straight into a float32 array
+        self.scan_subscriber = rospy.Subscriber("/scan", numpy_msg(LaserScan), self.scan_callback)
         self.publisher = rospy.Publisher("cmd_vel", Twist)
-        self.lock = threading.Lock()
+        self.latency_publisher = rospy.Publisher("~scan_to_cmd_latency", Float32)
         threading.Thread.__init__(self)
-        self.imu_data = None
-        self.scan_data = None
+        if logic is None:
+            logic = AvoiderLogic()
+        self.logic = logic
+        self.max_scan_age = max_scan_age
+        self.stale = 0
+        self.grid = logic.grid
+        if self.grid is not None:
+            self.odom = LatestMessage()
+            self.odom_subscriber = rospy.Subscriber("/odom", Odometry, self.odom.put)
+            self.grid_publisher = rospy.Publisher("~local_grid", OccupancyGrid)
+            self.grid_updates = 0
+        rospy.on_shutdown(self.stop)
+
+    def stop(self):
+        """Let the decision loop finish."""
+        self.imu.close()
+        self.scans.close()
 
     def run(self):
-        sleeper = rospy.Rate(UPDATE_RATE_Hz)
-
-        left_near = MembershipFunction( ((0.,1.), (1.,1.), (1.5,0.)) )
-        left_mid = MembershipFunction( ((1.,0.), (1.5,1.), (2.,1.), (2.5,0.)) )
-        left_far = MembershipFunction( ((2.,0.), (2.5,1.), (5.,1.)) )
-
-        front_near = MembershipFunction( ((0.,1.), (1.,1.), (2.,0.)) )
-        front_mid = MembershipFunction( ((1.,0.), (2.,1.), (3.,1.), (4.5,0.)) )
-        front_far = MembershipFunction( ((3.,0.), (4.5,1.),(6.,1.)) )
-
-        right_near = MembershipFunction( ((0.,1.), (1.,1.), (1.5,0.)) )
-        right_mid = MembershipFunction( ((1.,0.), (1.5,1.), (2.,1.), (2.5,0.)) )
-        right_far = MembershipFunction( ((2.,0.), (2.5,1.), (5.,1.)) )
-
-        output_turn_left = MembershipFunction( ((-pi/3., 1.), (-pi/4.5,1.), (-pi/5.,0.)) )
-        output_no_turn = MembershipFunction( ((-pi/4.5,0.), (-pi/5.,1.), (pi/5.,1.), (pi/4.5,0.)) )
-        output_turn_right = MembershipFunction( ((pi/5.,0.),(pi/4.5,1.),(pi/3.,1.)) )
-
-        heading_delta_right = MembershipFunction( ((-1., 1.), (-0.07,1.),(-0.03,0.)) )
-        heading_delta_front = MembershipFunction( ((-0.07,0.), (-0.03,1.), (0.03,1.), (0.07,0.)) )
-        heading_delta_left = MembershipFunction( ((0.03,0.),(0.07,1.),(1.,1.)) )
-
-        fuzz = Fuzzy()
-        fuzz.add_input_membership('left')
-        fuzz.add_input_membership_func('left','near', left_near)
-        fuzz.add_input_membership_func('left','mid', left_mid)
-        fuzz.add_input_membership_func('left','far', left_far)
-
-        fuzz.add_input_membership('front')
-        fuzz.add_input_membership_func('front','near', front_near)
-        fuzz.add_input_membership_func('front','mid', front_mid)
-        fuzz.add_input_membership_func('front','far', front_far)
-
-        fuzz.add_input_membership('right')
-        fuzz.add_input_membership_func('right','near', right_near)
-        fuzz.add_input_membership_func('right','mid', right_mid)
-        fuzz.add_input_membership_func('right','far', right_far)
-
-        fuzz.add_input_membership('heading_delta')
-        fuzz.add_input_membership_func('heading_delta','right',heading_delta_right)
-        fuzz.add_input_membership_func('heading_delta','front',heading_delta_front)
-        fuzz.add_input_membership_func('heading_delta','left',heading_delta_left)
-
-        old_angular = 0.0
-        delta_angular = 0.0
-        angular_scaling = 0.7
-        linear_rate = 0.15
-        distance_scaling = 1.0
-
         # Get heading
-        while not self.imu_data:
-            pass
-        rospy.logdebug("Got IMU data: %s" % self.imu_data)
-        initial_heading = self.imu_data.yaw
+        imu = self.imu.take()
+        if imu is None:
+            return
+        rospy.logdebug("Got IMU data: %s" % imu[0])
+        initial_heading = imu[0].yaw
         delta_heading = 0.0
 
         while not rospy.is_shutdown():
-            sleeper.sleep()
-            #msg = Twist()
-            #rospy.logdebug("Ding!")
-            if self.imu_data:
-                #rospy.logdebug("Got IMU data: %s" % self.imu_data)
-
-                delta_heading = initial_heading - self.imu_data.yaw
-                print "Initial: %s vs. current %s -- delta: %s" % (initial_heading, self.imu_data.yaw, delta_heading)
-                heading = fuzz.get_membership_for('heading_delta', delta_heading)
-            else:
-                heading = fuzz.get_membership_for('heading_delta',0.0)
-
-            if self.scan_data:
-                rospy.logdebug("Got Scan data:")
-                #rospy.logdebug("Scan.ranges size: %s" % len(self.scan_data.ranges))
-
-                scan = self.array_cleanup(self.scan_data.ranges)
-
-                # Dividing the laser scan data to left, front and right perception
-                # Scan data [right front left] (yes, it's flipped)
-                # Subject to parameter changes
-                #left_distance = np.mean(scan[380:])
-                #right_distance = np.mean(scan[:260])
-                #front_distance = np.mean(scan[260:380])
-                left_distance = np.mean(scan[120:])*distance_scaling
-                right_distance = np.mean(scan[:70])*distance_scaling
-                front_distance = np.mean(scan[70:120])*distance_scaling
-
-                left = fuzz.get_membership_for('left', left_distance)
-                right = fuzz.get_membership_for('right', right_distance)
-                front = fuzz.get_membership_for('front', front_distance)
-                
-
-                #print "Left: %s (Distance: %s)" % (left, left_distance)
-                #print "Right: %s (Distance: %s)" % (right, right_distance)
-                #print "Front: %s (Distance: %s)" % (front, front_distance)
-                #print "Heading offset: %s" % heading
-                
-                turn_right = fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['near'], left['near']))**2\
-                             + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['near'], left['mid']))**2\
-                             + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['mid'], left['near']))**2\
-                             + fuzzyAND(fuzzyNOT(right['near']), fuzzyAND(front['mid'], left['mid']))**2\
-                             + fuzzyAND(fuzzyNOT(right['near']), fuzzyNOT(left['far']))**2\
-                             + fuzzyAND(fuzzyNOT(right['near']), heading['left'])**2
-         
-                go_forward = fuzzyNOT(front['near'])**2\
-                             + fuzzyAND(fuzzyNOT(front['near']), fuzzyAND(left['near'],right['near']))**2\
-                             + fuzzyAND(fuzzyNOT(front['near']), fuzzyAND(left['near'], fuzzyNOT(right['near'])))**2\
-                             + fuzzyAND(fuzzyNOT(front['near']), heading['front'])**2
-                              
-                turn_left = fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['near'],front['near']))**2\
-                            + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['near'], front['mid']))**2\
-                            + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['mid'], front['near']))**2\
-                            + fuzzyAND(fuzzyNOT(left['near']), fuzzyAND(right['mid'], front['mid']))**2\
-                            + fuzzyAND(fuzzyNOT(left['near']), fuzzyNOT(right['far']))**2\
-                            + fuzzyAND(fuzzyNOT(left['near']), heading['right'])**2
-                                      
-                print "Turn_right: %s" % turn_right
-                print "Go_forward: %s" % go_forward
-                print "Turn_left: %s" % turn_left
-
-                if turn_right > 0.0 or turn_left > 0.0:
-                    output = (sqrt(turn_right)*(-pi/4.) + sqrt(go_forward)*0.0 + sqrt(turn_left)*(pi/4.))/(sqrt(turn_right) + sqrt(go_forward) + sqrt(turn_left))
-                else:
-                    output = 0.0
-
-                print "Output (turn degree): %s" % output
-
-                delta_angular = output - old_angular
-
-                msg = Twist()
-
-                #angular_z = delta_angular * angular_rate
-                angular_z = output * angular_scaling
-
-                if angular_z > 0.38:
-                    angular_z = 0.38
-
-                print "Angular_z: %s" % angular_z
-
-                msg.angular.z = angular_z
-
-                if go_forward > 1.0:
-                    go_forward = 1.0
-                msg.linear.x = go_forward * linear_rate
-
-                self.publisher.publish(msg)
-                old_angular = output
-            
-
+            taken = self.scans.take()
+            if taken is None:
+                break
+            (scan, received) = taken
+            # drivers that don't stamp their scans are timed from arrival
+            scan_stamp = scan.header.stamp.to_sec() or received
+            if rospy.get_time() - scan_stamp > self.max_scan_age:
+                self.stale += 1
+                rospy.logdebug("Skipping a scan %.3f s old (%d so far)" %
+                               (rospy.get_time() - scan_stamp, self.stale))
+                continue
+
+            imu_data = self.imu.peek()
+            delta_heading = initial_heading - imu_data.yaw
+            rospy.logdebug("Initial: %s vs. current %s -- delta: %s" %
+                           (initial_heading, imu_data.yaw, delta_heading))
+
+            pose = (0.0, 0.0, 0.0)
+            if self.grid is not None:
+                pose = self.odometry_pose()
+            twist = self.logic.decide(scan, delta_heading, scan_stamp, pose)
+            rospy.logdebug("Decided %s from %s" % (twist, self.logic.last))
+
+            msg = Twist()
+            (msg.linear.x, msg.linear.y, msg.angular.z) = [float(v) for v in twist]
+            self.publish(msg, scan_stamp)
+
+            if self.grid is not None:
+                self.grid_updates += 1
+                if 0 == self.grid_updates % GRID_PUBLISH_EVERY:
+                    self.publish_grid(scan.header.stamp)
+
+        rospy.loginfo("ObstacleAvoider: %d scans, %d dropped behind newer ones, %d stale" %
+                      (self.scans.received, self.scans.dropped, self.stale))
         rospy.loginfo("ObstacleAvoider ... kicking the bucket ... Agh! *CLANG!!!* *bucket kicked*")
 
+    def publish(self, msg, scan_stamp):
+        """Publish a cmd_vel, and how long after scan_stamp it went out."""
+        self.publisher.publish(msg)
+        self.latency_publisher.publish(Float32(rospy.get_time() - scan_stamp))
+
+    def odometry_pose(self):
+        """The latest pose on /odom as (x, y, theta); the origin until
+        there is one."""
+        odom = self.odom.peek()
+        if odom is None:
+            return (0.0, 0.0, 0.0)
+        pose = odom.pose.pose
+        return (pose.position.x, pose.position.y, lg.yaw_of(pose.orientation))
+
+    def publish_grid(self, stamp):
+        odom = self.odom.peek()
+        msg = OccupancyGrid()
+        msg.header.stamp = stamp
+        msg.header.frame_id = odom.header.frame_id if odom else "odom"
+        msg.info.map_load_time = stamp
+        msg.info.resolution = self.grid.resolution
+        msg.info.width = self.grid.cells
+        msg.info.height = self.grid.cells
+        # the corner of the first cell
+        corner = self.grid.origin - (self.grid.centre + 0.5) * self.grid.resolution
+        msg.info.origin.position.x = corner[0]
+        msg.info.origin.position.y = corner[1]
+        msg.info.origin.orientation.w = 1.0
+        msg.data = self.grid.occupancy().tolist()
+        self.grid_publisher.publish(msg)
+
     def imu_callback(self, data):
-        with self.lock:
-            self.imu_data = data
+        self.imu.put(data)
             #rospy.loginfo(self.imu_data.yaw)
         """ Imu data:
             float32 roll
@@ -189,9 +159,8 @@ class ObstacleAvoider(threading.Thread):
         """
 
     def scan_callback(self, data):
-        with self.lock:
-            self.scan_data = data
-            #rospy.loginfo("Data points: %s" % len(self.scan_data.ranges))
+        self.scans.put(data, rospy.get_time())
+        #rospy.loginfo("Data points: %s" % len(data.ranges))
         """ Scan data:
             uint32 seq
             time stamp
@@ -207,12 +176,30 @@ class ObstacleAvoider(threading.Thread):
             float32[] intensities
         """
 
-    def array_cleanup(self, data):
-        return [x if str(x) != "nan" else 0.0 for x in data]
-    
 def main(args):
     rospy.init_node("obstacle_avoidance_node", anonymous=True, log_level=rospy.DEBUG)
-    controller = ObstacleAvoider()
+    table = None
+    table_path = rospy.get_param('~lookup_table', '')
+    if table_path:
+        table = LookupTable.load(table_path)
+        rospy.loginfo("Using lookup table %s" % table_path)
+    sectors = ss.ScanSectors(
+        ss.avoider_sectors(rospy.get_param('~front_half_width',
+                                           ss.FRONT_HALF_WIDTH)),
+        rospy.get_param('~sector_statistic', ss.STAT_MEAN),
+        rospy.get_param('~sector_percentile', 10.0))
+    grid = None
+    if rospy.get_param('~local_grid', False):
+        grid = lg.LocalGrid(rospy.get_param('~local_grid_size', lg.DEFAULT_SIZE_m),
+                           rospy.get_param('~local_grid_resolution',
+                                           lg.DEFAULT_RESOLUTION_m))
+    planner = None
+    if 'dwa' == rospy.get_param('~planner', 'fuzzy'):
+        planner = dwa.DynamicWindow(
+            budget=dwa.SampleBudget(rospy.get_param('~dwa_budget_s', 0.02),
+                                    rospy.get_param('~dwa_samples', 343)))
+    controller = ObstacleAvoider(AvoiderLogic(table, sectors, grid, planner),
+                                 rospy.get_param('~max_scan_age', MAX_SCAN_AGE_s))
     controller.start()
     rospy.spin()
 
@@ -0,0 +1,101 @@
+"""
+    Reduces a laser scan to one distance per sector of the field of view,
+    e.g. the obstacle avoider's right, front and left. Sectors are given
+    as angles, so they mean the same thing whatever the scanner's
+    resolution. A scan is read only through its ranges, angles and range
+    limits, so recorded scans can be replayed as plain objects.
+"""
+from math import pi
+
+import numpy as np
+
+STAT_MEAN = 'mean'
+STAT_MIN = 'min'
+STAT_PERCENTILE = 'percentile'
+
+# Half the width of the avoider's front sector, rad; a little under a fifth
+# of a Kinect's field of view
+FRONT_HALF_WIDTH = 0.1
+
+def avoider_sectors(front_half_width=FRONT_HALF_WIDTH):
+    """The obstacle avoider's sectors as (name, from, to) in rad, angles
+    counterclockwise from straight ahead."""
+    return (('right', -pi, -front_half_width),
+            ('front', -front_half_width, front_half_width),
+            ('left', front_half_width, pi))
+
+def ranges_array(ranges):
+    """A scan's ranges as a float32 array. Ranges from a numpy_msg are that
+    already, and are returned without copying."""
+    return np.asarray(ranges, dtype=np.float32)
+
+
+class ScanSectors(object):
+    """
+        One statistic of the ranges in each sector of a scan. Ranges beyond
+        range_max, +inf among them (REP 117's "no return"), read as
+        range_max: nothing there as far as the scanner can see. Ranges that
+        are NaN or short of range_min are left out; a sector without any
+        range left gets empty.
+
+        Which rays fall in which sector is worked out once per scan
+        geometry (angle_min, angle_increment, number of rays) and reused.
+    """
+    def __init__(self, sectors, statistic=STAT_MEAN, percentile=10.0,
+                 empty=0.0):
+        """
+            sectors: (name, from, to) for each sector, in rad; a ray at
+                angle a is in the sector if from <= a < to
+            statistic: STAT_MEAN, STAT_MIN or STAT_PERCENTILE
+            percentile: which percentile STAT_PERCENTILE takes, 0 to 100
+            empty: the value of a sector without any range to go by
+        """
+        if statistic not in (STAT_MEAN, STAT_MIN, STAT_PERCENTILE):
+            raise ValueError("unknown sector statistic: " + str(statistic))
+        self.names = tuple(name for (name, low, high) in sectors)
+        self.bounds = np.array([(low, high) for (name, low, high) in sectors],
+                               dtype=float)
+        self.statistic = statistic
+        self.percentile = percentile
+        self.empty = empty
+        self.geometry = None
+        self.rays = None
+
+    def sector_rays(self, angle_min, angle_increment, count):
+        """Indices of the rays in each sector, for a scan of count rays."""
+        geometry = (angle_min, angle_increment, count)
+        if geometry != self.geometry:
+            angles = angle_min + angle_increment * np.arange(count)
+            self.rays = [np.flatnonzero((angles >= low) & (angles < high))
+                         for (low, high) in self.bounds]
+            self.geometry = geometry
+        return self.rays
+
+    def reduce(self, scan):
+        """The statistic of each sector of a LaserScan, in the order the
+        sectors were given."""
+        return self.reduce_ranges(scan.ranges, scan.angle_min,
+                                  scan.angle_increment, scan.range_min,
+                                  scan.range_max)
+
+    def reduce_ranges(self, ranges, angle_min, angle_increment,
+                      range_min=0.0, range_max=np.inf):
+        """As reduce, for the fields of a scan."""
+        r = np.minimum(ranges_array(ranges), range_max)
+        # comparisons with NaN are false, so this leaves NaN out as well
+        with np.errstate(invalid='ignore'):
+            valid = (r >= range_min)
+        result = np.empty(len(self.names))
+        result.fill(self.empty)
+        for (k, rays) in enumerate(self.sector_rays(angle_min,
+                                                    angle_increment, len(r))):
+            v = r[rays[valid[rays]]]
+            if 0 == len(v):
+                continue
+            if STAT_MEAN == self.statistic:
+                result[k] = v.mean(dtype=np.float64)
+            elif STAT_MIN == self.statistic:
+                result[k] = v.min()
+            else:
+                result[k] = np.percentile(v, self.percentile)
+        return result
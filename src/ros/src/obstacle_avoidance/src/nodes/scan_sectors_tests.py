@@ -0,0 +1,82 @@
+""" Unit tests for reducing laser scans to sectors.
+"""
+import logging
+from math import pi
+import unittest
+
+import numpy as np
+
+import scan_sectors as ss
+
+class Scan(object):
+    """The LaserScan fields that ScanSectors reads."""
+    def __init__(self, ranges, angle_min=-0.5, angle_max=0.5,
+                 range_min=0.45, range_max=10.0):
+        self.ranges = np.array(ranges, dtype=np.float32)
+        self.angle_min = angle_min
+        self.angle_increment = (angle_max - angle_min) / (len(ranges) - 1)
+        self.range_min = range_min
+        self.range_max = range_max
+
+
+class ScanSectorsTests(unittest.TestCase):
+    def test_sectors_by_angle(self):
+        # the same scene at two resolutions gives the same sectors
+        for rays in (11, 641):
+            angles = np.linspace(-0.5, 0.5, rays)
+            ranges = np.where(angles < -0.1, 1.0,
+                              np.where(angles >= 0.1, 3.0, 2.0))
+            sectors = ss.ScanSectors(ss.avoider_sectors())
+            np.testing.assert_allclose(sectors.reduce(Scan(ranges)),
+                                       (1.0, 2.0, 3.0))
+
+    def test_invalid_ranges_left_out(self):
+        ranges = [1.0, np.nan, 0.2, 2.0, 3.0]
+        sectors = ss.ScanSectors((('all', -pi, pi),))
+        self.assertAlmostEqual(sectors.reduce(Scan(ranges))[0], 2.0)
+
+    def test_no_return_reads_as_range_max(self):
+        ranges = [1.0, np.inf, 11.0, 4.0]
+        sectors = ss.ScanSectors((('all', -pi, pi),))
+        self.assertAlmostEqual(sectors.reduce(Scan(ranges))[0], 6.25)
+        scan = Scan([np.inf] * 11)
+        np.testing.assert_allclose(
+            ss.ScanSectors(ss.avoider_sectors()).reduce(scan), (10.0,) * 3)
+
+    def test_empty_sector(self):
+        sectors = ss.ScanSectors(ss.avoider_sectors(), empty=-1.0)
+        scan = Scan([np.nan] * 5 + [1.0] * 6)
+        np.testing.assert_allclose(sectors.reduce(scan), (-1.0, 1.0, 1.0))
+
+    def test_statistics(self):
+        ranges = np.arange(1.0, 12.0) / 2.0
+        scan = Scan(ranges)
+        self.assertEqual(ss.ScanSectors((('all', -1.0, 1.0),), ss.STAT_MIN)
+                         .reduce(scan)[0], 0.5)
+        self.assertAlmostEqual(
+            ss.ScanSectors((('all', -1.0, 1.0),), ss.STAT_PERCENTILE, 50.0)
+            .reduce(scan)[0], 3.0)
+        self.assertRaises(ValueError, ss.ScanSectors, (), 'median')
+
+    def test_geometry_cached(self):
+        sectors = ss.ScanSectors(ss.avoider_sectors())
+        sectors.reduce(Scan([1.0] * 11))
+        rays = sectors.rays
+        sectors.reduce(Scan([2.0] * 11))
+        self.assertTrue(rays is sectors.rays)
+        sectors.reduce(Scan([2.0] * 21))
+        self.assertFalse(rays is sectors.rays)
+
+    def test_no_copy(self):
+        ranges = np.ones(11, dtype=np.float32)
+        self.assertTrue(ss.ranges_array(ranges) is ranges)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
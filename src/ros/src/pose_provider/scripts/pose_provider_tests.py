@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+""" Unit tests for the pose_provider package's PoseCache and the pose
+    arithmetic around it.
+"""
+import logging
+import math
+import unittest
+
+import numpy as np
+
+import pose_provider as pp
+
+class PoseCacheTests(unittest.TestCase):
+    def test_ring_and_interpolation(self):
+        cache = pp.PoseCache(capacity=4)
+        self.assertEqual(cache.latest(), None)
+        self.assertEqual(cache.at(0.0), None)
+        for i in range(6):
+            self.assertTrue(cache.add(10.0 + i, (float(i), 2.0 * i, 0.0)))
+        # out of order: dropped
+        self.assertFalse(cache.add(14.5, (0.0, 0.0, 0.0)))
+        self.assertEqual(len(cache), 4)
+        self.assertEqual(cache.latest(), (15.0, (5.0, 10.0, 0.0)))
+        self.assertEqual(cache.at(11.5), None)
+        self.assertEqual(cache.at(15.5), None)
+        np.testing.assert_allclose(cache.at(12.0), (2.0, 4.0, 0.0))
+        np.testing.assert_allclose(cache.at(13.25), (3.25, 6.5, 0.0))
+        np.testing.assert_allclose(cache.at(15.0), (5.0, 10.0, 0.0))
+
+    def test_heading_short_way_round(self):
+        cache = pp.PoseCache()
+        cache.add(0.0, (0.0, 0.0, math.pi - 0.1))
+        cache.add(1.0, (0.0, 0.0, -math.pi + 0.1))
+        self.assertAlmostEqual(abs(cache.at(0.5)[2]), math.pi)
+
+    def test_plain_floats(self):
+        # numpy's would not survive yaml.safe_dump
+        cache = pp.PoseCache()
+        cache.add(1.0, (1.0, 2.0, 0.5))
+        cache.add(2.0, (2.0, 2.0, 0.5))
+        (stamp, pose) = cache.latest()
+        for v in (stamp,) + pose + cache.at(1.5) + \
+                pp.compose(pose, cache.at(1.5)):
+            self.assertEqual(type(v), float)
+
+
+class ChainTests(unittest.TestCase):
+    def test_chain(self):
+        (map_odom, odom_base) = (pp.PoseCache(), pp.PoseCache())
+        self.assertEqual(pp.chain(map_odom, odom_base, 0.0, 0.5), None)
+        odom_base.add(10.0, (1.0, 0.0, math.pi / 2))
+        # no map->odom yet
+        self.assertEqual(pp.chain(map_odom, odom_base, 10.1, 0.5), None)
+        map_odom.add(9.0, (2.0, 3.0, math.pi / 2))
+        # base newer than map->odom: its latest is used
+        (stamp, pose) = pp.chain(map_odom, odom_base, 10.1, 0.5)
+        self.assertEqual(stamp, 10.0)
+        np.testing.assert_allclose(pose, (2.0, 4.0, math.pi))
+        map_odom.add(11.0, (4.0, 3.0, math.pi / 2))
+        # interpolated at the base's stamp
+        np.testing.assert_allclose(
+            pp.chain(map_odom, odom_base, 10.1, 0.5)[1], (3.0, 4.0, math.pi))
+        # stale
+        self.assertEqual(pp.chain(map_odom, odom_base, 11.0, 0.5), None)
+
+    def test_yaw_of(self):
+        theta = 0.7
+        self.assertAlmostEqual(pp.yaw_of(0.0, 0.0, math.sin(theta / 2),
+                                         math.cos(theta / 2)), theta)
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
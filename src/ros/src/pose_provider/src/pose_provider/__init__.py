@@ -0,0 +1,5 @@
+"""The robot's pose from /tf, without waiting on a TransformListener:
+PoseCache and its helpers, free of ROS, and PoseProvider, which keeps
+them from a subscription (import it from pose_provider.provider)."""
+from pose_provider.cache import DEFAULT_CAPACITY, PoseCache, chain, \
+    compose, yaw_of
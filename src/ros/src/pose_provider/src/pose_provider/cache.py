@@ -0,0 +1,108 @@
+"""Recent poses of one frame in another, (x, y, theta) in the plane, kept
+by time so that they can be read at any moment between them. Needs no ROS;
+provider.py fills them from /tf."""
+import math
+import threading
+
+import numpy as np
+
+DEFAULT_CAPACITY = 64
+
+
+def compose(a, b):
+    """Pose b, given in the frame at pose a, in a's parent frame."""
+    (c, s) = (math.cos(a[2]), math.sin(a[2]))
+    return (float(a[0] + c * b[0] - s * b[1]),
+            float(a[1] + s * b[0] + c * b[1]),
+            math.atan2(math.sin(a[2] + b[2]), math.cos(a[2] + b[2])))
+
+
+def yaw_of(x, y, z, w):
+    """Heading (rad) of an orientation quaternion."""
+    return math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+
+class PoseCache(object):
+    """
+        The last capacity poses of a frame, one writer appending them in
+        order of stamp and any number of readers. Reads give plain floats,
+        not numpy's, so that poses can go straight into YAML.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.stamps = np.zeros(capacity)
+        self.poses = np.zeros((capacity, 3))
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def add(self, stamp, pose):
+        """Add pose (x, y, theta) at stamp (s). One older than the latest
+        is dropped; returns whether it was kept."""
+        with self.lock:
+            if self.count and stamp < self.stamps[(self.count - 1) %
+                                                  self.capacity]:
+                return False
+            self.stamps[self.count % self.capacity] = stamp
+            self.poses[self.count % self.capacity] = pose
+            self.count += 1
+            return True
+
+    def latest(self):
+        """(stamp, (x, y, theta)) of the latest pose, or None."""
+        with self.lock:
+            if not self.count:
+                return None
+            i = (self.count - 1) % self.capacity
+            return (float(self.stamps[i]),
+                    tuple(float(v) for v in self.poses[i]))
+
+    def at(self, stamp):
+        """
+            The pose at stamp, interpolated between the two around it, or
+            None if stamp is outside the poses kept.
+        """
+        with self.lock:
+            n = len(self)
+            if not n:
+                return None
+            order = np.arange(self.count - n, self.count) % self.capacity
+            stamps = self.stamps[order]
+            if stamp < stamps[0] or stamp > stamps[-1]:
+                return None
+            j = min(int(np.searchsorted(stamps, stamp)), n - 1)
+            i = max(j - 1, 0)
+            (a, b) = (self.poses[order[i]], self.poses[order[j]])
+            (t0, t1) = (stamps[i], stamps[j])
+        f = (stamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+        dtheta = math.atan2(math.sin(b[2] - a[2]), math.cos(b[2] - a[2]))
+        theta = a[2] + f * dtheta
+        return (float(a[0] + f * (b[0] - a[0])),
+                float(a[1] + f * (b[1] - a[1])),
+                math.atan2(math.sin(theta), math.cos(theta)))
+
+
+def chain(parent, child, now, max_age_s):
+    """
+        The latest pose of child's frame in parent's parent frame, e.g. of
+        base in map from map->odom and odom->base caches, or None if the
+        child's latest pose is older than max_age_s at now (s).
+
+        parent is read at the child's stamp where it has poses from then;
+        otherwise its latest is used, as it changes more slowly.
+    """
+    latest = child.latest()
+    if latest is None:
+        return None
+    (stamp, pose) = latest
+    if now - stamp > max_age_s:
+        return None
+    outer = parent.at(stamp)
+    if outer is None:
+        outer = parent.latest()
+        if outer is None:
+            return None
+        outer = outer[1]
+    return (stamp, compose(outer, pose))
@@ -0,0 +1,56 @@
+"""The robot's pose in the odom and map frames from one subscription to
+/tf, for nodes that want it now rather than waiting on a
+TransformListener."""
+import rospy
+from tf2_msgs.msg import TFMessage
+
+from pose_provider.cache import PoseCache, chain, yaw_of
+
+# poses older than this, s, are not given out
+DEFAULT_MAX_AGE_s = 0.5
+
+
+class PoseProvider(object):
+    """
+        Keeps the latest odom->base and map->odom transforms, as published
+        by the odometry and localization nodes, in PoseCaches. Reads don't
+        block: they return None if there is no pose fresher than max_age_s.
+    """
+    def __init__(self, base_frame='base_footprint', odom_frame='odom',
+                 map_frame='map', max_age_s=DEFAULT_MAX_AGE_s):
+        self.base_frame = base_frame.lstrip('/')
+        self.odom_frame = odom_frame.lstrip('/')
+        self.map_frame = map_frame.lstrip('/')
+        self.max_age_s = max_age_s
+        self.odom_base = PoseCache()
+        self.map_odom = PoseCache()
+        self.caches = {(self.odom_frame, self.base_frame): self.odom_base,
+                       (self.map_frame, self.odom_frame): self.map_odom}
+        self.subscriber = rospy.Subscriber('/tf', TFMessage, self.tf_callback,
+                                           queue_size=100)
+
+    def tf_callback(self, msg):
+        for t in msg.transforms:
+            cache = self.caches.get((t.header.frame_id.lstrip('/'),
+                                     t.child_frame_id.lstrip('/')))
+            if cache is None:
+                continue
+            (p, q) = (t.transform.translation, t.transform.rotation)
+            cache.add(t.header.stamp.to_sec(),
+                      (p.x, p.y, yaw_of(q.x, q.y, q.z, q.w)))
+
+    def odom_pose(self, max_age_s=None):
+        """(stamp, (x, y, theta)) of the base in the odom frame, or None."""
+        latest = self.odom_base.latest()
+        if latest is None or \
+           rospy.get_time() - latest[0] > self.max_age(max_age_s):
+            return None
+        return latest
+
+    def map_pose(self, max_age_s=None):
+        """(stamp, (x, y, theta)) of the base in the map frame, or None."""
+        return chain(self.map_odom, self.odom_base, rospy.get_time(),
+                     self.max_age(max_age_s))
+
+    def max_age(self, max_age_s):
+        return self.max_age_s if max_age_s is None else max_age_s
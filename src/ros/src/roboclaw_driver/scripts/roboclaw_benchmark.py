@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+""" Micro-benchmark for the RoboClaw query path. A FakeRoboClaw answers
+    packet-serial traffic on a pseudo-terminal, so the driver goes through
+    the same termios/pyserial code it uses on the robot, minus the wire.
+
+    Usage: roboclaw_benchmark.py [iterations]
+"""
+import functools
+import struct
+import sys
+import time
+
+import numpy
+
+import roboclaw_driver as rc
+from roboclaw_driver.fake import FakeRoboClaw
+
+
+def legacy_query(port, address, command):
+    """The factory code's query path: the address and command are written
+    separately, then every field and the checksum get their own read."""
+    port.write(struct.pack('>B', address))
+    port.write(struct.pack('>B', command))
+    total = address + command
+    fields = []
+    for code in rc.READ_COMMANDS[command][1]:
+        s = struct.Struct('>' + code)
+        data = port.read(s.size)
+        total += rc.checksum(data)
+        fields.append(s.unpack(data)[0])
+    crc = bytearray(port.read(1))
+    if crc and (total & 0x7F) == crc[0]:
+        return tuple(fields)
+    return None
+
+
+def time_calls(fn, iterations):
+    """Return per-call latencies of fn, in microseconds."""
+    latencies = numpy.empty(iterations)
+    for i in range(iterations):
+        start = time.time()
+        fn()
+        latencies[i] = (time.time() - start) * 1e6
+    return latencies
+
+
+def main(args):
+    iterations = int(args[1]) if len(args) > 1 else 2000
+    fake = FakeRoboClaw()
+    fake.start()
+    claw = rc.RoboClaw(fake.port_name, 38400)
+    queries = (('readM1speed', 18, claw.readM1speed),
+               ('readmainbattery', 24, claw.readmainbattery),
+               ('readM1pidq', 55, claw.readM1pidq),
+               ('readM1PositionConstants', 63, claw.readM1PositionConstants))
+    print('%-24s %12s %12s %12s %12s' % ('query', 'legacy p50', 'legacy mean',
+                                         'single p50', 'single mean'))
+    for (name, command, method) in queries:
+        legacy = time_calls(
+            functools.partial(legacy_query, claw.port, 128, command),
+            iterations)
+        single = time_calls(method, iterations)
+        print('%-24s %10.1fus %10.1fus %10.1fus %10.1fus' % (
+            name, numpy.median(legacy), numpy.mean(legacy),
+            numpy.median(single), numpy.mean(single)))
+    claw.port.close()
+    fake.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+""" Unit tests for the roboclaw_driver package: packet framing, the
+    RoboClaw class talking to a FakeRoboClaw on a pty, and the bus scheduler.
+"""
+import logging
+import os
+import struct
+import time
+import unittest
+
+import roboclaw_driver as rc
+from roboclaw_driver.fake import FakeRoboClaw, FAKE_RESPONSES
+import roboclaw_benchmark as bench
+
+class PacketEncoderTests(unittest.TestCase):
+    def setUp(self):
+        self.encoder = rc.PacketEncoder()
+
+    def test_mixed_speed_accel_frame(self):
+        frame = self.encoder.encode(128, 40, 250, 500, -500)
+        body = struct.pack('>BBLll', 128, 40, 250, 500, -500)
+        self.assertEqual(len(frame), len(body) + 1)
+        self.assertEqual(frame[:-1], body)
+
+        # the factory code summed every field into the checksum; the
+        # frame must end with the same 7-bit value
+        total = 128 + 40
+        for val in (250, 500, -500):
+            total += val
+            total += (val >> 8) & 0xFF
+            total += (val >> 16) & 0xFF
+            total += (val >> 24) & 0xFF
+        self.assertEqual(bytearray(frame)[-1], total & 0x7F)
+
+    def test_command_without_payload(self):
+        frame = self.encoder.encode(128, 20)
+        self.assertEqual(bytearray(frame), bytearray([128, 20, (128 + 20) & 0x7F]))
+
+    def test_out_of_range_argument(self):
+        self.assertRaises(struct.error, self.encoder.encode, 128, 0, 256)
+
+    def test_unknown_command(self):
+        self.assertRaises(KeyError, self.encoder.encode, 128, 16)
+
+
+class PacketDecoderTests(unittest.TestCase):
+    def setUp(self):
+        self.decoder = rc.PacketDecoder()
+
+    def test_decode_speed(self):
+        payload = struct.pack('>lB', -500, 1)
+        crc = (128 + 18 + sum(bytearray(payload))) & 0x7F
+        data = payload + struct.pack('>B', crc)
+        self.assertEqual(self.decoder.size(18), len(data))
+        self.assertEqual(self.decoder.decode(128, 18, data), (-500, 1))
+
+        # checksum covers the address too
+        self.assertEqual(self.decoder.decode(129, 18, data), None)
+
+    def test_short_response(self):
+        self.assertEqual(self.decoder.decode(128, 55, b'\x00' * 4), None)
+
+
+class RoboClawPtyTests(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeRoboClaw()
+        self.fake.start()
+        self.claw = rc.RoboClaw(self.fake.port_name, 38400,
+                                profile=rc.VelocityPidProfile(3336))
+
+    def tearDown(self):
+        self.claw.port.close()
+        self.fake.close()
+
+    def test_queries(self):
+        self.assertEqual(self.claw.readM2speed(), (-500, 1))
+        self.assertEqual(self.claw.readmainbattery(), 120)
+        self.assertEqual(self.claw.readM1pidq(),
+                         FAKE_RESPONSES[55])
+        self.assertEqual(self.claw.readM1PositionConstants(),
+                         (1, 2, 3, 4, 5, 6, 7))
+
+    def test_bad_checksum(self):
+        self.fake.corrupt = True
+        self.assertEqual(self.claw.readM1speed(), (-1, -1))
+        self.assertEqual(self.claw.readtemperature(), -1)
+
+    def test_stray_byte(self):
+        # line noise ahead of an answer throws that answer away, but not
+        # the next one
+        os.write(self.fake.master, b'\x00')
+        time.sleep(0.05)
+        self.claw.sendquery(18)
+        self.assertEqual(self.claw.readresponse(18, None), None)
+        self.assertEqual(self.claw.readM2speed(), (-500, 1))
+
+    def test_shared_port(self):
+        # a second controller on the same bus reuses the open port
+        rear = rc.RoboClaw(self.claw.port, address=129)
+        self.assertEqual(rear.readM1speed(), (500, 0))
+        rear.close()
+        self.assertTrue(self.claw.port.isOpen())
+
+    def test_legacy_query_agrees(self):
+        for command in rc.READ_COMMANDS:
+            self.assertEqual(
+                bench.legacy_query(self.claw.port, 128, command),
+                rc.PACKET_DECODER.decode(
+                    128, command, self.fake.response(128, command)))
+
+
+class RoboClawAddressTests(unittest.TestCase):
+    def test_address_out_of_range(self):
+        self.assertRaises(ValueError, rc.RoboClaw, None, address=127)
+        self.assertRaises(ValueError, rc.RoboClaw, None, address=136)
+
+    def test_commands_use_address(self):
+        port = RecordingPort()
+        claw = rc.RoboClaw(port, address=130)
+        claw.SetMixedSpeedAccel(250, 500, -500)
+        self.assertEqual(port.writes,
+                         [rc.PACKET_ENCODER.encode(130, 40, 250, 500, -500)])
+
+
+class BusSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.sims = [rc.RoboClawSim(address=128), rc.RoboClawSim(address=129)]
+        self.bus = rc.SimulatedBus(self.sims)
+        self.claws = [rc.RoboClaw(self.bus, address=sim.address)
+                      for sim in self.sims]
+        self.samples = []
+        # front M1, rear M1, rear M2, front M2: one wheel per slot
+        self.scheduler = rc.BusScheduler(
+            self.claws,
+            [(128, 'readM1speed'), (129, 'readM1speed'),
+             (129, 'readM2speed'), (128, 'readM2speed')],
+            0.005, self.record)
+
+    def record(self, address, method, result, stamp):
+        self.samples.append((address, method, result))
+
+    def test_simulated_bus_round_trip(self):
+        self.claws[1].SetMixedSpeedAccel(250, 300, -300)
+        self.assertEqual(self.sims[1].M1Speed, 300)
+        self.assertEqual(self.sims[0].M1Speed, 0)
+        self.assertEqual(self.claws[1].readM2speed(), (-300, 0))
+        # the simulator can't answer with negative unsigned gains
+        self.assertEqual(self.claws[0].readM1pidq(), (-1, -1, -1, -1))
+
+    def test_commands_go_before_polls(self):
+        self.scheduler.submit(129, 'SetMixedSpeedAccel', (250, 300, -300))
+        self.scheduler.submit(128, 'SetMixedSpeedAccel', (250, 100, -100))
+        self.scheduler.step()
+        self.assertEqual(self.bus.frames, [(129, 40), (128, 40), (128, 18)])
+        self.assertEqual(self.samples, [(128, 'readM1speed', (100, 0))])
+
+    def test_latest_command_wins(self):
+        for speed in (100, 200, 300):
+            self.scheduler.submit(128, 'SetMixedSpeedAccel',
+                                  (250, speed, speed))
+        self.scheduler.step()
+        self.assertEqual(self.bus.frames.count((128, 40)), 1)
+        self.assertEqual(self.sims[0].M1Speed, 300)
+
+    def test_telemetry_requests_wait_for_free_slot(self):
+        results = []
+        self.scheduler.submit(128, 'readmainbattery',
+                              priority=rc.PRIORITY_TELEMETRY,
+                              callback=results.append)
+        self.scheduler.submit(129, 'readtemperature',
+                              priority=rc.PRIORITY_TELEMETRY,
+                              callback=results.append)
+        self.scheduler.step()
+        # one per slot, after the scheduled poll; the simulator doesn't
+        # know these, so the driver's failure value comes back
+        self.assertEqual(results, [-1])
+        self.assertEqual(self.bus.frames, [(128, 18), (128, 24)])
+
+    def test_poll_rates_are_fixed(self):
+        for i in range(40):
+            self.scheduler.submit(128 + i % 2, 'SetMixedSpeedAccel',
+                                  (250, i, -i))
+            self.scheduler.step()
+        counts = {}
+        for (address, method, result) in self.samples:
+            counts[(address, method)] = counts.get((address, method), 0) + 1
+        self.assertEqual(sorted(counts.values()), [10, 10, 10, 10])
+        self.assertEqual(self.samples[-1], (128, 'readM2speed', (-38, 0)))
+
+    def test_failed_call_is_skipped(self):
+        # an acceleration that doesn't fit its field raises struct.error
+        self.scheduler.submit(128, 'SetMixedSpeedAccel', (-1, 100, 100))
+        self.scheduler.submit(129, 'SetMixedSpeedAccel', (250, 300, -300))
+        self.scheduler.step()
+        self.assertEqual(self.sims[1].M1Speed, 300)
+        self.assertEqual(self.samples, [(128, 'readM1speed', (0, 0))])
+
+    def test_replaced_callbacks_are_called(self):
+        results = []
+        for name in ('first', 'second'):
+            self.scheduler.submit(
+                128, 'readmainbattery', priority=rc.PRIORITY_TELEMETRY,
+                callback=lambda result, name=name: results.append(name))
+        self.scheduler.step()
+        self.assertEqual(results, ['first', 'second'])
+        self.assertEqual(self.bus.frames.count((128, 24)), 1)
+
+    def test_resubmit_with_new_priority(self):
+        self.scheduler.submit(129, 'SetMixedSpeedAccel', (250, 100, 100),
+                              priority=rc.PRIORITY_TELEMETRY)
+        self.scheduler.submit(128, 'readmainbattery',
+                              priority=rc.PRIORITY_TELEMETRY)
+        # now urgent: it goes out with the commands, ahead of the poll
+        self.scheduler.submit(129, 'SetMixedSpeedAccel', (250, 200, 200))
+        self.scheduler.step()
+        self.assertEqual(self.bus.frames, [(129, 40), (128, 18), (128, 24)])
+        self.assertEqual(self.sims[1].M1Speed, 200)
+        self.assertEqual(self.scheduler.take(), [])
+
+    def test_unknown_address(self):
+        self.assertRaises(KeyError, self.scheduler.submit, 130, 'readM1speed')
+        self.assertRaises(KeyError, rc.BusScheduler, self.claws,
+                          [(131, 'readM1speed')], 0.005)
+
+    def test_run(self):
+        self.scheduler.start()
+        self.scheduler.submit(129, 'SetMixedSpeedAccel', (250, 300, -300))
+        time.sleep(0.1)
+        self.scheduler.quit = True
+        self.scheduler.join()
+        self.assertEqual(self.sims[1].M1Speed, 300)
+        self.assertTrue(self.scheduler.slot > 4)
+        self.assertIn((129, 'readM2speed', (-300, 0)), self.samples)
+
+
+class RecordingPort(object):
+    """Port stand-in that records writes and never answers."""
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+        return len(data)
+
+    def read(self, n):
+        return b''
+
+
+def main():
+    """Run all tests."""
+    logging.basicConfig(level=logging.INFO)
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
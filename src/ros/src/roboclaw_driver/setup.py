@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+# ! DO NOT MANUALLY INVOKE THIS setup.py, USE CATKIN INSTEAD
+from distutils.core import setup
+from catkin_pkg.python_setup import generate_distutils_setup
+
+setup_args = generate_distutils_setup(
+    packages=['roboclaw_driver'],
+    package_dir={'': 'src'})
+
+setup(**setup_args)
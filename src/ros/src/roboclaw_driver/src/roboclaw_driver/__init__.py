@@ -0,0 +1,9 @@
+"""Shared driver for the Orion Robotics RoboClaw motor controllers on the
+base and the waist."""
+from roboclaw_driver.protocol import READ_COMMANDS, WRITE_COMMANDS, \
+    QUERY_HEADER, PACKET_DECODER, PACKET_ENCODER, PacketDecoder, \
+    PacketEncoder, checksum
+from roboclaw_driver.roboclaw import DEFAULT_ADDRESS, MIN_ADDRESS, \
+    MAX_ADDRESS, PlainProfile, RoboClaw, RoboClawSim, VelocityPidProfile
+from roboclaw_driver.bus import PRIORITY_COMMAND, PRIORITY_TELEMETRY, \
+    BusScheduler, SimulatedBus
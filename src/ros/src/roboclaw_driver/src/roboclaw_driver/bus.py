@@ -0,0 +1,223 @@
+"""Several RoboClaws on one packet-serial port: a time-slotted scheduler that
+drives them, and a simulated multi-drop bus to test it against."""
+import heapq
+import logging
+import struct
+import threading
+import time
+
+from roboclaw_driver.protocol import PACKET_ENCODER, READ_COMMANDS, \
+    WRITE_COMMANDS, checksum
+
+# lower numbers are sent first
+PRIORITY_COMMAND = 0
+PRIORITY_TELEMETRY = 1
+
+
+class BusScheduler(threading.Thread):
+    """Drives several RoboClaws that share one packet-serial port.
+
+    Time is cut into fixed slots. Each slot starts by sending every pending
+    motor command, then runs one telemetry poll taken round-robin from a
+    fixed schedule, then at most one queued request of lower priority. A
+    poll listed once in a schedule of n slots therefore runs at exactly
+    1 / (n * slot_period_s) Hz, however much command traffic there is, and
+    a command never waits longer than one slot.
+
+    Commands to the same method of the same controller are coalesced: a
+    newer command replaces one that hasn't been sent yet, and keeps its
+    place in the queue unless it comes with another priority. The callbacks
+    of both are called with the result of the one that is sent.
+
+    A call that raises is logged and skipped, so that one controller's
+    trouble doesn't stop the others.
+    """
+
+    def __init__(self, claws, schedule, slot_period_s,
+                 telemetry_callback=None):
+        """
+        :param claws: RoboClaw instances sharing one port, each at its own
+            address.
+        :param schedule: sequence of (address, method name) telemetry
+            polls, one per slot. A None entry leaves its slot free for
+            queued requests.
+        :param slot_period_s: slot length, in seconds. It must cover one
+            burst of commands plus one poll at the bus's baud rate.
+        :param telemetry_callback: called as f(address, method, result,
+            stamp) with the result of every scheduled poll.
+        """
+        self.claws = dict((claw.address, claw) for claw in claws)
+        for entry in schedule:
+            if entry is not None and entry[0] not in self.claws:
+                raise KeyError("no RoboClaw at address %d" % entry[0])
+        self.schedule = list(schedule)
+        self.slot_period_s = slot_period_s
+        self.telemetry_callback = telemetry_callback
+        self.lock = threading.Lock()
+        # heap of (priority, sequence, key); an entry whose sequence isn't
+        # the one pending for its key has been superseded
+        self.queue = []
+        self.pending = {}   # key -> (priority, sequence, args, callbacks)
+        self.sequence = 0
+        self.slot = 0
+        self.overruns = 0
+        self.quit = False
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def submit(self, address, method, args=(), priority=PRIORITY_COMMAND,
+               callback=None):
+        """Queue a call of RoboClaw method (a name, e.g. 'SetMixedSpeedAccel')
+        on the controller at address. If callback is given, it is called
+        with the method's return value once the call has been made."""
+        if address not in self.claws:
+            raise KeyError("no RoboClaw at address %d" % address)
+        key = (address, method)
+        callbacks = [] if callback is None else [callback]
+        with self.lock:
+            if key in self.pending:
+                (queued, sequence, _, earlier) = self.pending[key]
+                callbacks = earlier + callbacks
+                if queued == priority:
+                    self.pending[key] = (priority, sequence, args, callbacks)
+                    return
+            heapq.heappush(self.queue, (priority, self.sequence, key))
+            self.pending[key] = (priority, self.sequence, args, callbacks)
+            self.sequence += 1
+
+    def step(self):
+        """Run one slot without waiting for it to start."""
+        for request in self.take(max_priority=PRIORITY_COMMAND):
+            self.call(*request)
+        if self.schedule:
+            entry = self.schedule[self.slot % len(self.schedule)]
+            if entry is not None:
+                (address, method) = entry
+                result = self.call(entry, ())
+                if self.telemetry_callback is not None:
+                    notify(self.telemetry_callback, address, method, result,
+                           time.time())
+        for request in self.take(limit=1):
+            self.call(*request)
+        self.slot += 1
+
+    def run(self):
+        next_slot = time.time()
+        while not self.quit:
+            self.step()
+            next_slot += self.slot_period_s
+            delay = next_slot - time.time()
+            if delay > 0.0:
+                time.sleep(delay)
+            else:
+                # restart the slot grid rather than bursting to catch up
+                self.overruns += 1
+                next_slot = time.time()
+        logging.info("BusScheduler: exiting.")
+
+    def take(self, max_priority=None, limit=None):
+        """Pop queued requests, most urgent first."""
+        taken = []
+        with self.lock:
+            while self.queue and (limit is None or len(taken) < limit):
+                (priority, sequence, key) = self.queue[0]
+                if self.pending.get(key, (None, None))[1] != sequence:
+                    heapq.heappop(self.queue)
+                    continue
+                if max_priority is not None and priority > max_priority:
+                    break
+                heapq.heappop(self.queue)
+                (_, _, args, callbacks) = self.pending.pop(key)
+                taken.append((key, args, callbacks))
+        return taken
+
+    def call(self, key, args, callbacks=()):
+        (address, method) = key
+        try:
+            result = getattr(self.claws[address], method)(*args)
+        except Exception as e:
+            logging.error("BusScheduler: %s at address %d failed: %s" %
+                          (method, address, e))
+            return None
+        for callback in callbacks:
+            notify(callback, result)
+        return result
+
+
+def notify(callback, *args):
+    """Call a caller's callback; if it raises, log it and carry on."""
+    try:
+        callback(*args)
+    except Exception:
+        logging.exception("BusScheduler: callback failed")
+
+
+class SimulatedBus(object):
+    """A multi-drop packet-serial bus of RoboClawSim controllers, with the
+    read/write interface of a serial port. Frames are decoded and handed to
+    the simulator at the frame's address. Frames for absent controllers,
+    with bad checksums, or for methods the simulator lacks get no reaction
+    and no answer, as on a real bus."""
+
+    def __init__(self, sims):
+        self.sims = dict((sim.address, sim) for sim in sims)
+        self.incoming = bytearray()
+        self.outgoing = bytearray()
+        self.frames = []    # (address, command) of every frame seen
+
+    def write(self, data):
+        self.incoming += bytearray(data)
+        while self.dispatch():
+            pass
+        return len(data)
+
+    def read(self, size):
+        data = bytes(self.outgoing[:size])
+        del self.outgoing[:size]
+        return data
+
+    def reset_input_buffer(self):
+        del self.outgoing[:]
+
+    def dispatch(self):
+        """Handle the frame at the head of the incoming bytes. Returns False
+        if there is no complete frame yet."""
+        if len(self.incoming) < 2:
+            return False
+        (address, command) = (self.incoming[0], self.incoming[1])
+        if command in WRITE_COMMANDS:
+            s = PACKET_ENCODER.structs[command]
+            if len(self.incoming) < s.size + 1:
+                return False
+            frame = bytes(self.incoming[:s.size + 1])
+            del self.incoming[:s.size + 1]
+            self.frames.append((address, command))
+            if checksum(frame[:-1]) == bytearray(frame)[-1]:
+                self.call(address, WRITE_COMMANDS[command][0],
+                          s.unpack_from(frame)[2:])
+        else:
+            del self.incoming[:2]
+            self.frames.append((address, command))
+            if command in READ_COMMANDS:
+                (name, fmt) = READ_COMMANDS[command]
+                self.answer(address, command, fmt,
+                            self.call(address, name, ()))
+        return True
+
+    def call(self, address, name, args):
+        method = getattr(self.sims.get(address), name, None)
+        if method is None:
+            return None
+        return method(*args)
+
+    def answer(self, address, command, fmt, result):
+        if result is None:
+            return
+        try:
+            payload = struct.pack('>' + fmt, *result)
+        except struct.error:
+            # e.g. the simulator's (-1, ...) "don't know" for unsigned fields
+            return
+        crc = (address + command + checksum(payload)) & 0x7F
+        self.outgoing += bytearray(payload)
+        self.outgoing.append(crc)
@@ -0,0 +1,84 @@
+"""A fake RoboClaw that speaks packet serial on a pseudo-terminal, for tests
+and benchmarks that should exercise the real termios/pyserial path."""
+import os
+import pty
+import select
+import struct
+import threading
+import tty
+
+from roboclaw_driver.protocol import PACKET_ENCODER, READ_COMMANDS, \
+    WRITE_COMMANDS, checksum
+
+# canned response fields, keyed by read command number
+FAKE_RESPONSES = {
+    16: (1000, 0),
+    17: (-1000, 0),
+    18: (500, 0),
+    19: (-500, 1),
+    24: (120,),
+    25: (50,),
+    30: (4, 0),
+    31: (-4, 1),
+    47: (0, 0),
+    49: (100, 120),
+    55: (0x10000, 0x8000, 0x4000, 3336),
+    56: (0x10000, 0x8000, 0x4000, 3336),
+    59: (60, 170),
+    60: (60, 170),
+    63: (1, 2, 3, 4, 5, 6, 7),
+    64: (1, 2, 3, 4, 5, 6, 7),
+    82: (250,),
+    90: (0,),
+}
+VERSION = 'FakeRoboClaw 1.0\n'
+
+
+class FakeRoboClaw(threading.Thread):
+    """Emulates a RoboClaw on the master side of a pty. Write commands are
+    consumed and discarded, read commands are answered from FAKE_RESPONSES.
+    Open port_name with RoboClaw to talk to it."""
+
+    def __init__(self, responses=FAKE_RESPONSES):
+        self.responses = dict(responses)
+        self.corrupt = False
+        self.quit = False
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def close(self):
+        self.quit = True
+        self.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def run(self):
+        while not self.quit:
+            (ready, _, _) = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            (address, command) = bytearray(self.read(2))
+            if command in WRITE_COMMANDS:
+                # payload and checksum; the header is already consumed
+                self.read(PACKET_ENCODER.structs[command].size - 1)
+            elif command in READ_COMMANDS:
+                os.write(self.master, self.response(address, command))
+            elif command == 21:
+                os.write(self.master, VERSION.ljust(32, '\0'))
+
+    def read(self, n):
+        data = b''
+        while len(data) < n:
+            data += os.read(self.master, n - len(data))
+        return data
+
+    def response(self, address, command):
+        payload = struct.pack('>' + READ_COMMANDS[command][1],
+                              *self.responses[command])
+        crc = (address + command + checksum(payload)) & 0x7F
+        if self.corrupt:
+            crc ^= 0x01
+        return payload + struct.pack('>B', crc)
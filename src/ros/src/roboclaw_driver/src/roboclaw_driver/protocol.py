@@ -0,0 +1,133 @@
+"""Packet-serial framing for Orion Robotics RoboClaw motor controllers."""
+import struct
+
+# Method names and payload formats of the packet-serial write commands,
+# keyed by command number. Fields are big-endian and follow the address and
+# command bytes; the frame ends with a 7-bit checksum. See the "Packet Serial"
+# section of docs/hardware/roboclaw_user_manual.pdf.
+WRITE_COMMANDS = {
+    0: ('M1Forward', 'B'),
+    1: ('M1Backward', 'B'),
+    2: ('SetMinMainBattery', 'B'),
+    3: ('SetMaxMainBattery', 'B'),
+    4: ('M2Forward', 'B'),
+    5: ('M2Backward', 'B'),
+    6: ('DriveM1', 'B'),
+    7: ('DriveM2', 'B'),
+    8: ('ForwardMixed', 'B'),
+    9: ('BackwardMixed', 'B'),
+    10: ('RightMixed', 'B'),
+    11: ('LeftMixed', 'B'),
+    12: ('DriveMixed', 'B'),
+    13: ('TurnMixed', 'B'),
+    20: ('ResetEncoderCnts', ''),
+    28: ('SetM1pidq', 'LLLL'),                    # d, p, i, qpps
+    29: ('SetM2pidq', 'LLLL'),                    # d, p, i, qpps
+    32: ('SetM1Duty', 'h'),
+    33: ('SetM2Duty', 'h'),
+    34: ('SetMixedDuty', 'hh'),
+    35: ('SetM1Speed', 'l'),
+    36: ('SetM2Speed', 'l'),
+    37: ('SetMixedSpeed', 'll'),
+    38: ('SetM1SpeedAccel', 'Ll'),
+    39: ('SetM2SpeedAccel', 'Ll'),
+    40: ('SetMixedSpeedAccel', 'Lll'),
+    41: ('SetM1SpeedDistance', 'lLB'),
+    42: ('SetM2SpeedDistance', 'lLB'),
+    43: ('SetMixedSpeedDistance', 'lLlLB'),
+    44: ('SetM1SpeedAccelDistance', 'LlLB'),
+    45: ('SetM2SpeedAccelDistance', 'LlLB'),
+    46: ('SetMixedSpeedAccelDistance', 'LlLlLB'),
+    50: ('SetMixedSpeedIAccel', 'LlLl'),
+    51: ('SetMixedSpeedIAccelDistance', 'LlLLlLB'),
+    52: ('SetM1DutyAccel', 'hH'),                 # duty, accel
+    53: ('SetM2DutyAccel', 'hH'),                 # duty, accel
+    54: ('SetMixedDutyAccel', 'hHhH'),
+    61: ('SetM1PositionConstants', 'LLLLLLL'),    # d, p, i, imax, deadzone, min, max
+    62: ('SetM2PositionConstants', 'LLLLLLL'),
+    65: ('SetM1SpeedAccelDeccelPosition', 'LLLLB'),
+    66: ('SetM2SpeedAccelDeccelPosition', 'LLLLB'),
+    67: ('SetMixedSpeedAccelDeccelPosition', 'LLLLLLLLB'),
+}
+
+# Method names and response formats of the packet-serial read commands, keyed
+# by command number. Every response is followed by a 7-bit checksum over the
+# address, the command and the response bytes.
+READ_COMMANDS = {
+    16: ('readM1encoder', 'lB'),                  # count, status
+    17: ('readM2encoder', 'lB'),
+    18: ('readM1speed', 'lB'),                    # speed, direction
+    19: ('readM2speed', 'lB'),
+    24: ('readmainbattery', 'H'),
+    25: ('readlogicbattery', 'H'),
+    30: ('readM1instspeed', 'lB'),
+    31: ('readM2instspeed', 'lB'),
+    47: ('readbuffercnts', 'BB'),
+    49: ('readcurrents', 'HH'),
+    55: ('readM1pidq', 'LLLL'),                   # p, i, d, qpps
+    56: ('readM2pidq', 'LLLL'),
+    59: ('readmainbatterysettings', 'HH'),        # min, max
+    60: ('readlogicbatterysettings', 'HH'),
+    63: ('readM1PositionConstants', 'LLLLLLL'),   # p, i, d, imax, deadzone, min, max
+    64: ('readM2PositionConstants', 'LLLLLLL'),
+    82: ('readtemperature', 'H'),
+    90: ('readerrorstate', 'B'),
+}
+
+QUERY_HEADER = struct.Struct('>BB')
+
+
+def checksum(data):
+    """Return the 7-bit RoboClaw checksum of a sequence of bytes."""
+    return sum(bytearray(data)) & 0x7F
+
+
+class PacketEncoder(object):
+    """Builds complete packet-serial frames (address, command, payload,
+    checksum) from precompiled struct formats, so that a command can be sent
+    to the RoboClaw with a single write."""
+
+    def __init__(self, formats=WRITE_COMMANDS):
+        self.structs = dict((command, struct.Struct('>BB' + fmt))
+                            for command, (name, fmt) in formats.items())
+
+    def encode(self, address, command, *args):
+        """Return the frame for a write command as a byte string.
+
+        Raises:
+            KeyError, if the command is not a known write command.
+            struct.error, if an argument does not fit its field.
+        """
+        s = self.structs[command]
+        frame = bytearray(s.size + 1)
+        s.pack_into(frame, 0, address, command, *args)
+        frame[-1] = checksum(frame)
+        return bytes(frame)
+
+
+class PacketDecoder(object):
+    """Unpacks whole RoboClaw responses with precompiled struct formats, so
+    that a query costs one read and one checksum test."""
+
+    def __init__(self, formats=READ_COMMANDS):
+        self.structs = dict((command, struct.Struct('>' + fmt + 'B'))
+                            for command, (name, fmt) in formats.items())
+
+    def size(self, command):
+        """Return the length in bytes of the response to a read command,
+        including its checksum."""
+        return self.structs[command].size
+
+    def decode(self, address, command, data):
+        """Return the tuple of response fields, or None if data is short or
+        its checksum doesn't match."""
+        s = self.structs[command]
+        if len(data) != s.size:
+            return None
+        fields = s.unpack_from(data)
+        if (address + command + checksum(data[:-1])) & 0x7F != fields[-1]:
+            return None
+        return fields[:-1]
+
+PACKET_ENCODER = PacketEncoder()
+PACKET_DECODER = PacketDecoder()
@@ -0,0 +1,396 @@
+"""Driver for Orion Robotics RoboClaw motor controllers, shared by every
+node that drives one. Started life as the factory demo code, wrapped into
+classes."""
+import serial
+
+from roboclaw_driver.protocol import PACKET_DECODER, PACKET_ENCODER, \
+    QUERY_HEADER, READ_COMMANDS
+
+# packet-serial addresses are set with the RoboClaw's mode switches
+DEFAULT_ADDRESS = 128
+MIN_ADDRESS = 128
+MAX_ADDRESS = 135
+
+
+class PlainProfile(object):
+    """Start-up profile that leaves the controller's settings alone. Used by
+    the waist actuators, which are driven open-loop."""
+
+    def setup(self, claw):
+        pass
+
+
+class VelocityPidProfile(object):
+    """Start-up profile for the base wheels: keep the controller's velocity
+    PID constants, but tell it the encoder rate at full duty cycle (QPPS)."""
+
+    def __init__(self, max_ticks_per_second):
+        """
+        :param max_ticks_per_second: ticks per second from the encoders when
+            the motors are running at 100% duty cycle. This is empirically
+            determined. Roboclaw needs this at start to report correct
+            "QPPS". See the Roboclaw manual.
+        """
+        self.max_ticks_per_second = max_ticks_per_second
+
+    def setup(self, claw):
+        (p, i, d, q) = claw.readM1pidq()
+        claw.SetM1pidq(p, i, d, self.max_ticks_per_second)
+        (p, i, d, q) = claw.readM2pidq()
+        claw.SetM2pidq(p, i, d, self.max_ticks_per_second)
+
+
+class RoboClaw(object):
+    """Convenience class for talking to an Orion Robotics RoboClaw
+        motor controller at one packet-serial address."""
+
+    def __init__(self, port, baudrate=9600, address=DEFAULT_ADDRESS,
+                 profile=None, timeout=0.5):
+        """Open a serial port for talking to the RoboClaw motor controller,
+        and initialize the controller.
+
+        Args:
+            port (string or serial port): the name of a device entry like
+            '/dev/ttyACM0' or '/dev/ttyUSB0', or an already open port. Pass
+            the same open port to several RoboClaws to drive controllers
+            with different addresses on one packet-serial bus; the caller
+            then owns the port and must serialize access to it.
+
+            baudrate (int): for V4 (USB) Roboclaws, this value is ignored. For
+            earlier models,this value should correspond to the switch settings
+            on the board.
+
+            address (int): the controller's packet-serial address, 128-135.
+
+            profile: start-up profile whose setup(claw) method initializes
+            the controller, e.g. VelocityPidProfile. Defaults to
+            PlainProfile.
+
+        Raises:
+            IOError, if we can't open the indicated port for some reason.
+            ValueError, if the address is out of range.
+        """
+        self.owns_port = False
+        if not MIN_ADDRESS <= address <= MAX_ADDRESS:
+            raise ValueError("RoboClaw address must be in [%d, %d], got %d" %
+                             (MIN_ADDRESS, MAX_ADDRESS, address))
+        self.address = address
+        if isinstance(port, basestring):
+            self.port = serial.Serial(port, baudrate, timeout=timeout)
+            self.owns_port = True
+        else:
+            self.port = port
+        if profile is None:
+            profile = PlainProfile()
+        profile.setup(self)
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Close the serial port, unless it was handed to us already open."""
+        if self.owns_port:
+            self.port.close()
+            self.owns_port = False
+
+    def readpacket(self, command, default):
+        """Send a query, then read and check the whole response at once.
+
+        Returns:
+            the tuple of response fields, or default if the response was
+            short or failed its checksum.
+        """
+        self.discard_input()
+        self.sendquery(command)
+        return self.readresponse(command, default)
+
+    def sendquery(self, command):
+        """Send a query without waiting for its answer. Several queries may
+        be in flight on a port at once; the controllers answer them in the
+        order they were sent, and each answer is collected with
+        readresponse."""
+        self.port.write(QUERY_HEADER.pack(self.address, command))
+
+    def readresponse(self, command, default):
+        """Read and check the answer to a query sent with sendquery.
+
+        Returns:
+            the tuple of response fields, or default if the response was
+            short or failed its checksum. The port's input is then
+            discarded, as whatever follows can't be told apart from the
+            next answer: answers still to come for queries in flight are
+            lost too. Don't read those; each would only wait out the
+            port's timeout and return default.
+        """
+        data = self.port.read(PACKET_DECODER.size(command))
+        fields = PACKET_DECODER.decode(self.address, command, data)
+        if fields is None:
+            self.discard_input()
+            return default
+        return fields
+
+    def discard_input(self):
+        """Drop any bytes waiting on the port, such as the rest of an
+        answer that was read short or a byte of line noise, so that the
+        next read starts at the start of an answer."""
+        # pyserial 3 renamed flushInput
+        flush = getattr(self.port, 'reset_input_buffer', None) or \
+            getattr(self.port, 'flushInput', None)
+        if flush is not None:
+            flush()
+
+    def writepacket(self, command, *args):
+        """Send a write command and its checksum as a single frame."""
+        return self.port.write(
+            PACKET_ENCODER.encode(self.address, command, *args))
+
+    def M1Forward(self, val):
+        self.writepacket(0, val)
+
+    def M1Backward(self, val):
+        self.writepacket(1, val)
+
+    def SetMinMainBattery(self, val):
+        self.writepacket(2, val)
+
+    def SetMaxMainBattery(self, val):
+        self.writepacket(3, val)
+
+    def M2Forward(self, val):
+        self.writepacket(4, val)
+
+    def M2Backward(self, val):
+        self.writepacket(5, val)
+
+    def DriveM1(self, val):
+        self.writepacket(6, val)
+
+    def DriveM2(self, val):
+        self.writepacket(7, val)
+
+    def ForwardMixed(self, val):
+        self.writepacket(8, val)
+
+    def BackwardMixed(self, val):
+        self.writepacket(9, val)
+
+    def RightMixed(self, val):
+        self.writepacket(10, val)
+
+    def LeftMixed(self, val):
+        self.writepacket(11, val)
+
+    def DriveMixed(self, val):
+        self.writepacket(12, val)
+
+    def TurnMixed(self, val):
+        self.writepacket(13, val)
+
+    def readM1encoder(self):
+        return self.readpacket(16, (-1, -1))
+
+    def readM2encoder(self):
+        return self.readpacket(17, (-1, -1))
+
+    def readM1speed(self):
+        return self.readpacket(18, (-1, -1))
+
+    def readM2speed(self):
+        return self.readpacket(19, (-1, -1))
+
+    def ResetEncoderCnts(self):
+        self.writepacket(20)
+
+    def readversion(self):
+        self.port.write(QUERY_HEADER.pack(self.address, 21))
+        return self.port.read(32)
+
+    def readmainbattery(self):
+        return self.readpacket(24, (-1,))[0]
+
+    def readlogicbattery(self):
+        return self.readpacket(25, (-1,))[0]
+
+    def SetM1pidq(self, p, i, d, qpps):
+        self.writepacket(28, d, p, i, qpps)
+
+    def SetM2pidq(self, p, i, d, qpps):
+        self.writepacket(29, d, p, i, qpps)
+
+    def readM1instspeed(self):
+        return self.readpacket(30, (-1, -1))
+
+    def readM2instspeed(self):
+        return self.readpacket(31, (-1, -1))
+
+    def SetM1Duty(self, val):
+        self.writepacket(32, val)
+
+    def SetM2Duty(self, val):
+        self.writepacket(33, val)
+
+    def SetMixedDuty(self, m1, m2):
+        self.writepacket(34, m1, m2)
+
+    def SetM1Speed(self, val):
+        self.writepacket(35, val)
+
+    def SetM2Speed(self, val):
+        self.writepacket(36, val)
+
+    def SetMixedSpeed(self, m1, m2):
+        self.writepacket(37, m1, m2)
+
+    def SetM1SpeedAccel(self, accel, speed):
+        self.writepacket(38, accel, speed)
+
+    def SetM2SpeedAccel(self, accel, speed):
+        self.writepacket(39, accel, speed)
+
+    def SetMixedSpeedAccel(self, accel, speed1, speed2):
+        self.writepacket(40, accel, speed1, speed2)
+    def SetM1SpeedDistance(self, speed, distance, buffer):
+        self.writepacket(41, speed, distance, buffer)
+
+    def SetM2SpeedDistance(self, speed, distance, buffer):
+        self.writepacket(42, speed, distance, buffer)
+
+    def SetMixedSpeedDistance(self, speed1, distance1, speed2, distance2, buffer):
+        self.writepacket(43, speed1, distance1, speed2, distance2, buffer)
+
+    def SetM1SpeedAccelDistance(self, accel, speed, distance, buffer):
+        self.writepacket(44, accel, speed, distance, buffer)
+
+    def SetM2SpeedAccelDistance(self, accel, speed, distance, buffer):
+        self.writepacket(45, accel, speed, distance, buffer)
+
+    def SetMixedSpeedAccelDistance(self, accel, speed1, distance1, speed2, distance2, buffer):
+        self.writepacket(46, accel, speed1, distance1, speed2, distance2, buffer)
+
+    def readbuffercnts(self):
+        return self.readpacket(47, (-1, -1))
+
+    def readcurrents(self):
+        return self.readpacket(49, (-1, -1))
+
+    def SetMixedSpeedIAccel(self, accel1, speed1, accel2, speed2):
+        self.writepacket(50, accel1, speed1, accel2, speed2)
+
+    def SetMixedSpeedIAccelDistance(self, accel1, speed1, distance1, accel2, speed2, distance2, buffer):
+        self.writepacket(51, accel1, speed1, distance1, accel2, speed2, distance2, buffer)
+
+    def SetM1DutyAccel(self, accel, duty):
+        self.writepacket(52, duty, accel)
+
+    def SetM2DutyAccel(self, accel, duty):
+        self.writepacket(53, duty, accel)
+
+    def SetMixedDutyAccel(self, accel1, duty1, accel2, duty2):
+        self.writepacket(54, duty1, accel1, duty2, accel2)
+
+    def readM1pidq(self):
+        return self.readpacket(55, (-1, -1, -1, -1))
+
+    def readM2pidq(self):
+        return self.readpacket(56, (-1, -1, -1, -1))
+
+    def readmainbatterysettings(self):
+        return self.readpacket(59, (-1, -1))
+
+    def readlogicbatterysettings(self):
+        return self.readpacket(60, (-1, -1))
+
+    def SetM1PositionConstants(self, kp, ki, kd, kimax, deadzone, min, max):
+        self.writepacket(61, kd, kp, ki, kimax, deadzone, min, max)
+
+    def SetM2PositionConstants(self, kp, ki, kd, kimax, deadzone, min, max):
+        self.writepacket(62, kd, kp, ki, kimax, deadzone, min, max)
+
+    def readM1PositionConstants(self):
+        return self.readpacket(63, (-1, -1, -1, -1, -1, -1, -1))
+
+    def readM2PositionConstants(self):
+        return self.readpacket(64, (-1, -1, -1, -1, -1, -1, -1))
+
+    def SetM1SpeedAccelDeccelPosition(self, accel, speed, deccel, position, buffer):
+        self.writepacket(65, accel, speed, deccel, position, buffer)
+
+    def SetM2SpeedAccelDeccelPosition(self, accel, speed, deccel, position, buffer):
+        self.writepacket(66, accel, speed, deccel, position, buffer)
+
+    def SetMixedSpeedAccelDeccelPosition(self, accel1, speed1, deccel1, position1, accel2, speed2, deccel2, position2,
+                                         buffer):
+        self.writepacket(67, accel1, speed1, deccel1, position1, accel2, speed2, deccel2, position2, buffer)
+
+    def readtemperature(self):
+        return self.readpacket(82, (-1,))[0]
+
+    def readerrorstate(self):
+        return self.readpacket(90, (-1,))[0]
+
+
+class RoboClawSim(object):
+    """
+     Simulator class that fakes minimal RoboClaw functionality
+    """
+    def __init__(self, port=None, baudrate=None, accel=None,
+                 max_ticks_per_second=None, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.M1Speed = 0
+        self.M2Speed = 0
+
+        self.M1EncoderCnts = 0
+        self.M2EncoderCnts = 0
+
+    def SetMixedSpeedAccel(self, accel, speed1, speed2):
+        self.M1Speed = speed1
+        self.M2Speed = speed2
+
+    def readM1encoder(self):
+        return (self.M1EncoderCnts, 0)
+
+    def readM2encoder(self):
+        return (self.M2EncoderCnts, 0)
+
+    def readM1speed(self):
+        return (self.M1Speed, 0)
+    
+    def readM2speed(self):
+        return (self.M2Speed, 0)
+    
+    def readM1instspeed(self):
+        return (int(self.M1Speed / 125.0), 0)
+
+    def readM2instspeed(self):
+        return (int(self.M2Speed / 125.0), 0)
+
+    def SetM1pidq(self, p, i, d, qpps):
+        pass
+
+    def SetM2pidq(self, p, i, d, qpps):
+        pass
+
+    def readM1pidq(self):
+        return (-1, -1, -1, -1)
+
+    def readM2pidq(self):
+        return (-1, -1, -1, -1)
+
+    def readversion(self):
+        return "RoboClawSim version x.x"
+
+    def ResetEncoderCnts(self):
+        self.M1EncoderCnts = 0
+        self.M2EncoderCnts = 0
+
+    def sendquery(self, command):
+        pass
+
+    def discard_input(self):
+        pass
+
+    def readresponse(self, command, default):
+        method = getattr(self, READ_COMMANDS[command][0], None)
+        if method is None:
+            return default
+        return method()